@@ -0,0 +1,76 @@
+# data/accounts.py
+"""Índice da tabela de contas (db.csv) por ID e por (Tipo, nome normalizado).
+
+Guarda a posição de cada conta na tabela carregada, para que buscas por ID,
+checagem de duplicados e alocação de IDs não varram a tabela comparando
+strings a cada chamada. Nomes são comparados sem espaços nas pontas e sem
+diferença de maiúsculas/minúsculas.
+
+O índice é montado uma vez por versão da tabela (data.db o guarda no contexto
+da sessão) e acompanha as inclusões de contas no lugar; regravações completas
+da tabela fazem com que ele seja remontado.
+"""
+import numpy as np
+import pandas as pd
+
+
+def normalize_name(nome) -> str:
+    """Nome de conta na forma usada como chave."""
+    return str(nome).strip().lower()
+
+
+class AccountIndex:
+    """Mapas ID -> posição e (Tipo, nome normalizado) -> posições."""
+
+    def __init__(self, accounts: pd.DataFrame = None):
+        self.ids = []
+        self.by_id = {}
+        self.by_name = {}
+        self.max_id = 0
+        if accounts is not None and not accounts.empty:
+            ids = pd.to_numeric(accounts["ID"], errors="coerce").tolist()
+            nomes = accounts["Nome"].astype(str).str.strip().str.lower().tolist()
+            for row_id, tipo, nome in zip(ids, accounts["Tipo"].astype(str).tolist(), nomes):
+                self._append(None if pd.isna(row_id) else int(row_id), tipo, nome)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _append(self, row_id, tipo: str, nome: str) -> int:
+        pos = len(self.ids)
+        self.ids.append(row_id)
+        if row_id is not None:
+            self.by_id[row_id] = pos
+            self.max_id = max(self.max_id, row_id)
+        self.by_name.setdefault((tipo, nome), []).append(pos)
+        return pos
+
+    # --- consultas ---
+    def position(self, row_id):
+        """Posição da conta com esse ID, ou None."""
+        try:
+            return self.by_id.get(int(row_id))
+        except (TypeError, ValueError):
+            return None
+
+    def positions(self, tipo: str, nome: str) -> list:
+        """Posições das contas de um Tipo com esse nome (normalizado)."""
+        return self.by_name.get((str(tipo), normalize_name(nome)), [])
+
+    def exists(self, tipo: str, nome: str) -> bool:
+        return bool(self.positions(tipo, nome))
+
+    def next_id(self) -> int:
+        """Próximo ID livre (maior ID + 1)."""
+        return self.max_id + 1
+
+    def mask(self, positions) -> np.ndarray:
+        """Vetor booleano do tamanho da tabela, True nas posições informadas (None é ignorado)."""
+        out = np.zeros(len(self.ids), dtype=bool)
+        out[[p for p in positions if p is not None]] = True
+        return out
+
+    # --- alterações ---
+    def add(self, row_id: int, tipo: str, nome: str) -> int:
+        """Registra uma conta acrescentada ao fim da tabela; retorna a posição dela."""
+        return self._append(int(row_id), str(tipo), normalize_name(nome))
@@ -0,0 +1,298 @@
+# data/accrual.py
+"""Rendimento dos investimentos pelas séries de taxas (data/rates.py).
+
+Cada investimento pode ser ligado a uma série com um percentual (ex.: 106%
+do CDI) em `indexers.json` na pasta do usuário:
+    {"3": {"series": "CDI", "pct": 106.0, "watermark": "2025-01-31"}}
+
+O rendimento ainda não lançado em uma data é calculado sobre o saldo
+lançado: cada transação do investimento (inclusive rendimentos já lançados)
+rende o fator da série entre a sua data e a data de referência, mas nunca
+antes da marca d'água (`watermark`), que é a data até a qual o rendimento já
+foi lançado; o saldo anterior à marca rende a partir dela. Sem marca, o
+saldo inicial que não passa pelo histórico (ledger.opening) só rende a
+partir de "since", se essa data estiver no indexador.
+
+`post_yields` lança esse rendimento como um Depósito com categoria
+"Rendimento", atualiza o saldo da conta e avança a marca d'água no mesmo
+commit (data/transaction.py); rodar de novo na mesma data não lança nada.
+A data lançada nunca passa do último dia com dados na série, então dias sem
+taxa importada ficam para a próxima execução.
+
+Uso em linha de comando:
+    python -m data.accrual link <usuário> <ID da conta> <SÉRIE> [percentual] [--since AAAA-MM-DD]
+    python -m data.accrual show <usuário> [AAAA-MM-DD]
+    python -m data.accrual post [AAAA-MM-DD] [--workers N] [--user <usuário> ...]
+    python -m data.accrual check
+"""
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.fileio import atomic_write_text
+from data.ledger import Ledger
+from data.locking import user_lock
+from data.rates import NO_DAY, RATES_DIR, RateSeries, from_days, get_series, to_days
+from data.rollup import Rollup
+from data.storage import HISTORY_COLUMNS, get_backend
+from data.transaction import UnitOfWork, pending, recover
+from data.vectorized import signed_amounts
+
+INDEXERS_FILE = "indexers.json"
+USERS_DIR = Path("data/data_users")
+CATEGORY = "Rendimento"
+COLUMNS = ["ID", "Nome", "Serie", "Pct", "Lancado", "Saldo", "Rendimento", "Ate", "DadosAte"]
+
+
+def load_indexers(folder: Path) -> dict:
+    """{ID da conta: {"series", "pct", "since"?, "watermark"?}} do usuário (vazio se não houver arquivo)."""
+    path = Path(folder) / INDEXERS_FILE
+    if not path.exists():
+        return {}
+    return {int(k): v for k, v in json.loads(path.read_text(encoding="utf-8")).items()}
+
+
+def _indexers_json(indexers: dict) -> str:
+    return json.dumps({str(k): v for k, v in sorted(indexers.items())}, indent=2, ensure_ascii=False)
+
+
+def save_indexers(folder: Path, indexers: dict):
+    atomic_write_text(Path(folder) / INDEXERS_FILE, _indexers_json(indexers))
+
+
+def _day(value) -> int:
+    dia = int(to_days(value)[0]) if value else NO_DAY
+    return None if dia == NO_DAY else dia
+
+
+def accrue(history: pd.DataFrame, accounts: pd.DataFrame, indexers: dict, as_of,
+           opening: dict = None, rates_dir: Path = RATES_DIR) -> pd.DataFrame:
+    """Saldo lançado, saldo corrigido e rendimento a lançar de cada investimento indexado.
+
+    Retorna uma linha por conta: ID, Nome, Serie, Pct, Lancado (saldo pelo
+    histórico, até `as_of`), Saldo (corrigido), Rendimento (Saldo - Lancado),
+    Ate (data até onde o rendimento foi calculado: `as_of` ou o dia seguinte
+    ao último dado da série) e DadosAte (último dia da série).
+    """
+    opening = opening or {}
+    inv = accounts[(accounts["Tipo"] == "Investimento") & accounts["ID"].isin(list(indexers))]
+    inv = inv.drop_duplicates("ID").sort_values("ID")
+    if inv.empty:
+        return pd.DataFrame(columns=COLUMNS)
+    as_of_day = _day(as_of)
+    conta = inv["ID"].to_numpy(dtype=np.int64)
+    cfg = [indexers[i] for i in conta.tolist()]
+    serie = np.array([c["series"] for c in cfg], dtype=object)
+    pct = np.array([float(c.get("pct", 100.0)) for c in cfg])
+    # sem marca d'água: os aportes rendem desde a própria data e o saldo inicial desde "since" (ou não rende)
+    marca = np.array([_day(c.get("watermark")) or NO_DAY for c in cfg], dtype=np.int64)
+    base = np.array([_day(c.get("watermark") or c.get("since")) or as_of_day for c in cfg], dtype=np.int64)
+    lancado = np.array([float(opening.get(i, 0.0)) for i in conta.tolist()])
+
+    # transações dos investimentos indexados até `as_of`, com a posição da conta em `conta`
+    ids = pd.to_numeric(history["BancoID"], errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+    dias = to_days(history["Data"])
+    pos = np.clip(np.searchsorted(conta, ids), 0, len(conta) - 1)
+    ok = (conta[pos] == ids) & (dias <= as_of_day)
+    pos, dias = pos[ok], dias[ok]
+    valores = signed_amounts(history["Valor"], history["Operação"])[ok]
+
+    rendimento = lancado.copy()
+    ate = np.full(len(conta), as_of_day)
+    dados_ate = np.zeros(len(conta), dtype=np.int64)
+    # um produto acumulado por (série, percentual); as contas de cada grupo são avaliadas juntas
+    for nome_serie, p in dict.fromkeys(zip(serie.tolist(), pct.tolist())):
+        s = get_series(nome_serie, rates_dir)
+        ultimo = int(s.days[-1]) if len(s.days) else as_of_day
+        # a taxa do último dia rende até o dia seguinte; preços valem no próprio dia
+        end = min(as_of_day, ultimo + (s.kind != "price"))
+        grupo = (serie == nome_serie) & (pct == p)
+        f = grupo[pos]
+        inicio = np.minimum(np.maximum(dias[f], marca[pos[f]]), end)
+        # linhas sem data (NaT no schema) entram no saldo lançado, mas não rendem
+        inicio[dias[f] == NO_DAY] = end
+        ganho = valores[f] * (s.factor(inicio, np.full(len(inicio), end), p) - 1)
+        rendimento[grupo] *= s.factor(np.minimum(base[grupo], end), np.full(grupo.sum(), end), p) - 1
+        rendimento += np.bincount(pos[f], ganho, minlength=len(conta))
+        ate[grupo], dados_ate[grupo] = end, ultimo
+
+    lancado += np.bincount(pos, valores, minlength=len(conta))
+    return pd.DataFrame({
+        "ID": conta, "Nome": inv["Nome"].to_numpy(), "Serie": serie, "Pct": pct,
+        "Lancado": lancado, "Saldo": lancado + rendimento, "Rendimento": rendimento,
+        "Ate": from_days(ate), "DadosAte": from_days(dados_ate),
+    })[COLUMNS]
+
+
+def accrue_user(folder: Path, as_of=None) -> pd.DataFrame:
+    """`accrue` com as tabelas, o ledger e os indexadores da pasta do usuário."""
+    backend = get_backend(folder)
+    as_of = as_of or pd.Timestamp.today().normalize()
+    return accrue(backend.load_table("history"), backend.load_table("accounts"), load_indexers(folder),
+                  as_of, Ledger.load(folder).opening)
+
+
+def post_yields(folder: Path, as_of=None) -> dict:
+    """Lança o rendimento pendente dos investimentos indexados do usuário até `as_of` (hoje).
+
+    Retorna contadores: accounts (indexados), posted (lançamentos) e amount (soma lançada).
+    """
+    folder = Path(folder)
+    if not (folder / INDEXERS_FILE).exists():
+        return {"user": folder.name, "accounts": 0, "posted": 0, "amount": 0.0}
+    as_of = pd.Timestamp(as_of or pd.Timestamp.today()).normalize()
+
+    with user_lock(folder):
+        indexers = load_indexers(folder)
+        backend = get_backend(folder)
+        if pending(folder):
+            recover(folder, backend)
+        ledger = Ledger.load(folder)
+        accounts = backend.load_table("accounts")
+        history = backend.load_table("history")
+        res = accrue(history, accounts, indexers, as_of, ledger.opening)
+
+        res["Valor"] = res["Rendimento"].round(2)
+        # centavos que ainda não fecham ficam para depois (a marca d'água não avança)
+        res = res[res["Valor"].abs() >= 0.01]
+        if res.empty:
+            return {"user": folder.name, "accounts": len(indexers), "posted": 0, "amount": 0.0}
+
+        # mesmo critério de backend.next_id, sem carregar o histórico de novo
+        next_id = 1 if history.empty else int(pd.to_numeric(history["ID"], errors="coerce").max()) + 1
+        rows = pd.DataFrame({
+            "ID": np.arange(next_id, next_id + len(res)),
+            "BancoID": res["ID"].to_numpy(),
+            "Tipo": "Investimento",
+            "Nome": res["Nome"].to_numpy(),
+            "Data": res["Ate"].dt.strftime("%Y-%m-%d 00:00:00").to_numpy(),
+            "Operação": np.where(res["Valor"] >= 0, "Depósito", "Retirada"),
+            "Valor": res["Valor"].abs().to_numpy(),
+            "Categoria": CATEGORY,
+            "Descrição": [f"{p:g}% {s} até {d:%d/%m/%Y}" for p, s, d in zip(res["Pct"], res["Serie"], res["Ate"])],
+        })[HISTORY_COLUMNS]
+
+        delta = accounts["ID"].astype(int).map(res.set_index("ID")["Valor"]).fillna(0.0)
+        accounts["Saldo"] = (accounts["Saldo"].astype(float) + delta).round(2)
+        for i, d in zip(res["ID"], res["Ate"]):
+            indexers[int(i)]["watermark"] = f"{d:%Y-%m-%d}"
+
+        rollup = Rollup.load(folder)  # antes do commit: se precisar reconstruir, não pode contar as linhas novas
+        tx = UnitOfWork(backend)
+        tx.save_table("accounts", accounts)
+        tx.append_rows("history", rows)
+        tx.save_file(INDEXERS_FILE, _indexers_json(indexers))
+        tx.on_commit(lambda: (ledger.apply(added=rows), rollup.apply(added=rows)))
+        tx.commit()
+    return {"user": folder.name, "accounts": len(indexers), "posted": len(rows), "amount": float(rows["Valor"].sum())}
+
+
+def _post_one(args):
+    folder, as_of = args
+    try:
+        return post_yields(folder, as_of)
+    except Exception as e:  # um usuário com problema não interrompe os demais
+        return {"user": Path(folder).name, "accounts": 0, "posted": 0, "amount": 0.0, "error": f"{type(e).__name__}: {e}"}
+
+
+def post_all(users_dir: Path = USERS_DIR, as_of=None, workers: int = None, users=None) -> dict:
+    """Roda `post_yields` para cada pasta de usuário em paralelo (um processo por usuário por vez)."""
+    folders = sorted(p for p in Path(users_dir).iterdir() if p.is_dir() and (not users or p.name in users))
+    inicio = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_post_one, [(str(f), as_of) for f in folders], chunksize=max(1, len(folders) // 64)))
+    segundos = time.perf_counter() - inicio
+    contas = sum(r["accounts"] for r in results)
+    return {
+        "users": len(results),
+        "accounts": contas,
+        "posted": sum(r["posted"] for r in results),
+        "amount": sum(r["amount"] for r in results),
+        "errors": [r for r in results if "error" in r],
+        "seconds": segundos,
+        "accounts_per_sec": contas / segundos if segundos else 0.0,
+    }
+
+
+def _check():
+    """Confere com uma série sintética que transações sem data (ou com data inválida) não rendem."""
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as rates_dir:
+        dias = to_days(pd.date_range("2024-01-01", "2024-12-31"))
+        RateSeries("CHECK", "daily", dias, np.full(len(dias), 0.04), Path(rates_dir)).save()
+        contas = pd.DataFrame([{"ID": 1, "Tipo": "Investimento", "Nome": "CDB", "Saldo": 0.0, "Detalhes": ""}])
+        hist = pd.DataFrame({
+            "ID": [1, 2, 3], "BancoID": [1, 1, 1], "Tipo": "Investimento", "Nome": "CDB",
+            "Data": pd.to_datetime(["2024-06-01", None, "lixo"], errors="coerce"),
+            "Operação": "Depósito", "Valor": [1000.0, 500.0, 700.0], "Categoria": "", "Descrição": "",
+        })
+        cfg = {1: {"series": "CHECK", "pct": 100.0}}
+        com_nat = accrue(hist, contas, cfg, "2024-12-31", rates_dir=Path(rates_dir)).iloc[0]
+        so_datadas = accrue(hist.iloc[:1], contas, cfg, "2024-12-31", rates_dir=Path(rates_dir)).iloc[0]
+    assert np.isclose(com_nat["Rendimento"], so_datadas["Rendimento"]), (com_nat["Rendimento"], so_datadas["Rendimento"])
+    assert np.isclose(com_nat["Lancado"], hist["Valor"].sum())
+    assert _day("lixo") is None and _day(None) is None
+    print(f"OK: linhas sem data não rendem (rendimento R$ {com_nat['Rendimento']:,.2f}, só do aporte datado; "
+          f"saldo lançado R$ {com_nat['Lancado']:,.2f}, com todas as linhas).")
+
+
+def _main(argv):
+    parser = argparse.ArgumentParser(prog="python -m data.accrual", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    link = sub.add_parser("link", help="liga um investimento a uma série")
+    link.add_argument("user")
+    link.add_argument("account_id", type=int)
+    link.add_argument("series")
+    link.add_argument("pct", type=float, nargs="?", default=100.0)
+    link.add_argument("--since")
+    show = sub.add_parser("show", help="saldo corrigido dos investimentos indexados")
+    show.add_argument("user")
+    show.add_argument("as_of", nargs="?")
+    post = sub.add_parser("post", help="lança o rendimento pendente de todos os usuários")
+    post.add_argument("as_of", nargs="?")
+    post.add_argument("--workers", type=int)
+    post.add_argument("--user", action="append", help="limita aos usuários indicados (pode repetir)")
+    sub.add_parser("check", help="confere que transações sem data não rendem")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "check":
+        _check()
+        return 0
+
+    if args.cmd == "post":
+        r = post_all(as_of=args.as_of, workers=args.workers, users=args.user)
+        for e in r["errors"]:
+            print(f"ERRO {e['user']}: {e['error']}")
+        print(f"OK: {r['users']} usuário(s), {r['accounts']} investimento(s) indexado(s), "
+              f"{r['posted']} lançamento(s) somando R$ {r['amount']:,.2f} em {r['seconds']:.2f}s "
+              f"({r['accounts_per_sec']:,.0f} contas/s).")
+        return 1 if r["errors"] else 0
+
+    folder = USERS_DIR / args.user
+    if args.cmd == "link":
+        get_series(args.series)  # falha cedo se a série não foi importada
+        with user_lock(folder):
+            indexers = load_indexers(folder)
+            # atualiza no lugar: a marca d'água do rendimento já lançado continua valendo
+            cfg = indexers.setdefault(args.account_id, {})
+            cfg.update(series=args.series, pct=args.pct)
+            if args.since:
+                cfg["since"] = str(from_days(to_days(args.since))[0].date())
+            save_indexers(folder, indexers)
+        extra = f" (rendimento já lançado até {cfg['watermark']})" if cfg.get("watermark") else ""
+        print(f"OK: conta {args.account_id} -> {args.pct:g}% de {args.series}{extra}.")
+    else:
+        out = accrue_user(folder, args.as_of)
+        print(out.to_string(index=False) if not out.empty else "Nenhum investimento indexado.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
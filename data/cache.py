@@ -0,0 +1,121 @@
+# data/cache.py
+"""Cache por sessão das tabelas já carregadas.
+
+Cada entrada é indexada por (pasta do usuário, backend, tabela) e guarda a
+assinatura do arquivo (mtime/tamanho) do momento da leitura. Enquanto a
+assinatura não muda, os reruns do Streamlit reaproveitam o DataFrame já
+processado em vez de reler o arquivo.
+
+Com copy-on-write (padrão a partir do pandas 3) a cópia entregue às páginas é
+rasa: as colunas só são copiadas se a página alterar a tabela. Sem ele, a
+cópia continua profunda.
+"""
+import pandas as pd
+import streamlit as st
+
+_fallback = {}
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3 or pd.get_option("mode.copy_on_write") is True
+
+
+def _state() -> dict:
+    """Estado do cache: na sessão do Streamlit ou, fora dele (scripts), no módulo."""
+    store = st.session_state if st.runtime.exists() else _fallback
+    if "_table_cache" not in store:
+        store["_table_cache"] = {"entries": {}, "hits": 0, "misses": 0, "generation": 0}
+    return store["_table_cache"]
+
+
+def _key(backend, table: str):
+    return str(backend.folder), backend.name, table
+
+
+def _copy(value):
+    if isinstance(value, pd.DataFrame):
+        return value.copy(deep=not _COPY_ON_WRITE)
+    return value.copy()
+
+
+def get_table(backend, table: str, loader):
+    """Retorna a tabela do cache ou a carrega com `loader()` se o arquivo mudou.
+
+    Sempre devolve uma cópia, para que alterações feitas pelas páginas não
+    contaminem o cache.
+    """
+    state = _state()
+    key = _key(backend, table)
+    sig = backend.signature(table)
+    entry = state["entries"].get(key)
+    if entry is not None and entry["sig"] == sig:
+        state["hits"] += 1
+        return _copy(entry["value"])
+
+    state["misses"] += 1
+    value = loader()
+    state["entries"][key] = {"sig": sig, "value": _copy(value)}
+    return value
+
+
+def get_value(folder, name: str, sig, loader):
+    """Objeto derivado de um arquivo da pasta (ex.: rollup), recarregado quando `sig` muda.
+
+    Devolvido sem cópia: quem chama só pode lê-lo.
+    """
+    state = _state()
+    key = (str(folder), "derived", name)
+    entry = state["entries"].get(key)
+    if entry is not None and entry["sig"] == sig:
+        state["hits"] += 1
+        return entry["value"]
+    state["misses"] += 1
+    value = loader()
+    state["entries"][key] = {"sig": sig, "value": value}
+    return value
+
+
+def put_value(folder, name: str, sig, value):
+    """Guarda um objeto derivado já atualizado pela própria sessão (ver get_value)."""
+    _state()["entries"][(str(folder), "derived", name)] = {"sig": sig, "value": value}
+
+
+def generation() -> int:
+    """Contador de escritas da sessão (put_table/invalidate).
+
+    Entra na assinatura de valores derivados de tabelas: uma regravação com o
+    mesmo tamanho no mesmo tick de mtime não passa despercebida.
+    """
+    return _state().get("generation", 0)
+
+
+def _bump(state: dict):
+    state["generation"] = state.get("generation", 0) + 1
+
+
+def put_table(backend, table: str, value):
+    """Atualiza o cache com o valor recém-salvo (escrita feita pela própria sessão)."""
+    state = _state()
+    state["entries"][_key(backend, table)] = {"sig": backend.signature(table), "value": _copy(value)}
+    _bump(state)
+
+
+def invalidate(backend=None, table: str = None):
+    """Descarta entradas do cache (todas, de um backend ou de uma tabela)."""
+    state = _state()
+    _bump(state)
+    entries = state["entries"]
+    for key in list(entries):
+        if backend is not None and key[:2] != _key(backend, "")[:2]:
+            continue
+        if table is not None and key[2] != table:
+            continue
+        del entries[key]
+
+
+def cache_stats() -> dict:
+    """Contadores de acertos/faltas do cache da sessão."""
+    state = _state()
+    return {"hits": state["hits"], "misses": state["misses"], "entries": len(state["entries"])}
+
+
+def reset_stats():
+    state = _state()
+    state["hits"] = state["misses"] = 0
@@ -2,43 +2,344 @@
 import pandas as pd
 from pathlib import Path
 import streamlit as st
-from auth import get_current_user, ensure_user_folder
+from auth import get_current_user
+from data.provision import ensure_user_folder
+from data.storage import ACCOUNT_COLUMNS, get_backend, filter_page, _file_signature
+from data import cache
+from data.ledger import Ledger
+from data.rollup import ROLLUP_FILE, Rollup
+from data.exclusions import ExclusionIndex
+from data.accounts import AccountIndex, normalize_name
+from data.posting import plan_postings
+from data.accrual import accrue, load_indexers
+from data import importer
+from data.schedule import expand_schedules
+from data.schema import SCHEMAS, conform
+from datetime import date
+from contextlib import contextmanager
+import threading
+from data.locking import user_lock
+from data.transaction import UnitOfWork, pending, recover
+
+COLUMNS = ACCOUNT_COLUMNS
+
+# transações abertas nesta thread, por pasta de usuário
+_tx = threading.local()
+
+def get_user_folder() -> Path:
+    """Retorna a pasta de dados do usuário atual."""
+    user = get_current_user()
+    return ensure_user_folder(user)
 
-COLUMNS = ["ID", "Tipo", "Nome", "Saldo", "Detalhes"]
 
 def get_user_data_path() -> Path:
     """Retorna o caminho da pasta de dados do usuário atual."""
-    user = get_current_user()
-    user_folder = ensure_user_folder(user)
-    data_path = user_folder / "db.csv"
+    data_path = get_user_folder() / "db.csv"
     return data_path
 
 
+def get_storage():
+    """Retorna o backend de armazenamento do usuário atual.
+
+    Se um commit anterior foi interrompido (commit.wal na pasta), ele é
+    concluído antes de qualquer leitura.
+    """
+    folder = get_user_folder()
+    storage = get_backend(folder)
+    if pending(folder):
+        with user_lock(folder):
+            if recover(folder, storage) != "none":
+                cache.invalidate(storage)
+    return storage
+
+
+def locked():
+    """Lock da pasta do usuário atual; use em ciclos de leitura-alteração-escrita das páginas.
+
+        with locked():
+            df = load_data()
+            ...
+            save_data(df)
+    """
+    return user_lock(get_user_folder())
+
+
+@contextmanager
+def transaction():
+    """Agrupa as escritas do bloco em um único commit (ver data/transaction.py).
+
+        with transaction():
+            df = load_data()
+            ...
+            save_data(df)
+            append_history(rows)
+
+    Dentro do bloco as funções save_*/append_*/update_*/delete_* só acumulam
+    as alterações, e as leituras ainda veem o estado anterior; tudo é gravado
+    ao sair do bloco sem exceção (com uma exceção, nada é gravado). O lock do
+    usuário fica retido durante o bloco. Blocos aninhados entram na transação
+    de fora.
+    """
+    folder = get_user_folder()
+    key = str(folder.resolve())
+    open_tx = _tx.__dict__.setdefault("open", {})
+    if key in open_tx:
+        yield open_tx[key]
+        return
+    with user_lock(folder):
+        tx = UnitOfWork(get_storage())
+        # ledger, rollup e índice de contas nascem do estado anterior à primeira escrita
+        get_ledger()
+        get_rollup()
+        index = get_account_index()
+        open_tx[key] = tx
+        try:
+            yield tx
+        finally:
+            del open_tx[key]
+        ops = list(tx.ops)
+        tx.commit()
+        _sync_account_index(index, ops)
+
+
+def get_ledger() -> Ledger:
+    """Retorna o ledger de saldos materializados do usuário atual."""
+    return Ledger.load(get_user_folder())
+
+
+def get_account_index() -> AccountIndex:
+    """Índice da tabela de contas do usuário atual por ID e por (Tipo, nome) (ver data/accounts.py)."""
+    return get_context().account_index
+
+
+def _sync_account_index(index: AccountIndex, ops):
+    """Leva o índice do início da transação ao estado gravado, sem remontá-lo.
+
+    Inclusões de contas entram no índice e alterações de saldo/detalhes não
+    mexem nas chaves; qualquer outra escrita na tabela de contas deixa o índice
+    para ser remontado na próxima consulta.
+    """
+    for kind, table, arg in ops:
+        if table != "accounts":
+            continue
+        if kind == "append_rows":
+            for row_id, tipo, nome in zip(arg["ID"], arg["Tipo"], arg["Nome"]):
+                index.add(row_id, tipo, nome)
+        elif not (kind == "update_rows" and set(arg[1]) <= {"Saldo", "Detalhes"}):
+            return
+    get_context().store("account_index", ("accounts",), index)
+
+
+def get_rollup() -> Rollup:
+    """Retorna os agregados diários do histórico (dashboard) do usuário atual.
+
+    Fica em cache na sessão enquanto rollup.csv não muda; `apply` grava o
+    arquivo, então a próxima chamada relê a versão atualizada.
+    """
+    folder = get_user_folder()
+    return cache.get_value(folder, "rollup", _file_signature(folder / ROLLUP_FILE), lambda: Rollup.load(folder))
+
+
+def get_accrual(as_of=None) -> pd.DataFrame:
+    """Saldo corrigido pelas séries de taxas dos investimentos indexados (ver data/accrual.py)."""
+    folder = get_user_folder()
+    indexers = load_indexers(folder)
+    if not indexers:
+        return pd.DataFrame()
+    return accrue(load_history(), load_data(), indexers, as_of or date.today(), get_ledger().opening)
+
+
+def _load_table(table: str) -> pd.DataFrame:
+    storage = get_storage()
+    return cache.get_table(storage, table, lambda: storage.load_table(table))
+
+
+def _save_table(tx: UnitOfWork, table: str, df: pd.DataFrame):
+    # mesmos tipos de uma leitura do disco: o cache da sessão e o arquivo não divergem
+    if table in SCHEMAS:
+        df = conform(table, df)
+    tx.save_table(table, df)
+    tx.on_commit(lambda: cache.put_table(tx.backend, table, df))
+
+
+def _invalidate(tx: UnitOfWork, table: str):
+    tx.on_commit(lambda: cache.invalidate(tx.backend, table))
+
+
 def load_data() -> pd.DataFrame:
-    """Carrega o arquivo db.csv do usuário atual."""
-    data_path = get_user_data_path()
-    if not data_path.exists():
-        return pd.DataFrame(columns=COLUMNS)
-    return pd.read_csv(data_path)
+    """Carrega a tabela de contas (db.csv) do usuário atual."""
+    return _load_table("accounts")
 
 
 def save_data(df: pd.DataFrame):
-    """Salva o arquivo db.csv no diretório do usuário."""
-    data_path = get_user_data_path()
-    df.to_csv(data_path, index=False)
+    """Salva a tabela de contas (db.csv) do usuário atual."""
+    with transaction() as tx:
+        _save_table(tx, "accounts", df.copy())
+
+
+def load_history() -> pd.DataFrame:
+    """Carrega o histórico de transações (history.csv) do usuário atual."""
+    return _load_table("history")
+
+
+def save_history(df: pd.DataFrame):
+    """Salva o histórico de transações do usuário atual (reconstrói o ledger)."""
+    df = df.copy()
+    with transaction() as tx:
+        _save_table(tx, "history", df)
+
+        def rebuild():
+            get_ledger().rebuild(df, load_data())
+            Rollup(tx.folder).rebuild(df)
+        tx.on_commit(rebuild)
+
+
+def append_history(entries):
+    """Acrescenta transações ao histórico sem regravar o arquivo (lista de dicts ou DataFrame)."""
+    rows = entries if isinstance(entries, pd.DataFrame) else pd.DataFrame(list(entries))
+    if rows.empty:
+        return
+    rows = rows.copy()
+    with transaction() as tx:
+        tx.append_rows("history", rows)
+        _invalidate(tx, "history")
+        tx.on_commit(lambda: (get_ledger().apply(added=rows), get_rollup().apply(added=rows)))
+
+
+def query_history(**query):
+    """Página do histórico com filtros e ordenação; retorna (página, total filtrado).
+
+    Aceita os parâmetros de data.storage.filter_page. No SQLite a consulta usa
+    os índices; no CSV ela filtra a tabela já carregada em cache.
+    """
+    storage = get_storage()
+    if storage.indexed_queries:
+        return storage.query_rows("history", **query)
+    return filter_page(load_history(), **query)
+
+
+def update_history(row_id: int, values: dict):
+    """Altera campos de uma transação do histórico."""
+    with transaction() as tx:
+        hist = load_history()
+        old = hist[hist["ID"] == int(row_id)]
+        new = old.copy()
+        for col, val in values.items():
+            new[col] = val
+        tx.update_rows("history", int(row_id), values)
+        _invalidate(tx, "history")
+        tx.on_commit(lambda: (get_ledger().apply(added=new, removed=old),
+                              get_rollup().apply(added=new, removed=old)))
+
+
+def delete_history(ids):
+    """Remove transações do histórico pelos IDs."""
+    with transaction() as tx:
+        hist = load_history()
+        old = hist[hist["ID"].isin([int(i) for i in ids])]
+        tx.delete_rows("history", ids)
+        _invalidate(tx, "history")
+        tx.on_commit(lambda: (get_ledger().apply(removed=old), get_rollup().apply(removed=old)))
+
+
+def load_future() -> pd.DataFrame:
+    """Carrega os agendamentos futuros (future_transactions.csv) do usuário atual."""
+    return _load_table("future")
+
+
+def save_future(df: pd.DataFrame):
+    """Salva os agendamentos futuros e descarta exclusões de agendamentos apagados."""
+    with transaction() as tx:
+        _save_table(tx, "future", df.copy())
+        ids = df["ID"].dropna() if "ID" in df.columns else []
+        stale = load_future_exclusions().stale_schedules(ids)
+        if stale:
+            tx.drop_exclusions(stale)
+            _invalidate(tx, "exclusions")
+
+
+def load_future_exclusions() -> ExclusionIndex:
+    """Carrega o índice de instâncias futuras já realizadas/removidas."""
+    storage = get_storage()
+    return cache.get_table(storage, "exclusions", storage.load_exclusions)
+
+
+def save_future_exclusions(index: ExclusionIndex):
+    """Salva o índice completo de exclusões de instâncias futuras."""
+    with transaction() as tx:
+        tx.save_exclusions(index)
+        tx.on_commit(lambda: cache.put_table(tx.backend, "exclusions", index))
+
+
+def add_future_exclusions(pairs):
+    """Marca instâncias (sched_id, data) como realizadas/removidas, sem regravar o índice."""
+    pairs = list(pairs)
+    if not pairs:
+        return
+    with transaction() as tx:
+        tx.add_exclusions(pairs)
+        _invalidate(tx, "exclusions")
+
+
+def next_history_id() -> int:
+    """Próximo ID livre do histórico."""
+    hist = load_history()
+    return 1 if hist.empty else int(pd.to_numeric(hist["ID"], errors="coerce").max()) + 1
+
+
+def post_occurrences(occ: pd.DataFrame) -> dict:
+    """Lança ocorrências de agendamentos em lote (ver data/posting.py).
+
+    Saldos, linhas do histórico e exclusões são gravados em um único commit.
+    Retorna o plano com os contadores executed/skipped/missing.
+    """
+    with transaction():
+        plano = plan_postings(occ, load_data(), next_history_id())
+        if plano["executed"]:
+            save_data(plano["accounts"])
+            append_history(plano["history"])
+            add_future_exclusions(plano["exclusions"])
+    return plano
+
+
+def post_due(banco_id: int = None, until: date = None) -> dict:
+    """Lança todas as instâncias pendentes com data até `until` (hoje), de todos os
+    agendamentos ou só dos de uma conta."""
+    with transaction():
+        fut = load_future()
+        if banco_id is not None:
+            fut = fut[pd.to_numeric(fut["BancoID"], errors="coerce") == int(banco_id)]
+        occ = expand_schedules(fut, end=until or date.today(), exclusions=load_future_exclusions())
+        return post_occurrences(occ)
+
+
+def import_statement(source, banco_id: int, name: str = None) -> dict:
+    """Importa um extrato CSV/OFX para a conta `banco_id` (ver data/importer.py).
+
+    Grava em commits próprios por bloco: não chame dentro de `transaction()`.
+    """
+    get_storage()
+    return importer.import_statement(get_user_folder(), banco_id, source, name)
 
 
 def add_entry(tipo: str, nome: str, saldo: float, detalhes: str = ""):
     """Adiciona uma nova conta ao db.csv do usuário."""
-    df = load_data()
+    with transaction() as tx:
+        return _add_entry(tx, tipo, nome, saldo, detalhes)
+
+
+def _add_entry(tx: UnitOfWork, tipo: str, nome: str, saldo: float, detalhes: str):
+    index = get_account_index()
+    # contas já incluídas nesta transação: o índice só as vê depois do commit
+    pendentes = [arg for kind, table, arg in tx.ops if kind == "append_rows" and table == "accounts"]
 
     # Evitar duplicação de bancos
-    if tipo == "Banco":
-        duplicado = df[(df["Tipo"] == "Banco") & (df["Nome"].str.lower() == nome.lower())]
-        if not duplicado.empty:
-            return {"duplicado": True, "df": df}
+    if tipo == "Banco" and (index.exists("Banco", nome) or any(
+            ((p["Tipo"] == "Banco") & (p["Nome"].map(normalize_name) == normalize_name(nome))).any()
+            for p in pendentes)):
+        return {"duplicado": True, "df": load_data()}
 
-    new_id = 1 if df.empty else df["ID"].max() + 1
+    new_id = max([index.next_id()] + [int(p["ID"].max()) + 1 for p in pendentes])
     novo = pd.DataFrame([{
         "ID": new_id,
         "Tipo": tipo,
@@ -47,26 +348,105 @@ def add_entry(tipo: str, nome: str, saldo: float, detalhes: str = ""):
         "Detalhes": detalhes
     }])
 
-    df = pd.concat([df, novo], ignore_index=True)
-    save_data(df)
+    tx.append_rows("accounts", novo)
+    _invalidate(tx, "accounts")
+    tx.on_commit(lambda: get_ledger().adjust_opening(new_id, saldo))
     return {"duplicado": False}
 
 
 def update_balance(nome: str, tipo: str, delta: float):
     """Atualiza o saldo de uma conta."""
-    df = load_data()
-    mask = (df["Nome"].str.lower() == nome.lower()) & (df["Tipo"] == tipo)
-    if not any(mask):
-        return False
-    df.loc[mask, "Saldo"] += delta
-    save_data(df)
-    return True
+    with transaction() as tx:
+        df = load_data()
+        index = get_account_index()
+        pos = index.positions(tipo, nome)
+        if not pos:
+            return False
+        ids = [index.ids[p] for p in pos]
+        saldos = df["Saldo"].to_numpy()
+        for p, i in zip(pos, ids):
+            tx.update_rows("accounts", i, {"Saldo": float(saldos[p]) + delta})
+        _invalidate(tx, "accounts")
+
+        def adjust():
+            ledger = get_ledger()
+            for i in ids:
+                ledger.adjust_opening(i, delta)
+        tx.on_commit(adjust)
+        return True
 
 
 def get_summary():
     """Retorna o resumo de saldos do usuário atual."""
-    df = load_data()
-    total_bancos = df[df["Tipo"] == "Banco"]["Saldo"].sum()
-    total_invest = df[df["Tipo"] == "Investimento"]["Saldo"].sum()
-    total_geral = total_bancos + total_invest
-    return total_bancos, total_invest, total_geral
+    return get_context().totals()
+
+
+class UserContext:
+    """Dados do usuário atual compartilhados pelas páginas.
+
+    Cada tabela é carregada uma vez e as visões derivadas (contas por tipo,
+    totais, mapa nome→ID, índice de contas) são calculadas na primeira vez que alguma página
+    pede. Tudo fica no cache da sessão, indexado pelas assinaturas das tabelas
+    de que o valor depende e pelo contador de escritas, então qualquer gravação
+    descarta as visões afetadas. Os valores são compartilhados entre páginas e
+    reruns: só leia; para alterar, use load_*/save_* dentro de `transaction()`.
+    """
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.folder = storage.folder
+        self.user = self.folder.name
+
+    def _signature(self, tables):
+        return cache.generation(), tuple(self.storage.signature(t) for t in tables)
+
+    def _memo(self, name: str, tables, loader):
+        return cache.get_value(self.folder, f"context:{name}", self._signature(tables), loader)
+
+    def store(self, name: str, tables, value):
+        """Substitui uma visão por uma versão já atualizada para o estado atual das tabelas."""
+        cache.put_value(self.folder, f"context:{name}", self._signature(tables), value)
+
+    @property
+    def accounts(self) -> pd.DataFrame:
+        return self._memo("accounts", ("accounts",), load_data)
+
+    @property
+    def history(self) -> pd.DataFrame:
+        return self._memo("history", ("history",), load_history)
+
+    @property
+    def future(self) -> pd.DataFrame:
+        return self._memo("future", ("future",), load_future)
+
+    @property
+    def exclusions(self) -> ExclusionIndex:
+        return self._memo("exclusions", ("exclusions",), load_future_exclusions)
+
+    @property
+    def account_index(self) -> AccountIndex:
+        return self._memo("account_index", ("accounts",), lambda: AccountIndex(self.accounts))
+
+    def by_type(self, tipo: str) -> pd.DataFrame:
+        """Contas de um Tipo ("Banco" ou "Investimento")."""
+        return self._memo(f"tipo:{tipo}", ("accounts",), lambda: self.accounts[self.accounts["Tipo"] == tipo])
+
+    def totals(self):
+        """(total em bancos, total investido, patrimônio total)."""
+        def calc():
+            total_bancos = self.by_type("Banco")["Saldo"].sum()
+            total_invest = self.by_type("Investimento")["Saldo"].sum()
+            return total_bancos, total_invest, total_bancos + total_invest
+        return self._memo("totals", ("accounts",), calc)
+
+    def account_ids(self, tipo: str) -> dict:
+        """Nome → ID das contas de um Tipo (com nomes repetidos, vale a primeira conta)."""
+        def calc():
+            df = self.by_type(tipo).drop_duplicates("Nome")
+            return dict(zip(df["Nome"].astype(str), df["ID"].astype(int)))
+        return self._memo(f"ids:{tipo}", ("accounts",), calc)
+
+
+def get_context() -> UserContext:
+    """Contexto de dados do usuário atual (ver UserContext)."""
+    return UserContext(get_storage())
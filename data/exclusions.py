@@ -0,0 +1,118 @@
+# data/exclusions.py
+"""Índice das instâncias futuras já realizadas ou removidas.
+
+Cada exclusão é o par (ID do agendamento, ordinal da data), com o ordinal de
+`date.toordinal()`. O índice agrupa os ordinais por agendamento, permite
+consultas por agendamento, checagem vetorizada de várias ocorrências de uma
+vez e remoção dos agendamentos que não existem mais.
+
+Formato em disco (future_exclusions.json):
+    {"version": 2, "schedules": {"<sched_id>": [ordinal, ...]}}
+O formato antigo (lista de "{sched_id}_{YYYY-MM-DD}") é lido e convertido
+automaticamente.
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+FORMAT_VERSION = 2
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+_ORD_BITS = 20  # ordinais cabem em 20 bits até o ano 2870
+
+
+def to_ordinal(d) -> int:
+    return pd.Timestamp(d).date().toordinal()
+
+
+def _packed(sched_ids: np.ndarray, ordinals: np.ndarray) -> np.ndarray:
+    return (sched_ids.astype(np.int64) << _ORD_BITS) | ordinals.astype(np.int64)
+
+
+class ExclusionIndex:
+    """Mapa sched_id -> conjunto de ordinais excluídos."""
+
+    def __init__(self, by_schedule: dict = None):
+        self.by_schedule = {int(k): set(v) for k, v in (by_schedule or {}).items()}
+        self._packed_cache = None
+
+    # --- construção / serialização ---
+    @classmethod
+    def from_legacy(cls, keys) -> "ExclusionIndex":
+        """Converte a lista antiga de chaves "{sched_id}_{YYYY-MM-DD}"."""
+        index = cls()
+        for key in keys:
+            sched_id, _, day = str(key).partition("_")
+            try:
+                index.add(int(sched_id), date.fromisoformat(day))
+            except ValueError:
+                continue
+        return index
+
+    @classmethod
+    def from_json(cls, data) -> "ExclusionIndex":
+        if isinstance(data, list):
+            return cls.from_legacy(data)
+        return cls(data.get("schedules", {}))
+
+    def to_json(self) -> dict:
+        return {
+            "version": FORMAT_VERSION,
+            "schedules": {str(k): sorted(v) for k, v in sorted(self.by_schedule.items()) if v},
+        }
+
+    def pairs(self):
+        """Itera sobre (sched_id, ordinal)."""
+        for sched_id, ords in self.by_schedule.items():
+            for o in ords:
+                yield sched_id, o
+
+    def copy(self) -> "ExclusionIndex":
+        return ExclusionIndex(self.by_schedule)
+
+    def __len__(self):
+        return sum(len(v) for v in self.by_schedule.values())
+
+    # --- consultas ---
+    def contains(self, sched_id: int, day) -> bool:
+        return to_ordinal(day) in self.by_schedule.get(int(sched_id), ())
+
+    def for_schedule(self, sched_id: int) -> set:
+        """Ordinais excluídos de um agendamento."""
+        return self.by_schedule.get(int(sched_id), set())
+
+    def mask(self, sched_ids, days) -> np.ndarray:
+        """Vetor booleano: True onde (sched_id, data) está excluído."""
+        sched_ids = np.asarray(sched_ids, dtype=np.int64)
+        if sched_ids.size == 0 or not self.by_schedule:
+            return np.zeros(sched_ids.size, dtype=bool)
+        epoch_days = np.asarray(days, dtype="datetime64[D]").astype(np.int64)
+        if self._packed_cache is None:
+            pairs = np.array(list(self.pairs()), dtype=np.int64).reshape(-1, 2)
+            self._packed_cache = np.sort(_packed(pairs[:, 0], pairs[:, 1]))
+        return np.isin(_packed(sched_ids, epoch_days + EPOCH_ORDINAL), self._packed_cache)
+
+    # --- alterações ---
+    def add(self, sched_id: int, day) -> bool:
+        """Inclui uma exclusão; retorna False se ela já existia."""
+        ordinal = day if isinstance(day, (int, np.integer)) else to_ordinal(day)
+        ords = self.by_schedule.setdefault(int(sched_id), set())
+        if ordinal in ords:
+            return False
+        ords.add(int(ordinal))
+        self._packed_cache = None
+        return True
+
+    def drop_schedules(self, sched_ids) -> int:
+        """Remove todas as exclusões dos agendamentos informados."""
+        removed = 0
+        for sched_id in sched_ids:
+            removed += len(self.by_schedule.pop(int(sched_id), ()))
+        if removed:
+            self._packed_cache = None
+        return removed
+
+    def stale_schedules(self, valid_ids) -> list:
+        """Agendamentos com exclusões que não existem mais entre `valid_ids`."""
+        valid = {int(i) for i in valid_ids}
+        return [s for s in self.by_schedule if s not in valid]
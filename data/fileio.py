@@ -0,0 +1,30 @@
+# data/fileio.py
+"""Escrita atômica de arquivos: grava em um temporário na mesma pasta e troca com os.replace."""
+import os
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+
+def atomic_write(path: Path, write):
+    """Chama `write(f)` sobre um arquivo temporário e o renomeia para `path` ao final."""
+    path = Path(path)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def atomic_write_text(path: Path, text: str):
+    atomic_write(path, lambda f: f.write(text))
+
+
+def atomic_write_csv(path: Path, df: pd.DataFrame):
+    atomic_write(path, lambda f: df.to_csv(f, index=False))
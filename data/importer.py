@@ -0,0 +1,427 @@
+# data/importer.py
+"""Importação de extratos bancários (CSV ou OFX) para o histórico.
+
+O arquivo é lido em blocos (`chunk` linhas por vez), então a memória não
+depende do tamanho do extrato. Cada bloco vira linhas de history.csv da
+conta escolhida: valores positivos são "Depósito", negativos "Retirada"
+(Valor sempre positivo), com Categoria e Descrição do arquivo quando
+existirem. O saldo da conta recebe a soma do bloco de uma vez, e cada bloco
+é gravado em um único commit (data/transaction.py). O extrato do banco é a
+referência, então a regra de saldo insuficiente não se aplica aqui.
+
+Linhas já importadas são puladas por um índice de hashes de
+(conta, dia, valor em centavos, descrição normalizada) com a contagem de
+cada chave: a n-ésima ocorrência de uma chave no arquivo só é nova se o
+histórico tiver menos de n linhas iguais. Assim duas compras idênticas no
+mesmo dia entram as duas, e reimportar o mesmo extrato (ou um que se
+sobrepõe ao anterior) não duplica nada. O índice é derivado do histórico e
+fica em cache em `import_index.npz`, refeito quando o histórico mudar por
+fora.
+
+CSV: separador detectado; colunas reconhecidas pelo nome (data, descrição/
+histórico/memo, valor ou débito/crédito, categoria), números no formato
+brasileiro ou americano. OFX (1.x SGML ou 2.x XML): blocos <STMTTRN> com
+DTPOSTED, TRNAMT e MEMO/NAME.
+
+Codificação: UTF-8 (com ou sem BOM) quando o arquivo inteiro for UTF-8
+válido; senão Windows-1252 (Latin-1), comum em extratos de bancos
+brasileiros. `--encoding` força outra.
+
+Uso em linha de comando:
+    python -m data.importer <usuário> <ID da conta> <arquivo.csv|arquivo.ofx> [--chunk 20000] [--encoding cp1252]
+    python -m data.importer bench [linhas]
+    python -m data.importer check
+"""
+import argparse
+import codecs
+import csv
+import io
+import json
+import re
+import sys
+import tempfile
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.ledger import Ledger
+from data.locking import user_lock
+from data.rates import _dates, _number, to_days
+from data.rollup import Rollup
+from data.storage import HISTORY_COLUMNS, get_backend
+from data.transaction import UnitOfWork, pending, recover
+from data.vectorized import signed_amounts
+
+INDEX_FILE = "import_index.npz"
+DEFAULT_CHUNK = 20_000
+
+# nomes de coluna aceitos (comparados sem acento e em minúsculas)
+DATE_COLUMNS = ("data", "date", "data lancamento", "data do lancamento", "dtposted")
+DESC_COLUMNS = ("descricao", "historico", "description", "memo", "lancamento", "estabelecimento", "name")
+AMOUNT_COLUMNS = ("valor", "amount", "value", "valor (r$)", "trnamt")
+DEBIT_COLUMNS = ("debito", "debit", "saida", "valor debito")
+CREDIT_COLUMNS = ("credito", "credit", "entrada", "valor credito")
+CATEGORY_COLUMNS = ("categoria", "category")
+# tentadas em ordem; a última (Windows-1252) é o padrão dos extratos que não são UTF-8
+ENCODINGS = ("utf-8-sig", "cp1252")
+
+
+# --- índice de linhas já importadas ---
+def _keys(banco_id, dias, centavos, descricao) -> np.ndarray:
+    """Hash (uint64) de (conta, dia, centavos, descrição normalizada) por linha."""
+    desc = pd.Series(descricao, dtype=object).fillna("").astype(str).str.casefold()
+    desc = desc.str.replace(r"\s+", " ", regex=True).str.strip()
+    df = pd.DataFrame({
+        "b": np.broadcast_to(np.asarray(banco_id, dtype=np.int64), len(desc)),
+        "d": np.asarray(dias, dtype=np.int64),
+        "c": np.asarray(centavos, dtype=np.int64),
+        "s": desc.to_numpy(),
+    })
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+class ImportIndex:
+    """Contagem de linhas do histórico por chave, em arrays ordenados (busca binária)."""
+
+    def __init__(self, keys: np.ndarray = None, counts: np.ndarray = None):
+        self.keys = np.zeros(0, dtype=np.uint64) if keys is None else keys
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else counts
+
+    @classmethod
+    def from_keys(cls, keys: np.ndarray) -> "ImportIndex":
+        keys, counts = np.unique(keys, return_counts=True)
+        return cls(keys, counts.astype(np.int64))
+
+    @classmethod
+    def from_history(cls, hist: pd.DataFrame) -> "ImportIndex":
+        if hist.empty:
+            return cls()
+        centavos = np.round(signed_amounts(hist["Valor"], hist["Operação"]) * 100)
+        banco = pd.to_numeric(hist["BancoID"], errors="coerce").fillna(-1).to_numpy(dtype=np.int64)
+        return cls.from_keys(_keys(banco, to_days(hist["Data"]), centavos, hist["Descrição"]))
+
+    def count(self, keys: np.ndarray) -> np.ndarray:
+        """Quantas linhas do histórico têm cada chave (0 se nenhuma)."""
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return np.where(self.keys[pos] == keys, self.counts[pos], 0)
+
+    def add(self, keys: np.ndarray):
+        novo = ImportIndex.from_keys(keys)
+        todas = np.concatenate([self.keys, novo.keys])
+        contagens = np.concatenate([self.counts, novo.counts])
+        self.keys, pos = np.unique(todas, return_inverse=True)
+        self.counts = np.bincount(pos, contagens, minlength=len(self.keys)).astype(np.int64)
+
+    def save(self, path: Path, signature):
+        tmp = Path(path).with_suffix(".tmp.npz")
+        np.savez(tmp, keys=self.keys, counts=self.counts, sig=np.array(json.dumps(signature)))
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, folder: Path, backend) -> "ImportIndex":
+        """Índice da pasta; refeito a partir do histórico se o cache não for da versão atual."""
+        path = Path(folder) / INDEX_FILE
+        sig = backend.signature("history")
+        if path.exists():
+            with np.load(path) as data:
+                if str(data["sig"]) == json.dumps(sig):
+                    return cls(data["keys"], data["counts"])
+        index = cls.from_history(backend.load_table("history"))
+        index.save(path, sig)
+        return index
+
+
+class _Ordinals:
+    """Quantas vezes cada chave já apareceu no arquivo (n-ésima ocorrência de cada linha)."""
+
+    def __init__(self):
+        self.index = ImportIndex()
+
+    def next(self, keys: np.ndarray) -> np.ndarray:
+        # ordem dentro do bloco + ocorrências dos blocos anteriores
+        s = pd.Series(keys)
+        n = s.groupby(s, sort=False).cumcount().to_numpy() + 1 + self.index.count(keys)
+        self.index.add(keys)
+        return n
+
+
+# --- leitura dos arquivos ---
+def _plain(name: str) -> str:
+    sem_acento = unicodedata.normalize("NFKD", str(name)).encode("ascii", "ignore").decode()
+    return sem_acento.strip().strip('"').lower()
+
+
+def _pick(columns, names):
+    plain = {_plain(c): c for c in columns}
+    return next((plain[n] for n in names if n in plain), None)
+
+
+def _detect_encoding(raw, block: int = 1 << 20) -> str:
+    """Primeira de ENCODINGS que decodifica o arquivo inteiro (lido em pedaços)."""
+    for encoding in ENCODINGS[:-1]:
+        decoder = codecs.getincrementaldecoder(encoding)()
+        raw.seek(0)
+        try:
+            for pedaco in iter(lambda: raw.read(block), b""):
+                decoder.decode(pedaco)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            continue
+        finally:
+            raw.seek(0)
+        return encoding
+    return ENCODINGS[-1]
+
+
+def _open_text(source, encoding: str = None) -> io.TextIOBase:
+    if isinstance(source, io.TextIOBase):
+        return source
+    raw = open(source, "rb") if isinstance(source, (str, Path)) else source
+    encoding = encoding or _detect_encoding(raw)
+    return io.TextIOWrapper(raw, encoding=encoding, errors="replace", newline="")
+
+
+def read_csv_chunks(source, chunk: int = DEFAULT_CHUNK, encoding: str = None):
+    """Blocos (Data, Valor com sinal, Descrição, Categoria) de um extrato CSV."""
+    text = _open_text(source, encoding)
+    try:
+        sep = csv.Sniffer().sniff(text.readline(), delimiters=",;\t|").delimiter
+    except csv.Error:
+        sep = ","
+    text.seek(0)
+    leitor = pd.read_csv(text, sep=sep, dtype=str, chunksize=chunk, skipinitialspace=True, keep_default_na=False)
+    colunas = None
+    for bloco in leitor:
+        if colunas is None:
+            colunas = {
+                "data": _pick(bloco.columns, DATE_COLUMNS),
+                "desc": _pick(bloco.columns, DESC_COLUMNS),
+                "valor": _pick(bloco.columns, AMOUNT_COLUMNS),
+                "debito": _pick(bloco.columns, DEBIT_COLUMNS),
+                "credito": _pick(bloco.columns, CREDIT_COLUMNS),
+                "cat": _pick(bloco.columns, CATEGORY_COLUMNS),
+            }
+            if not colunas["data"] or not (colunas["valor"] or colunas["debito"] or colunas["credito"]):
+                raise ValueError(f"Colunas de data/valor não encontradas no CSV: {list(bloco.columns)}.")
+        if colunas["valor"]:
+            valor = _number(bloco[colunas["valor"]])
+        else:
+            credito = _number(bloco[colunas["credito"]]).fillna(0.0) if colunas["credito"] else 0.0
+            debito = _number(bloco[colunas["debito"]]).abs().fillna(0.0) if colunas["debito"] else 0.0
+            valor = credito - debito
+        yield pd.DataFrame({
+            "Data": _dates(bloco[colunas["data"]]),
+            "Valor": valor,
+            "Descrição": bloco[colunas["desc"]].str.strip() if colunas["desc"] else "",
+            "Categoria": bloco[colunas["cat"]].str.strip() if colunas["cat"] else "",
+        })
+
+
+_OFX_TAG = re.compile(r"<(\w+)>([^<\r\n]*)")
+
+
+def _ofx_transactions(text, block: int = 1 << 16):
+    """Gera um dict de tags por <STMTTRN>, lendo o arquivo em pedaços."""
+    resto = ""
+    while True:
+        pedaco = text.read(block)
+        resto += pedaco
+        partes = re.split(r"</STMTTRN>", resto, flags=re.IGNORECASE)
+        # o último pedaço pode estar incompleto: fica para a próxima leitura (ou é o rodapé)
+        resto = partes.pop()
+        for parte in partes:
+            inicio = parte.upper().rfind("<STMTTRN>")
+            if inicio >= 0:
+                yield {k.upper(): v.strip() for k, v in _OFX_TAG.findall(parte[inicio + 9:])}
+        if not pedaco:
+            # OFX 1.x (SGML) pode omitir </STMTTRN>: cada <STMTTRN> abre uma transação
+            for parte in re.split(r"<STMTTRN>", resto, flags=re.IGNORECASE)[1:]:
+                tags = {k.upper(): v.strip() for k, v in _OFX_TAG.findall(parte)}
+                if "TRNAMT" in tags:
+                    yield tags
+            return
+
+
+def read_ofx_chunks(source, chunk: int = DEFAULT_CHUNK, encoding: str = None):
+    """Blocos (Data, Valor com sinal, Descrição, Categoria) de um extrato OFX."""
+    linhas = []
+    for trn in _ofx_transactions(_open_text(source, encoding)):
+        linhas.append((trn.get("DTPOSTED", "")[:8], trn.get("TRNAMT", ""), trn.get("MEMO") or trn.get("NAME", "")))
+        if len(linhas) == chunk:
+            yield _ofx_frame(linhas)
+            linhas = []
+    if linhas:
+        yield _ofx_frame(linhas)
+
+
+def _ofx_frame(linhas) -> pd.DataFrame:
+    datas, valores, desc = zip(*linhas)
+    return pd.DataFrame({
+        "Data": pd.to_datetime(pd.Series(datas), format="%Y%m%d", errors="coerce"),
+        "Valor": _number(pd.Series(valores)),
+        "Descrição": list(desc),
+        "Categoria": "",
+    })
+
+
+def read_statement(source, name: str = None, chunk: int = DEFAULT_CHUNK, encoding: str = None):
+    """Blocos do extrato; o formato vem da extensão de `name` (ou do caminho)."""
+    name = str(name or source)
+    if name.lower().endswith((".ofx", ".qfx")):
+        return read_ofx_chunks(source, chunk, encoding)
+    return read_csv_chunks(source, chunk, encoding)
+
+
+# --- importação ---
+def import_statement(folder: Path, banco_id: int, source, name: str = None, chunk: int = DEFAULT_CHUNK,
+                     encoding: str = None) -> dict:
+    """Importa o extrato para a conta `banco_id` da pasta do usuário.
+
+    Sem `encoding`, a codificação é detectada (UTF-8 ou Windows-1252).
+
+    Retorna contadores: read (linhas lidas), imported, duplicates, invalid
+    (sem data ou valor), amount (efeito no saldo), seconds e rows_per_sec.
+    """
+    folder = Path(folder)
+    inicio = time.perf_counter()
+    stats = {"read": 0, "imported": 0, "duplicates": 0, "invalid": 0, "amount": 0.0}
+    with user_lock(folder):
+        backend = get_backend(folder)
+        if pending(folder):
+            recover(folder, backend)
+        accounts = backend.load_table("accounts")
+        conta = accounts[pd.to_numeric(accounts["ID"], errors="coerce") == int(banco_id)]
+        if conta.empty:
+            raise ValueError(f"Conta {banco_id} não encontrada.")
+        tipo, nome = conta["Tipo"].iloc[0], conta["Nome"].iloc[0]
+        index = ImportIndex.load(folder, backend)
+        ledger, rollup = Ledger.load(folder), Rollup.load(folder)
+        next_id = backend.next_id("history")
+        ordinais = _Ordinals()
+
+        for bloco in read_statement(source, name, chunk, encoding):
+            stats["read"] += len(bloco)
+            ok = bloco["Data"].notna().to_numpy() & bloco["Valor"].notna().to_numpy()
+            stats["invalid"] += int((~ok).sum())
+            bloco = bloco[ok]
+            centavos = np.round(bloco["Valor"].to_numpy(dtype=float) * 100).astype(np.int64)
+            chaves = _keys(int(banco_id), to_days(bloco["Data"]), centavos, bloco["Descrição"].to_numpy())
+            novas = ordinais.next(chaves) > index.count(chaves)
+            stats["duplicates"] += int((~novas).sum())
+            bloco, centavos, chaves = bloco[novas], centavos[novas], chaves[novas]
+            if bloco.empty:
+                continue
+
+            rows = pd.DataFrame({
+                "ID": np.arange(next_id, next_id + len(bloco), dtype=np.int64),
+                "BancoID": int(banco_id),
+                "Tipo": tipo,
+                "Nome": nome,
+                "Data": bloco["Data"].dt.strftime("%Y-%m-%d 00:00:00").to_numpy(),
+                "Operação": np.where(centavos >= 0, "Depósito", "Retirada"),
+                "Valor": np.abs(centavos) / 100,
+                "Categoria": bloco["Categoria"].to_numpy(),
+                "Descrição": bloco["Descrição"].to_numpy(),
+            }, columns=HISTORY_COLUMNS)
+            delta = int(centavos.sum()) / 100
+            mask = pd.to_numeric(accounts["ID"], errors="coerce") == int(banco_id)
+            accounts.loc[mask, "Saldo"] = round(float(accounts.loc[mask, "Saldo"].iloc[0]) + delta, 2)
+
+            tx = UnitOfWork(backend)
+            tx.save_table("accounts", accounts)
+            tx.append_rows("history", rows)
+            tx.on_commit(lambda rows=rows: (ledger.apply(added=rows), rollup.apply(added=rows)))
+            tx.commit()
+            index.add(chaves)
+            next_id += len(rows)
+            stats["imported"] += len(rows)
+            stats["amount"] += delta
+
+        index.save(folder / INDEX_FILE, backend.signature("history"))
+    stats["seconds"] = time.perf_counter() - inicio
+    stats["rows_per_sec"] = stats["read"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+# --- benchmark ---
+def _bench(rows: int = 100_000, chunk: int = DEFAULT_CHUNK):
+    """Importa um extrato sintético duas vezes (a segunda só encontra duplicadas)."""
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "bench"
+        folder.mkdir()
+        pd.DataFrame([{"ID": 1, "Tipo": "Banco", "Nome": "Extrato", "Saldo": 0.0, "Detalhes": ""}]).to_csv(folder / "db.csv", index=False)
+        arquivo = Path(tmp) / "extrato.csv"
+        datas = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 5 * 365, rows), unit="D")
+        valores = rng.normal(0, 300, rows).round(2)
+        pd.DataFrame({
+            "Data": datas.strftime("%d/%m/%Y"),
+            "Descrição": rng.choice(["PIX RECEBIDO", "COMPRA CARTAO", "PAGAMENTO BOLETO", "TARIFA"], rows),
+            "Valor": [f"{v:.2f}".replace(".", ",") for v in valores],
+        }).to_csv(arquivo, sep=";", index=False)
+        for rodada in ("primeira", "reimportação"):
+            r = import_statement(folder, 1, arquivo, chunk=chunk)
+            print(f"{rodada:>13}: {r['read']} linha(s), {r['imported']} nova(s), {r['duplicates']} duplicada(s) "
+                  f"em {r['seconds']:.2f}s ({r['rows_per_sec']:,.0f} linhas/s)")
+        saldo = get_backend(folder).load_table("accounts")["Saldo"].iloc[0]
+        assert round(saldo, 2) == round(valores.sum(), 2), (saldo, valores.sum())
+
+
+def _check():
+    """Importa o mesmo extrato em Windows-1252 e em UTF-8: acentos preservados e nenhuma duplicata nova."""
+    linhas = [
+        "Data;Histórico;Débito;Crédito",
+        "02/01/2024;Padaria São João;12,50;",
+        "03/01/2024;Café & Açúcar Ltda;8,90;",
+        "05/01/2024;Transferência recebida;;1.500,00",
+    ]
+    texto = "\r\n".join(linhas) + "\r\n"
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = Path(tmp) / "check"
+        folder.mkdir()
+        pd.DataFrame([{"ID": 1, "Tipo": "Banco", "Nome": "Extrato", "Saldo": 0.0, "Detalhes": ""}]).to_csv(folder / "db.csv", index=False)
+        latin = Path(tmp) / "latin1.csv"
+        latin.write_bytes(texto.encode("cp1252"))
+        assert _detect_encoding(io.BytesIO(latin.read_bytes())) == "cp1252"
+        r = import_statement(folder, 1, latin)
+        assert (r["imported"], r["invalid"]) == (3, 0), r
+        hist = get_backend(folder).load_table("history")
+        descricoes = hist["Descrição"].astype(str).tolist()
+        assert descricoes == ["Padaria São João", "Café & Açúcar Ltda", "Transferência recebida"], descricoes
+        # mesmo extrato em UTF-8 com BOM (pelo upload, como bytes): as chaves batem, nada entra de novo
+        r = import_statement(folder, 1, io.BytesIO(texto.encode("utf-8-sig")), "extrato.csv")
+        assert (r["imported"], r["duplicates"]) == (0, 3), r
+        saldo = get_backend(folder).load_table("accounts")["Saldo"].iloc[0]
+        assert round(saldo, 2) == 1478.60, saldo
+    print(f"OK: extrato Windows-1252 importado com acentos ({descricoes[1]!r}); "
+          f"a versão UTF-8 do mesmo extrato só encontrou duplicadas.")
+
+
+def _main(argv):
+    if argv and argv[0] == "bench":
+        _bench(int(argv[1]) if len(argv) > 1 else 100_000)
+        return 0
+    if argv and argv[0] == "check":
+        _check()
+        return 0
+    parser = argparse.ArgumentParser(prog="python -m data.importer", description=__doc__.splitlines()[0])
+    parser.add_argument("user")
+    parser.add_argument("account_id", type=int)
+    parser.add_argument("file", type=Path)
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK)
+    parser.add_argument("--encoding", help="codificação do arquivo (padrão: UTF-8 ou Windows-1252, detectada)")
+    args = parser.parse_args(argv)
+    r = import_statement(Path("data/data_users") / args.user, args.account_id, args.file, chunk=args.chunk,
+                         encoding=args.encoding)
+    print(f"OK: {r['read']} linha(s) lida(s), {r['imported']} importada(s), {r['duplicates']} duplicada(s), "
+          f"{r['invalid']} inválida(s); saldo {r['amount']:+,.2f} em {r['seconds']:.2f}s ({r['rows_per_sec']:,.0f} linhas/s).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,171 @@
+# data/journal.py
+"""Journal append-only para tabelas em CSV (usado pelo history.csv).
+
+Cada operação (inclusão, edição ou exclusão de linhas) vira uma linha JSON
+acrescentada ao arquivo `<tabela>.journal`, com flush + fsync. A tabela lógica
+é o CSV base com o journal reaplicado por cima. Quando o journal passa de
+COMPACT_THRESHOLD registros, ele é incorporado ao CSV (escrita atômica) e
+zerado.
+
+A reaplicação é idempotente (inclusões de um ID já presente são ignoradas),
+então uma compactação interrompida entre a troca do CSV e a limpeza do
+journal não duplica linhas.
+"""
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.fileio import atomic_write_csv
+from data.schema import set_cells
+
+COMPACT_THRESHOLD = 500
+
+
+def _jsonable(value):
+    """Converte valores do pandas/numpy para tipos serializáveis em JSON."""
+    if value is None or value is pd.NA:
+        return None
+    if isinstance(value, (pd.Timestamp,)):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        value = float(value)
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if value is pd.NaT:
+        return None
+    return value
+
+
+def _row_dict(row: dict) -> dict:
+    return {k: _jsonable(v) for k, v in row.items()}
+
+
+def _row_dicts(df: pd.DataFrame) -> list:
+    """`_row_dict` de cada linha, convertendo coluna a coluna (lotes grandes)."""
+    cols = {}
+    for col in df.columns:
+        s = df[col]
+        if pd.api.types.is_datetime64_any_dtype(s):
+            cols[col] = s.dt.strftime("%Y-%m-%d %H:%M:%S").astype(object).where(s.notna(), None).tolist()
+        elif isinstance(s.dtype, (pd.StringDtype, pd.CategoricalDtype, pd.Int64Dtype)) or pd.api.types.is_float_dtype(s):
+            cols[col] = s.astype(object).where(s.notna(), None).tolist()
+        elif pd.api.types.is_integer_dtype(s) or pd.api.types.is_bool_dtype(s):
+            cols[col] = s.tolist()
+        else:
+            cols[col] = [_jsonable(v) for v in s.tolist()]
+    return [dict(zip(cols, valores)) for valores in zip(*cols.values())]
+
+
+class Journal:
+    """Journal de operações sobre uma tabela CSV com coluna "ID"."""
+
+    def __init__(self, base_path: Path, columns):
+        self.base_path = Path(base_path)
+        self.path = self.base_path.with_suffix(".journal")
+        self.columns = list(columns)
+        self._count = None
+
+    # --- escrita ---
+    def _append(self, records: list):
+        if not records:
+            return
+        data = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+        if self._torn_tail():
+            # isola o registro truncado de uma escrita interrompida
+            data = "\n" + data
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._count is not None:
+            self._count += len(records)
+
+    def _torn_tail(self) -> bool:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except (FileNotFoundError, OSError):
+            return False
+
+    def add(self, rows: pd.DataFrame):
+        self._append([{"op": "add", "row": r} for r in _row_dicts(rows)])
+
+    def update(self, row_id: int, values: dict):
+        self._append([{"op": "update", "id": int(row_id), "values": _row_dict(values)}])
+
+    def delete(self, ids):
+        self._append([{"op": "delete", "ids": [int(i) for i in ids]}])
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+        self._count = 0
+
+    # --- leitura ---
+    def records(self) -> list:
+        """Lê o journal; registros truncados (queda no meio da escrita) são ignorados."""
+        if not self.path.exists():
+            return []
+        out = []
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    out.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return out
+
+    def count(self) -> int:
+        if self._count is None:
+            self._count = len(self.records())
+        return self._count
+
+    def replay(self, df: pd.DataFrame, records=None) -> pd.DataFrame:
+        """Aplica as operações do journal sobre o DataFrame base, em ordem."""
+        records = self.records() if records is None else records
+        if not records:
+            return df
+
+        ids = set(pd.to_numeric(df["ID"], errors="coerce").dropna().astype(int)) if not df.empty else set()
+        pending = []
+
+        def flush(df):
+            if pending:
+                novos = pd.DataFrame(pending, columns=self.columns)
+                df = novos if df.empty else pd.concat([df, novos], ignore_index=True)
+                pending.clear()
+            return df
+
+        for rec in records:
+            op = rec.get("op")
+            if op == "add":
+                row_id = rec["row"].get("ID")
+                if row_id is not None:
+                    if int(row_id) in ids:
+                        continue
+                    ids.add(int(row_id))
+                pending.append(rec["row"])
+            elif op == "update":
+                df = flush(df)
+                set_cells(df, df["ID"] == rec["id"], rec["values"])
+            elif op == "delete":
+                df = flush(df)
+                df = df[~df["ID"].isin(rec["ids"])].reset_index(drop=True)
+                ids.difference_update(rec["ids"])
+        return flush(df)
+
+    # --- compactação ---
+    def compact(self, df: pd.DataFrame):
+        """Grava a tabela lógica completa no CSV base e zera o journal."""
+        atomic_write_csv(self.base_path, df)
+        self.clear()
+
+    def needs_compaction(self) -> bool:
+        return self.count() >= COMPACT_THRESHOLD
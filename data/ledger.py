@@ -0,0 +1,158 @@
+# data/ledger.py
+"""Saldos materializados a partir do histórico (ledger).
+
+Para cada conta (BancoID) o ledger guarda:
+- net: soma dos efeitos do histórico (Depósito soma, Retirada subtrai);
+- opening: saldo que não vem do histórico (saldo inicial e ajustes manuais).
+
+O saldo esperado é opening + net. Cada escrita no histórico atualiza `net`
+de forma incremental; `rebuild` recalcula tudo de uma vez com NumPy e
+`verify` aponta as contas cujo Saldo no db.csv divergiu do histórico.
+
+Uso em linha de comando:
+    python -m data.ledger verify <usuário>
+    python -m data.ledger rebuild <usuário>
+"""
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.fileio import atomic_write_text
+from data.storage import get_backend
+from data.vectorized import signed_amounts
+
+LEDGER_FILE = "ledger.json"
+TOLERANCE = 0.005
+
+
+def signed_effects(hist: pd.DataFrame):
+    """Retorna (BancoID, efeito) como arrays; linhas sem BancoID são ignoradas."""
+    if hist.empty:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    banco = pd.to_numeric(hist["BancoID"], errors="coerce").to_numpy(dtype=float)
+    ok = ~np.isnan(banco)
+    return banco[ok].astype(np.int64), signed_amounts(hist["Valor"], hist["Operação"])[ok]
+
+
+def _sum_by_account(ids: np.ndarray, effects: np.ndarray) -> dict:
+    if ids.size == 0:
+        return {}
+    uniq, inv = np.unique(ids, return_inverse=True)
+    sums = np.bincount(inv, weights=effects, minlength=uniq.size)
+    return dict(zip(uniq.tolist(), sums.tolist()))
+
+
+class Ledger:
+    """Agregado de saldos por conta, persistido em ledger.json na pasta do usuário."""
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        self.path = self.folder / LEDGER_FILE
+        self.net = {}
+        self.opening = {}
+
+    # --- persistência ---
+    @classmethod
+    def load(cls, folder: Path) -> "Ledger":
+        """Carrega o ledger; na primeira vez ele é construído a partir das tabelas atuais."""
+        ledger = cls(folder)
+        if ledger.path.exists():
+            data = json.loads(ledger.path.read_text(encoding="utf-8"))
+            ledger.net = {int(k): v for k, v in data.get("net", {}).items()}
+            ledger.opening = {int(k): v for k, v in data.get("opening", {}).items()}
+        else:
+            backend = get_backend(folder)
+            ledger.rebuild(backend.load_table("history"), backend.load_table("accounts"))
+        return ledger
+
+    def save(self):
+        data = {
+            "net": {str(k): round(v, 6) for k, v in self.net.items()},
+            "opening": {str(k): round(v, 6) for k, v in self.opening.items()},
+        }
+        atomic_write_text(self.path, json.dumps(data, indent=2))
+
+    # --- atualizações incrementais ---
+    def apply(self, added: pd.DataFrame = None, removed: pd.DataFrame = None):
+        """Aplica linhas incluídas e removidas do histórico (uma edição = remoção + inclusão)."""
+        for df, sign in ((added, 1.0), (removed, -1.0)):
+            if df is None or df.empty:
+                continue
+            for banco_id, total in _sum_by_account(*signed_effects(df)).items():
+                self.net[banco_id] = self.net.get(banco_id, 0.0) + sign * total
+        self.save()
+
+    def adjust_opening(self, banco_id: int, delta: float):
+        """Registra uma alteração de saldo que não passa pelo histórico."""
+        banco_id = int(banco_id)
+        self.opening[banco_id] = self.opening.get(banco_id, 0.0) + delta
+        self.save()
+
+    def forget(self, banco_id: int):
+        """Remove uma conta excluída do ledger."""
+        self.net.pop(int(banco_id), None)
+        self.opening.pop(int(banco_id), None)
+        self.save()
+
+    # --- reconstrução e verificação ---
+    def rebuild(self, hist: pd.DataFrame, accounts: pd.DataFrame = None):
+        """Recalcula `net` a partir do histórico completo.
+
+        Contas sem opening registrado assumem opening = Saldo - net (sem
+        divergência). Contas que não existem mais em `accounts` são descartadas.
+        """
+        self.net = _sum_by_account(*signed_effects(hist))
+        if accounts is not None and not accounts.empty:
+            ids = pd.to_numeric(accounts["ID"], errors="coerce").astype(int).tolist()
+            saldos = pd.to_numeric(accounts["Saldo"], errors="coerce").fillna(0.0).tolist()
+            self.opening = {i: self.opening[i] if i in self.opening else s - self.net.get(i, 0.0)
+                            for i, s in zip(ids, saldos)}
+        self.save()
+
+    def balance(self, banco_id: int) -> float:
+        banco_id = int(banco_id)
+        return self.opening.get(banco_id, 0.0) + self.net.get(banco_id, 0.0)
+
+    def verify(self, accounts: pd.DataFrame) -> pd.DataFrame:
+        """Contas cujo Saldo difere de opening + net."""
+        if accounts.empty:
+            return pd.DataFrame(columns=["ID", "Nome", "Saldo", "Esperado", "Diferença"])
+        out = accounts[["ID", "Nome", "Saldo"]].copy()
+        ids = pd.to_numeric(out["ID"], errors="coerce").astype(int)
+        out["Esperado"] = ids.map(lambda i: self.balance(i)).astype(float)
+        out["Diferença"] = out["Saldo"].astype(float) - out["Esperado"]
+        return out[out["Diferença"].abs() > TOLERANCE].reset_index(drop=True)
+
+
+def verify_folder(folder: Path, rebuild: bool = False) -> pd.DataFrame:
+    """Recalcula (opcionalmente) o ledger da pasta e retorna as divergências."""
+    backend = get_backend(folder)
+    accounts = backend.load_table("accounts")
+    ledger = Ledger.load(folder)
+    if rebuild:
+        ledger.rebuild(backend.load_table("history"), accounts)
+    return ledger.verify(accounts)
+
+
+def _main(argv):
+    if len(argv) != 2 or argv[0] not in ("verify", "rebuild"):
+        print(__doc__)
+        return 2
+    folder = Path("data/data_users") / argv[1]
+    inicio = time.perf_counter()
+    drift = verify_folder(folder, rebuild=argv[0] == "rebuild")
+    ms = (time.perf_counter() - inicio) * 1000
+    if drift.empty:
+        print(f"OK: saldos conferem com o histórico ({ms:.1f} ms).")
+        return 0
+    print(drift.to_string(index=False))
+    print(f"{len(drift)} conta(s) divergente(s) ({ms:.1f} ms).")
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,72 @@
+# data/locking.py
+"""Lock consultivo (fcntl.flock) para ciclos de leitura-alteração-escrita.
+
+Cada pasta de usuário tem um arquivo `.lock`; enquanto o lock está com uma
+thread/processo, as outras esperam, tentando de novo com intervalos
+crescentes até `timeout`. O lock é reentrante dentro da mesma thread, então
+funções de data/db.py que chamam umas às outras (ex.: post_occurrences ->
+save_data) não se bloqueiam.
+
+O teste de concorrência (vários processos escrevendo na mesma pasta) fica em
+data/locking_stress.py.
+"""
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+LOCK_FILE = ".lock"
+DEFAULT_TIMEOUT = 10.0
+
+_held = threading.local()
+
+
+class LockTimeout(TimeoutError):
+    """O lock não foi obtido dentro do tempo limite."""
+
+
+def _acquire(path: Path, timeout: float):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    espera, limite = 0.005, time.monotonic() + timeout
+    while True:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return fd
+        except BlockingIOError:
+            if time.monotonic() >= limite:
+                os.close(fd)
+                raise LockTimeout(f"Não foi possível obter o lock {path} em {timeout:.0f}s.")
+            time.sleep(espera)
+            espera = min(espera * 2, 0.1)
+
+
+@contextmanager
+def file_lock(path: Path, timeout: float = DEFAULT_TIMEOUT):
+    """Segura o lock exclusivo de `path` (criado se não existir) durante o bloco."""
+    key = str(Path(path).resolve())
+    held = _held.__dict__.setdefault("locks", {})
+    if key in held:
+        fd, depth = held[key]
+        held[key] = (fd, depth + 1)
+        try:
+            yield
+        finally:
+            fd, depth = held[key]
+            held[key] = (fd, depth - 1)
+        return
+
+    fd = _acquire(Path(path), timeout)
+    held[key] = (fd, 1)
+    try:
+        yield
+    finally:
+        del held[key]
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def user_lock(folder: Path, timeout: float = DEFAULT_TIMEOUT):
+    """Lock da pasta de dados de um usuário."""
+    return file_lock(Path(folder) / LOCK_FILE, timeout)
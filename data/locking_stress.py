@@ -0,0 +1,86 @@
+# data/locking_stress.py
+"""Teste de concorrência do lock por usuário (data/locking.py).
+
+Vários processos fazem o mesmo ciclo de leitura-alteração-escrita (saldo de
+uma conta + uma linha no histórico) sobre uma pasta temporária, primeiro sem
+e depois com o lock, e o resultado é conferido: com o lock nenhuma
+atualização pode se perder.
+
+    python -m data.locking_stress [processos] [iterações]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+
+from data.locking import user_lock
+from data.storage import CSVBackend
+
+def _writer(folder: str, iterations: int, use_lock: bool):
+    backend = CSVBackend(Path(folder))
+    for _ in range(iterations):
+        with (user_lock(folder) if use_lock else _no_lock()):
+            accounts = backend.load_table("accounts")
+            accounts.loc[accounts["ID"] == 1, "Saldo"] += 1.0
+            backend.save_table("accounts", accounts)
+            backend.append_rows("history", pd.DataFrame([{
+                "ID": backend.next_id("history"), "BancoID": 1, "Tipo": "Banco", "Nome": "Stress",
+                "Data": "2025-01-01", "Operação": "Depósito", "Valor": 1.0, "Categoria": "", "Descrição": str(os.getpid()),
+            }]))
+
+
+@contextmanager
+def _no_lock():
+    yield
+
+
+def stress(processes: int = 8, iterations: int = 50, use_lock: bool = True) -> dict:
+    """Dispara `processes` escritores concorrentes sobre uma pasta temporária e confere o resultado."""
+    with tempfile.TemporaryDirectory() as folder:
+        pd.DataFrame([{"ID": 1, "Tipo": "Banco", "Nome": "Stress", "Saldo": 0.0, "Detalhes": ""}]).to_csv(
+            Path(folder) / "db.csv", index=False)
+        inicio = time.perf_counter()
+        procs = [multiprocessing.Process(target=_writer, args=(folder, iterations, use_lock)) for _ in range(processes)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        segundos = time.perf_counter() - inicio
+
+        backend = CSVBackend(Path(folder))
+        esperado = processes * iterations
+        saldo = float(backend.load_table("accounts")["Saldo"].iloc[0])
+        hist = backend.load_table("history")
+        return {
+            "esperado": esperado,
+            "saldo": saldo,
+            "linhas": len(hist),
+            "ids_unicos": int(hist["ID"].nunique()),
+            "falhas": sum(p.exitcode != 0 for p in procs),
+            "segundos": segundos,
+        }
+
+
+def _main(argv):
+    processes = int(argv[0]) if argv else 8
+    iterations = int(argv[1]) if len(argv) > 1 else 50
+    ok = True
+    for use_lock in (False, True):
+        r = stress(processes, iterations, use_lock)
+        perdas = r["esperado"] - r["saldo"]
+        print(f"{'com lock' if use_lock else 'sem lock'}: saldo {r['saldo']:.0f}/{r['esperado']}, "
+              f"{r['linhas']} linhas no histórico ({r['ids_unicos']} IDs únicos), "
+              f"{r['falhas']} processo(s) com erro, {r['segundos']:.2f}s")
+        if use_lock:
+            ok = perdas == 0 and r["linhas"] == r["ids_unicos"] == r["esperado"] and r["falhas"] == 0
+    print("OK: nenhuma atualização perdida com lock." if ok else "FALHA: atualizações perdidas com lock.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
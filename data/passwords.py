@@ -0,0 +1,129 @@
+# data/passwords.py
+"""Hash de senhas com sal e custo ajustável (hashlib.scrypt ou pbkdf2_hmac).
+
+Cada registro guarda o algoritmo e os parâmetros com que foi gerado:
+    scrypt$<n>$<r>$<p>$<sal>$<hash>
+    pbkdf2_sha256$<iterações>$<sal>$<hash>
+(sal e hash em base64). Registros antigos são o SHA-256 hexadecimal sem sal.
+
+O custo vem das variáveis de ambiente:
+    CASH_PASSWORD_HASH       "scrypt" (padrão) ou "pbkdf2"
+    CASH_SCRYPT_N            fator de custo do scrypt (potência de 2, padrão 16384)
+    CASH_PBKDF2_ITERATIONS   iterações do PBKDF2-SHA256 (padrão 600000)
+`needs_rehash` diz se um registro foi gerado com outro algoritmo ou custo;
+o login regrava a senha nesse caso, então o custo pode subir sem resetar ninguém.
+
+Benchmark (hashes por segundo em cada configuração):
+    python -m data.passwords
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sys
+import time
+
+DEFAULT_SCHEME = "scrypt"
+DEFAULT_SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+DEFAULT_PBKDF2_ITERATIONS = 600_000
+SALT_BYTES = 16
+HASH_BYTES = 32
+
+
+def settings() -> dict:
+    """Algoritmo e custo atuais (lidos do ambiente a cada chamada)."""
+    scheme = os.environ.get("CASH_PASSWORD_HASH", DEFAULT_SCHEME)
+    if scheme == "scrypt":
+        return {"scheme": "scrypt", "n": int(os.environ.get("CASH_SCRYPT_N", DEFAULT_SCRYPT_N)),
+                "r": SCRYPT_R, "p": SCRYPT_P}
+    if scheme == "pbkdf2":
+        return {"scheme": "pbkdf2_sha256",
+                "iterations": int(os.environ.get("CASH_PBKDF2_ITERATIONS", DEFAULT_PBKDF2_ITERATIONS))}
+    raise ValueError(f"CASH_PASSWORD_HASH inválido: {scheme!r} (use 'scrypt' ou 'pbkdf2').")
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode("ascii")
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    # maxmem padrão do OpenSSL (32 MiB) não comporta n >= 2**15 com r=8
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=129 * n * r * p + 2 ** 20, dklen=HASH_BYTES)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, iterations, dklen=HASH_BYTES)
+
+
+def hash_password(password: str, **params) -> str:
+    """Gera o registro da senha com um sal novo; `params` sobrescreve `settings()`."""
+    cfg = {**settings(), **params}
+    salt = secrets.token_bytes(SALT_BYTES)
+    if cfg["scheme"] == "scrypt":
+        digest = _scrypt(password, salt, cfg["n"], cfg["r"], cfg["p"])
+        return f"scrypt${cfg['n']}${cfg['r']}${cfg['p']}${_b64(salt)}${_b64(digest)}"
+    digest = _pbkdf2(password, salt, cfg["iterations"])
+    return f"pbkdf2_sha256${cfg['iterations']}${_b64(salt)}${_b64(digest)}"
+
+
+def _legacy(password: str) -> str:
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """Confere a senha contra o registro (novo formato ou SHA-256 antigo)."""
+    if not stored:
+        return False
+    parts = stored.split("$")
+    try:
+        if parts[0] == "scrypt" and len(parts) == 6:
+            n, r, p = (int(x) for x in parts[1:4])
+            digest = _scrypt(password, base64.b64decode(parts[4]), n, r, p)
+        elif parts[0] == "pbkdf2_sha256" and len(parts) == 4:
+            digest = _pbkdf2(password, base64.b64decode(parts[2]), int(parts[1]))
+        elif len(parts) == 1:
+            return hmac.compare_digest(_legacy(password), stored)
+        else:
+            return False
+        return hmac.compare_digest(_b64(digest), parts[-1])
+    except ValueError:
+        return False
+
+
+def needs_rehash(stored: str) -> bool:
+    """O registro foi gerado com algoritmo/custo diferente do atual (ou é SHA-256 antigo)?"""
+    cfg = settings()
+    parts = stored.split("$")
+    if cfg["scheme"] == "scrypt":
+        return parts[0] != "scrypt" or parts[1:4] != [str(cfg["n"]), str(cfg["r"]), str(cfg["p"])]
+    return parts[0] != "pbkdf2_sha256" or parts[1] != str(cfg["iterations"])
+
+
+# --- benchmark ---
+def _bench(seconds: float = 1.0):
+    casos = [("sha256 (antigo)", {})]
+    casos += [(f"scrypt n=2^{e}", {"scheme": "scrypt", "n": 2 ** e, "r": SCRYPT_R, "p": SCRYPT_P})
+              for e in (12, 14, 15, 16)]
+    casos += [(f"pbkdf2 {i // 1000}k", {"scheme": "pbkdf2_sha256", "iterations": i})
+              for i in (100_000, 310_000, 600_000)]
+    atual = settings()
+    print(f"configuração atual: {atual}")
+    for nome, params in casos:
+        gerar = (lambda: _legacy("senha de teste")) if not params else (lambda: hash_password("senha de teste", **params))
+        registro = gerar()
+        assert params == {} or verify_password("senha de teste", registro)
+        n, inicio = 0, time.perf_counter()
+        while time.perf_counter() - inicio < seconds:
+            gerar()
+            n += 1
+        segundos = (time.perf_counter() - inicio) / n
+        marca = " <- atual" if params == atual else ""
+        print(f"{nome:>16}: {1 / segundos:10.1f} hashes/s ({segundos * 1000:8.2f} ms por login){marca}")
+
+
+if __name__ == "__main__":
+    _bench(float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
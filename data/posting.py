@@ -0,0 +1,85 @@
+# data/posting.py
+"""Lançamento em lote de ocorrências de agendamentos no histórico.
+
+`plan_postings` recebe ocorrências de um ou vários agendamentos (saída de
+data.schedule.expand_schedules), aplica a regra de saldo insuficiente em
+ordem de data e devolve, de uma vez, as linhas do histórico (com IDs em
+bloco), os saldos atualizados e as exclusões a gravar. Não faz nenhuma
+escrita: quem chama grava tudo em uma única passada.
+"""
+import numpy as np
+import pandas as pd
+
+from data.storage import HISTORY_COLUMNS
+from data.vectorized import map_ids, signed_amounts
+
+
+def plan_postings(occ: pd.DataFrame, accounts: pd.DataFrame, next_id: int) -> dict:
+    """Planeja o lançamento das ocorrências.
+
+    Ocorrências cuja conta não existe (ID + Nome) ou que deixariam o saldo
+    negativo são puladas; as demais alteram o saldo na ordem das datas.
+    """
+    vazio = {
+        "history": pd.DataFrame(columns=HISTORY_COLUMNS),
+        "accounts": accounts,
+        "exclusions": [],
+        "executed": 0,
+        "skipped": 0,
+        "missing": 0,
+    }
+    if occ.empty:
+        return vazio
+
+    occ = occ.sort_values(["Data", "ID"], kind="stable").reset_index(drop=True)
+
+    # posição da conta de cada ocorrência (ID e Nome precisam bater)
+    banco = pd.to_numeric(occ["BancoID"], errors="coerce")
+    lookup = pd.DataFrame({
+        "BancoID": pd.to_numeric(accounts["ID"], errors="coerce").to_numpy(),
+        "Nome": accounts["Nome"].astype(str).to_numpy(),
+        "pos": np.arange(len(accounts)),
+    })
+    chaves = pd.DataFrame({"BancoID": banco.to_numpy(), "Nome": occ["Nome"].astype(str).to_numpy()})
+    pos = map_ids(chaves, lookup, ["BancoID", "Nome"], value="pos").fillna(-1).to_numpy().astype(np.int64)
+
+    valor = pd.to_numeric(occ["Valor"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    efeito = signed_amounts(valor, occ["Operação"])
+
+    # a regra de saldo insuficiente depende do saldo anterior: passada única sobre arrays
+    saldos = pd.to_numeric(accounts["Saldo"], errors="coerce").fillna(0.0).to_numpy(dtype=float).copy()
+    ok = np.zeros(len(occ), dtype=bool)
+    for i in range(len(occ)):
+        p = pos[i]
+        if p < 0:
+            continue
+        novo = saldos[p] + efeito[i]
+        if novo >= 0:
+            saldos[p] = novo
+            ok[i] = True
+
+    postadas = occ[ok]
+    history = pd.DataFrame({
+        "ID": np.arange(next_id, next_id + len(postadas), dtype=np.int64),
+        "BancoID": banco[ok].astype(int).to_numpy(),
+        "Tipo": postadas["Tipo"].to_numpy(),
+        "Nome": postadas["Nome"].to_numpy(),
+        "Data": postadas["Data"].dt.strftime("%Y-%m-%d").to_numpy(),
+        "Operação": postadas["Operação"].to_numpy(),
+        "Valor": valor[ok],
+        "Categoria": postadas["Categoria"].fillna("").to_numpy(),
+        "Descrição": postadas["Descrição"].fillna("").to_numpy(),
+    }, columns=HISTORY_COLUMNS)
+
+    accounts = accounts.copy()
+    accounts["Saldo"] = saldos
+
+    missing = int((pos < 0).sum())
+    return {
+        "history": history,
+        "accounts": accounts,
+        "exclusions": list(zip(postadas["ID"].astype(int), postadas["Data"])),
+        "executed": int(ok.sum()),
+        "skipped": len(occ) - int(ok.sum()) - missing,
+        "missing": missing,
+    }
@@ -0,0 +1,75 @@
+# data/provision.py
+"""Criação das pastas de usuário (provisionamento) com cache de caminhos.
+
+A pasta de um usuário é preparada uma única vez: os arquivos-modelo do
+usuário padrão entram por hardlink (cópia comum se o sistema de arquivos não
+suportar) e um marcador `.provisioned` registra a versão do provisionamento.
+O hardlink funciona como cópia-na-escrita porque toda gravação dessas
+tabelas é atômica (arquivo temporário + rename): a primeira escrita do
+usuário troca o link por um arquivo próprio e o modelo não muda.
+
+Depois disso o caminho fica em cache no processo, então `ensure_user_folder`
+no caminho quente (a cada load/save) é só uma consulta a um dict.
+"""
+import os
+import shutil
+from pathlib import Path
+
+from data.locking import user_lock
+from data.storage import EXCLUSIONS_FILE, TABLES
+
+USERS_DIR = Path("data/data_users")
+SEED_USER = "user_default"
+MARKER_FILE = ".provisioned"
+# aumente ao mudar TEMPLATE_FILES: pastas com versão menor são completadas no próximo acesso
+PROVISION_VERSION = 1
+# arquivos do usuário padrão copiados para novos usuários; journal, ledger,
+# rollup e afins são derivados e recalculados na pasta de cada usuário
+TEMPLATE_FILES = [csv for csv, _ in TABLES.values()] + [EXCLUSIONS_FILE]
+
+_folders = {}
+
+
+def _version(folder: Path) -> int:
+    try:
+        return int((folder / MARKER_FILE).read_text().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _link_or_copy(src: Path, dest: Path):
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copy(src, dest)
+
+
+def provision(username: str) -> Path:
+    """Cria/completa a pasta do usuário a partir dos modelos, se ainda não estiver na versão atual."""
+    folder = USERS_DIR / username
+    if _version(folder) >= PROVISION_VERSION:
+        return folder
+    folder.mkdir(parents=True, exist_ok=True)
+    with user_lock(folder):
+        if _version(folder) < PROVISION_VERSION:
+            seed = USERS_DIR / SEED_USER
+            if username != SEED_USER and seed.exists():
+                for name in TEMPLATE_FILES:
+                    src, dest = seed / name, folder / name
+                    if src.exists() and not dest.exists():
+                        _link_or_copy(src, dest)
+            (folder / MARKER_FILE).write_text(str(PROVISION_VERSION))
+    return folder
+
+
+def ensure_user_folder(username: str) -> Path:
+    """Pasta de dados do usuário, provisionada na primeira chamada do processo."""
+    folder = _folders.get(username)
+    if folder is None:
+        folder = _folders[username] = provision(username)
+    return folder
+
+
+def forget(username: str):
+    """Descarta o caminho em cache (usuário renomeado ou excluído)."""
+    _folders.pop(username, None)
@@ -0,0 +1,256 @@
+# data/rates.py
+"""Séries de taxas (CDI, Selic, Tesouro Direto) guardadas localmente.
+
+As séries são importadas de arquivos CSV já baixados (ex.: exportação do SGS
+do Banco Central ou a planilha de preços do Tesouro Direto), sem acesso à
+rede, e ficam em data/rates/<NOME>.npz como dois arrays ordenados: dias
+(int32, dias desde 1970-01-01) e valores (float64). Tipos de série:
+
+- "daily":  taxa diária em % (ex.: CDI/Selic diários do SGS);
+- "annual": taxa anual em % na base de 252 dias úteis (ex.: meta Selic);
+- "price":  preço unitário (ex.: PU de um título do Tesouro).
+
+`RateSeries.factor(inicio, fim, pct)` devolve o fator de correção entre duas
+datas para arrays de datas inteiros, via busca binária no produto acumulado
+das taxas (calculado uma vez por percentual), sem laço dia a dia. A taxa de
+um dia rende do dia para o seguinte: um aporte no dia d rende as taxas dos
+dias d, d+1, ..., fim-1.
+
+Uso em linha de comando:
+    python -m data.rates import CDI arquivo.csv [--kind daily] [--where "Tipo Titulo=Tesouro Selic 2029"]
+    python -m data.rates list
+    python -m data.rates bench
+"""
+import argparse
+import re
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RATES_DIR = Path("data/rates")
+KINDS = ("daily", "annual", "price")
+BUSINESS_DAYS = 252
+
+_loaded = {}
+# dia de datas ausentes ou inválidas em to_days (NaT); filtre antes de usar o valor
+NO_DAY = np.iinfo(np.int64).min
+
+
+def to_days(dates) -> np.ndarray:
+    """Datas (str, date, Timestamp ou arrays) em dias desde 1970-01-01 (int64).
+
+    Datas ausentes ou inválidas viram NO_DAY, que é menor que qualquer dia.
+    """
+    values = pd.to_datetime(pd.Series(np.atleast_1d(dates)), errors="coerce", format="mixed", dayfirst=False)
+    return values.to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+
+def from_days(days) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(np.asarray(days, dtype=np.int64).astype("datetime64[D]"))
+
+
+class RateSeries:
+    """Uma série de taxas ou preços indexada por dia."""
+
+    def __init__(self, name: str, kind: str, days: np.ndarray, values: np.ndarray, folder: Path = RATES_DIR):
+        if kind not in KINDS:
+            raise ValueError(f"Tipo de série inválido: {kind!r} (use {', '.join(KINDS)}).")
+        self.name = name
+        self.kind = kind
+        self.days = np.asarray(days, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.folder = Path(folder)
+        self._index = {}
+
+    # --- persistência ---
+    @property
+    def path(self) -> Path:
+        return self.folder / f"{self.name}.npz"
+
+    @classmethod
+    def load(cls, name: str, folder: Path = RATES_DIR) -> "RateSeries":
+        path = Path(folder) / f"{name}.npz"
+        with np.load(path) as data:
+            return cls(name, str(data["kind"]), data["days"], data["values"], folder)
+
+    def save(self):
+        self.folder.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp.npz")
+        np.savez_compressed(tmp, kind=np.array(self.kind), days=self.days, values=self.values)
+        tmp.replace(self.path)
+
+    def merge(self, days, values) -> "RateSeries":
+        """Nova série com os pontos de `days`/`values` (datas repetidas ficam com o valor novo)."""
+        days = np.concatenate([self.days, np.asarray(days, dtype=np.int32)])
+        values = np.concatenate([self.values, np.asarray(values, dtype=np.float64)])
+        # última ocorrência de cada dia vence: ordena ao contrário e pega a primeira
+        _, pos = np.unique(days[::-1], return_index=True)
+        keep = len(days) - 1 - pos
+        return RateSeries(self.name, self.kind, days[keep], values[keep], self.folder)
+
+    # --- consultas ---
+    @property
+    def first(self):
+        return from_days(self.days[:1])[0] if len(self.days) else None
+
+    @property
+    def last(self):
+        return from_days(self.days[-1:])[0] if len(self.days) else None
+
+    def daily_rates(self) -> np.ndarray:
+        """Taxa de cada dia da série como fração (não se aplica a séries de preço)."""
+        if self.kind == "daily":
+            return self.values / 100
+        if self.kind == "annual":
+            return np.power(1 + self.values / 100, 1 / BUSINESS_DAYS) - 1
+        raise ValueError(f"A série {self.name} é de preços, não de taxas.")
+
+    def index(self, pct: float = 100.0) -> np.ndarray:
+        """Produto acumulado das taxas (a `pct`% da série) antes de cada dia; tamanho len(days)+1."""
+        pct = float(pct)
+        if pct not in self._index:
+            self._index[pct] = np.concatenate([[1.0], np.cumprod(1 + self.daily_rates() * (pct / 100))])
+        return self._index[pct]
+
+    def _level(self, days: np.ndarray, pct: float) -> np.ndarray:
+        if self.kind == "price":
+            pos = np.searchsorted(self.days, days, side="right") - 1
+            return self.values[np.clip(pos, 0, len(self.values) - 1)]
+        return self.index(pct)[np.searchsorted(self.days, days, side="left")]
+
+    def factor(self, start, end, pct: float = 100.0) -> np.ndarray:
+        """Fator de correção de `start` até `end` (arrays de dias; use to_days para datas).
+
+        Fora do período da série não há rendimento (o fator fica constante).
+        Séries de preço ignoram `pct` e usam a razão entre os preços.
+        """
+        start = np.asarray(start, dtype=np.int64)
+        end = np.asarray(end, dtype=np.int64)
+        return self._level(end, pct) / self._level(start, pct)
+
+
+def get_series(name: str, folder: Path = RATES_DIR) -> RateSeries:
+    """Série carregada do disco (em cache enquanto o arquivo não mudar)."""
+    path = Path(folder) / f"{name}.npz"
+    key = (str(path.resolve()), path.stat().st_mtime_ns)
+    if key not in _loaded:
+        _loaded[key] = RateSeries.load(name, folder)
+    return _loaded[key]
+
+
+def list_series(folder: Path = RATES_DIR) -> list:
+    return sorted(p.stem for p in Path(folder).glob("*.npz"))
+
+
+# --- importação de CSV ---
+def _number(col: pd.Series) -> pd.Series:
+    """Números no formato brasileiro ("1.234,56") ou americano ("1234.56")."""
+    text = col.astype(str).str.strip()
+    br = text.str.contains(",", regex=False)
+    text = text.where(~br, text.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(text, errors="coerce")
+
+
+def _dates(col: pd.Series) -> pd.Series:
+    text = col.astype(str).str.strip()
+    if text.str.match(r"^\d{2}/\d{2}/\d{4}$").all():
+        return pd.to_datetime(text, format="%d/%m/%Y", errors="coerce")
+    return pd.to_datetime(text, format="ISO8601", errors="coerce")
+
+
+def read_rate_csv(path: Path, date_col: str = None, value_col: str = None, where: dict = None):
+    """Lê (dias, valores) de um CSV; separador, decimal e colunas são detectados.
+
+    Sem `date_col`/`value_col`, usa as colunas "data"/"valor" (formato do SGS)
+    ou, na falta delas, a primeira e a última coluna. `where` filtra linhas
+    por igualdade (ex.: {"Tipo Titulo": "Tesouro Selic 2029"}).
+    """
+    df = pd.read_csv(path, sep=None, engine="python", dtype=str, encoding_errors="replace")
+    df.columns = [c.strip().strip('"') for c in df.columns]
+    lower = {c.lower(): c for c in df.columns}
+    date_col = date_col or lower.get("data") or df.columns[0]
+    value_col = value_col or lower.get("valor") or df.columns[-1]
+    for col, value in (where or {}).items():
+        df = df[df[col].astype(str).str.strip() == value]
+    dates, values = _dates(df[date_col]), _number(df[value_col])
+    ok = dates.notna() & values.notna()
+    return to_days(dates[ok]), values[ok].to_numpy(dtype=float)
+
+
+def ingest_csv(path: Path, name: str, kind: str = "daily", folder: Path = RATES_DIR, **options) -> RateSeries:
+    """Importa o CSV para a série `name` (criando-a ou acrescentando/atualizando datas)."""
+    if not re.fullmatch(r"[\w.-]+", name):
+        raise ValueError(f"Nome de série inválido: {name!r}.")
+    days, values = read_rate_csv(path, **options)
+    try:
+        series = RateSeries.load(name, folder)
+        if series.kind != kind:
+            raise ValueError(f"A série {name} já existe com tipo {series.kind!r}.")
+    except FileNotFoundError:
+        series = RateSeries(name, kind, [], [], folder)
+    series = series.merge(days, values)
+    series.save()
+    return series
+
+
+# --- benchmark ---
+def _bench(years: int = 30, flows: int = 100_000):
+    rng = np.random.default_rng(0)
+    days = pd.bdate_range("1995-01-02", periods=years * BUSINESS_DAYS)
+    series = RateSeries("bench", "daily", to_days(days), rng.uniform(0.02, 0.06, len(days)))
+    start = rng.choice(series.days, flows)
+    end = to_days("2024-12-31")[0]
+
+    inicio = time.perf_counter()
+    fatores = series.factor(start, np.full(flows, end), pct=106.0)
+    t_vetor = (time.perf_counter() - inicio) * 1000
+
+    amostra = 200
+    inicio = time.perf_counter()
+    taxas = dict(zip(series.days.tolist(), series.daily_rates().tolist()))
+    esperado = []
+    for s in start[:amostra].tolist():
+        f = 1.0
+        for d in range(s, end):
+            f *= 1 + taxas.get(d, 0.0) * 1.06
+        esperado.append(f)
+    t_laco = (time.perf_counter() - inicio) * 1000 * flows / amostra
+    assert np.allclose(fatores[:amostra], esperado, rtol=1e-9)
+    print(f"{flows} aportes sobre {len(days)} dias úteis ({years} anos)")
+    print(f"  laço dia a dia (estimado): {t_laco:10.1f} ms | produto acumulado: {t_vetor:6.1f} ms | {t_laco / t_vetor:,.0f}x")
+
+
+def _main(argv):
+    parser = argparse.ArgumentParser(prog="python -m data.rates", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    imp = sub.add_parser("import", help="importa um CSV para uma série")
+    imp.add_argument("name")
+    imp.add_argument("file", type=Path)
+    imp.add_argument("--kind", choices=KINDS, default="daily")
+    imp.add_argument("--date-col")
+    imp.add_argument("--value-col")
+    imp.add_argument("--where", action="append", default=[], help="coluna=valor (pode repetir)")
+    sub.add_parser("list", help="lista as séries importadas")
+    sub.add_parser("bench", help="compara o fator acumulado com o laço dia a dia")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "import":
+        where = dict(w.split("=", 1) for w in args.where)
+        series = ingest_csv(args.file, args.name, args.kind, date_col=args.date_col, value_col=args.value_col, where=where)
+        print(f"OK: {series.name} ({series.kind}) com {len(series.days)} dia(s), "
+              f"{series.first:%d/%m/%Y} a {series.last:%d/%m/%Y}.")
+    elif args.cmd == "list":
+        for name in list_series():
+            s = get_series(name)
+            periodo = f"{s.first:%d/%m/%Y} a {s.last:%d/%m/%Y}" if len(s.days) else "vazia"
+            print(f"{name:>12} {s.kind:>6} {len(s.days):6d} dia(s)  {periodo}")
+    else:
+        _bench()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
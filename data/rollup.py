@@ -0,0 +1,211 @@
+# data/rollup.py
+"""Agregados diários do histórico para o dashboard (rollup).
+
+A tabela guarda, por dia, conta (BancoID), Tipo, Operação e Categoria, a soma
+dos valores e a quantidade de transações. Cada escrita no histórico aplica só
+a diferença (linhas incluídas/removidas), então o dashboard consulta uma
+tabela pequena em vez de reagrupar o histórico inteiro a cada rerun. As visões
+mensais e por categoria saem dessa tabela diária.
+
+Uso em linha de comando:
+    python -m data.rollup rebuild <usuário>
+"""
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.fileio import atomic_write_csv
+from data.storage import get_backend
+from data.vectorized import signed_amounts
+
+ROLLUP_FILE = "rollup.csv"
+KEYS = ["Dia", "BancoID", "Tipo", "Operação", "Categoria"]
+COLUMNS = KEYS + ["Valor", "Qtd"]
+
+
+def _empty() -> pd.DataFrame:
+    return pd.DataFrame({
+        "Dia": pd.Series(dtype="datetime64[ns]"),
+        "BancoID": pd.Series(dtype=np.int32),
+        "Tipo": pd.Series(dtype="category"),
+        "Operação": pd.Series(dtype="category"),
+        "Categoria": pd.Series(dtype="category"),
+        "Valor": pd.Series(dtype=float),
+        "Qtd": pd.Series(dtype=np.int32),
+    })
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """Tipos estáveis e compactos para as chaves (BancoID ausente = -1, categoria ausente = "")."""
+    df["Dia"] = pd.to_datetime(df["Dia"], errors="coerce")
+    df["BancoID"] = pd.to_numeric(df["BancoID"], errors="coerce").fillna(-1).astype(np.int32)
+    for col in ("Tipo", "Operação", "Categoria"):
+        df[col] = df[col].astype(object).where(df[col].notna(), "").astype(str).astype("category")
+    df["Qtd"] = df["Qtd"].astype(np.int32)
+    return df
+
+
+def _group(df: pd.DataFrame) -> pd.DataFrame:
+    """Soma Valor e Qtd por chave (só as combinações presentes das chaves categóricas)."""
+    return df.groupby(KEYS, as_index=False, sort=True, observed=True)[["Valor", "Qtd"]].sum()
+
+
+def aggregate(hist: pd.DataFrame) -> pd.DataFrame:
+    """Agrupa linhas do histórico por dia e chaves; linhas sem data ficam de fora."""
+    if hist is None or hist.empty:
+        return _empty()
+    df = _normalize(pd.DataFrame({
+        "Dia": pd.to_datetime(hist["Data"], errors="coerce").dt.normalize(),
+        "BancoID": hist["BancoID"],
+        "Tipo": hist["Tipo"],
+        "Operação": hist["Operação"],
+        "Categoria": hist["Categoria"],
+        "Qtd": 1,
+    }))
+    df["Valor"] = pd.to_numeric(hist["Valor"], errors="coerce").fillna(0.0).to_numpy(dtype=float)
+    df = df[df["Dia"].notna()]
+    return _group(df)
+
+
+class Rollup:
+    """Agregados diários do histórico, persistidos em rollup.csv na pasta do usuário."""
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+        self.path = self.folder / ROLLUP_FILE
+        self.daily = _empty()
+
+    # --- persistência ---
+    @classmethod
+    def load(cls, folder: Path) -> "Rollup":
+        """Carrega o rollup; na primeira vez ele é construído a partir do histórico atual."""
+        rollup = cls(folder)
+        if rollup.path.exists():
+            daily = pd.read_csv(rollup.path, keep_default_na=False, dtype={"Tipo": str, "Operação": str, "Categoria": str})
+            rollup.daily = _normalize(daily) if not daily.empty else _empty()
+        else:
+            rollup.rebuild(get_backend(folder).load_table("history"))
+        return rollup
+
+    def save(self):
+        out = self.daily.copy()
+        out["Dia"] = out["Dia"].dt.strftime("%Y-%m-%d")
+        atomic_write_csv(self.path, out[COLUMNS])
+
+    # --- atualizações ---
+    def apply(self, added: pd.DataFrame = None, removed: pd.DataFrame = None):
+        """Aplica linhas incluídas e removidas do histórico (uma edição = remoção + inclusão)."""
+        parts = [self.daily]
+        for df, sign in ((added, 1), (removed, -1)):
+            if df is None or df.empty:
+                continue
+            delta = aggregate(df)
+            delta[["Valor", "Qtd"]] *= sign
+            parts.append(delta)
+        if len(parts) == 1:
+            return
+        merged = _group(_normalize(pd.concat(parts, ignore_index=True)))
+        # grupos que ficaram sem transações somem (evita resíduos de ponto flutuante)
+        self.daily = merged[merged["Qtd"] > 0].reset_index(drop=True)
+        self.save()
+
+    def rebuild(self, hist: pd.DataFrame):
+        """Recalcula todos os agregados a partir do histórico completo."""
+        self.daily = aggregate(hist)
+        self.save()
+
+    # --- consultas ---
+    def query(self, start=None, end=None, tipo: str = None, categorias=None) -> pd.DataFrame:
+        """Linhas diárias dentro dos filtros do dashboard (datas inclusivas)."""
+        d = self.daily
+        mask = np.ones(len(d), dtype=bool)
+        if start is not None:
+            mask &= (d["Dia"] >= pd.Timestamp(start)).to_numpy()
+        if end is not None:
+            mask &= (d["Dia"] <= pd.Timestamp(end)).to_numpy()
+        if tipo:
+            mask &= (d["Tipo"] == tipo).to_numpy()
+        if categorias:
+            mask &= d["Categoria"].isin(list(categorias)).to_numpy()
+        return d[mask].reset_index(drop=True)
+
+    def categories(self) -> list:
+        return sorted(c for c in self.daily["Categoria"].unique() if c)
+
+
+# --- visões sobre as linhas diárias (já filtradas) ---
+def totals(daily: pd.DataFrame) -> dict:
+    """Entradas, saídas, fluxo líquido e último dia com movimentação."""
+    dep = float(daily.loc[daily["Operação"] == "Depósito", "Valor"].sum())
+    ret = float(daily.loc[daily["Operação"] == "Retirada", "Valor"].sum())
+    return {"deposits": dep, "withdrawals": ret, "net": dep - ret,
+            "last_day": daily["Dia"].max() if not daily.empty else pd.NaT}
+
+
+def _runs(values: np.ndarray):
+    """(valores distintos em ordem, índice de cada linha) — as linhas diárias já vêm ordenadas por dia."""
+    if len(values) and not (values[1:] >= values[:-1]).all():
+        return np.unique(values, return_inverse=True)
+    novo = np.empty(len(values), dtype=bool)
+    novo[:1] = True
+    np.not_equal(values[1:], values[:-1], out=novo[1:])
+    return values[novo], np.cumsum(novo) - 1
+
+
+def _sum_by(inv: np.ndarray, n: int, labels: pd.Series, weights: np.ndarray, fixed=()) -> dict:
+    """Soma de `weights` por grupo (inv) para cada valor de `labels` presente (em ordem) e de `fixed`."""
+    cats = labels.astype("category")
+    codes = cats.cat.codes.to_numpy()
+    presentes = np.bincount(codes[codes >= 0], minlength=len(cats.cat.categories)) > 0
+    out = {}
+    for i, label in enumerate(cats.cat.categories):
+        if presentes[i]:
+            m = codes == i
+            out[str(label)] = np.bincount(inv[m], weights=weights[m], minlength=n)
+    for label in fixed:
+        out.setdefault(label, np.zeros(n))
+    return out
+
+
+def cumulative_by_type(daily: pd.DataFrame, types=("Banco", "Investimento")) -> pd.DataFrame:
+    """Saldo acumulado por dia para cada Tipo (colunas Data + um tipo por coluna)."""
+    dias, inv = _runs(daily["Dia"].to_numpy())
+    efeito = signed_amounts(daily["Valor"], daily["Operação"])
+    cols = _sum_by(inv, len(dias), daily["Tipo"], efeito, types)
+    return pd.DataFrame({"Data": pd.DatetimeIndex(dias).date, **{t: v.cumsum() for t, v in cols.items()}})
+
+
+def monthly_flow(daily: pd.DataFrame) -> pd.DataFrame:
+    """Soma mensal por Operação (coluna Mes + uma coluna por operação)."""
+    meses, inv = _runs(daily["Dia"].to_numpy().astype("datetime64[M]"))
+    valor = daily["Valor"].to_numpy(dtype=float)
+    cols = _sum_by(inv, len(meses), daily["Operação"], valor)
+    return pd.DataFrame({"Mes": meses.astype(daily["Dia"].dtype), **cols})
+
+
+def by_category(daily: pd.DataFrame, operacao: str = "Retirada") -> pd.DataFrame:
+    """Total por categoria de uma operação (categoria vazia vira "Sem categoria")."""
+    m = (daily["Operação"] == operacao).to_numpy()
+    out = daily["Valor"][m].groupby(daily["Categoria"][m], observed=True).sum().reset_index()
+    out["Categoria"] = out["Categoria"].astype(str).replace("", "Sem categoria")
+    return out
+
+
+def _main(argv):
+    if len(argv) != 2 or argv[0] != "rebuild":
+        print(__doc__)
+        return 2
+    folder = Path("data/data_users") / argv[1]
+    inicio = time.perf_counter()
+    rollup = Rollup(folder)
+    rollup.rebuild(get_backend(folder).load_table("history"))
+    ms = (time.perf_counter() - inicio) * 1000
+    print(f"OK: {len(rollup.daily)} linha(s) agregadas ({ms:.1f} ms).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,173 @@
+# data/schedule.py
+"""Expansão vetorizada dos agendamentos futuros em ocorrências.
+
+Regras (as mesmas usadas pelas páginas):
+- a primeira ocorrência é a própria Data do agendamento;
+- recorrências aceitas: weekly, biweekly, monthly, quarterly e yearly;
+  sem recorrência ("none", "once" ou vazio) há uma única ocorrência, e
+  recorrências desconhecidas também geram só a primeira;
+- as ocorrências vão até Data + Duracao_meses (no máximo 12 meses; sem
+  duração, 12 meses);
+- passos mensais são somados um de cada vez, como `+= pd.DateOffset(months=n)`:
+  se o dia não existir no mês, vale o último dia, e o dia cortado continua
+  cortado nos meses seguintes (31/01 -> 28/02 -> 28/03). As exclusões
+  gravadas (data/exclusions.py) usam essas datas.
+
+Todos os agendamentos são expandidos de uma vez com aritmética datetime64 do
+NumPy, sem laços por linha.
+
+Conferência com o laço de pd.DateOffset das páginas antigas:
+    python -m data.schedule check
+"""
+import sys
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+MAX_MONTHS = 12
+
+# recorrência -> (unidade, passo)
+RECURRENCES = {
+    "weekly": ("D", 7),
+    "biweekly": ("D", 14),
+    "monthly": ("M", 1),
+    "quarterly": ("M", 3),
+    "yearly": ("M", 12),
+}
+RECURRENCE_LABELS = {
+    "none": "Nenhuma",
+    "weekly": "Semanal",
+    "biweekly": "Quinzenal",
+    "monthly": "Mensal",
+    "quarterly": "Trimestral",
+    "yearly": "Anual",
+}
+
+# maior número de ocorrências possível em MAX_MONTHS (passo semanal)
+_MAX_STEPS = MAX_MONTHS * 31 // 7 + 2
+
+
+def add_months(days: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """Soma meses a datas datetime64[D], limitando ao último dia do mês (como pd.DateOffset)."""
+    month0 = days.astype("datetime64[M]")
+    dom = (days - month0.astype("datetime64[D]")).astype(np.int64)
+    target = month0 + months.astype(np.int64)
+    month_len = ((target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")).astype(np.int64)
+    return target.astype("datetime64[D]") + np.minimum(dom, month_len - 1)
+
+
+def chained_months(days: np.ndarray, step: np.ndarray, n: int) -> np.ndarray:
+    """Datas após k = 0..n-1 passos de `step` meses somados em cadeia (matriz linhas x n).
+
+    Cada passo corta o dia no fim do mês, e o corte se mantém: o dia da
+    k-ésima data é o menor entre o dia inicial e o último dia de cada mês
+    percorrido até ela.
+    """
+    month0 = days.astype("datetime64[M]")
+    dom = (days - month0.astype("datetime64[D]")).astype(np.int64)
+    target = month0[:, None] + np.arange(n, dtype=np.int64)[None, :] * step[:, None]
+    month_len = ((target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")).astype(np.int64)
+    dia = np.minimum.accumulate(np.minimum(dom[:, None], month_len - 1), axis=1)
+    return target.astype("datetime64[D]") + dia
+
+
+def expand_schedules(fut: pd.DataFrame, start=None, end=None, exclusions=None) -> pd.DataFrame:
+    """Expande todos os agendamentos em ocorrências dentro da janela [start, end].
+
+    Retorna as linhas de `fut` repetidas uma vez por ocorrência, com a coluna
+    Data trocada pela data da ocorrência e ordenadas por Data. Com um
+    ExclusionIndex em `exclusions`, as instâncias já realizadas/removidas
+    ficam de fora.
+    """
+    if fut.empty:
+        return fut.iloc[0:0].copy()
+
+    d0 = pd.to_datetime(fut["Data"], errors="coerce").to_numpy().astype("datetime64[D]")
+    valid = ~np.isnat(d0)
+    rec = fut["Recorrencia"].fillna("none").astype(str).to_numpy() if "Recorrencia" in fut.columns else np.full(len(fut), "none")
+    dur = pd.to_numeric(fut.get("Duracao_meses"), errors="coerce") if "Duracao_meses" in fut.columns else None
+    dur = np.zeros(len(fut), dtype=np.int64) if dur is None else dur.fillna(0).to_numpy().astype(np.int64)
+
+    unit = np.array([RECURRENCES.get(r, ("", 0))[0] for r in rec])
+    step = np.array([RECURRENCES.get(r, ("", 0))[1] for r in rec], dtype=np.int64)
+    months = np.where((dur > 0) & (dur < MAX_MONTHS), dur, MAX_MONTHS)
+
+    d0_safe = np.where(valid, d0, np.datetime64("1970-01-01"))
+    limit = add_months(d0_safe, months)
+
+    k = np.arange(_MAX_STEPS, dtype=np.int64)[None, :]
+    by_day = d0_safe[:, None] + k * step[:, None]
+    by_month = chained_months(d0_safe, np.where(unit == "M", step, 0), k.shape[1])
+    occ = np.where((unit == "M")[:, None], by_month, by_day)
+
+    keep = (occ <= limit[:, None]) & valid[:, None]
+    # sem recorrência (ou recorrência desconhecida): somente a primeira ocorrência
+    keep[step == 0, 1:] = False
+    if start is not None:
+        keep &= occ >= np.datetime64(pd.Timestamp(start).date(), "D")
+    if end is not None:
+        keep &= occ <= np.datetime64(pd.Timestamp(end).date(), "D")
+
+    rows, cols = np.nonzero(keep)
+    days = occ[rows, cols]
+    if exclusions is not None:
+        livre = ~exclusions.mask(fut["ID"].to_numpy()[rows], days)
+        rows, days = rows[livre], days[livre]
+    out = fut.iloc[rows].reset_index(drop=True)
+    out["Data"] = pd.to_datetime(days)
+    return out.sort_values(["Data", "ID"], kind="stable").reset_index(drop=True)
+
+
+def upcoming(fut: pd.DataFrame, today: date = None, end=None, exclusions=None) -> pd.DataFrame:
+    """Ocorrências a partir de hoje (regra usada na tela de agendamentos)."""
+    return expand_schedules(fut, start=today or date.today(), end=end, exclusions=exclusions)
+
+
+# --- conferência ---
+def _reference(start, recurr: str, dur_months: int) -> list:
+    """Ocorrências pelo laço antigo das páginas (um pd.DateOffset por vez)."""
+    start = pd.Timestamp(start).normalize()
+    limit = start + pd.DateOffset(months=min(dur_months, MAX_MONTHS) if dur_months > 0 else MAX_MONTHS)
+    unit, passo = RECURRENCES[recurr]
+    offset = pd.DateOffset(days=passo) if unit == "D" else pd.DateOffset(months=passo)
+    datas, cur = [], start
+    while cur <= limit:
+        datas.append(cur)
+        cur = cur + offset
+    return datas
+
+
+def _check():
+    """Agendamentos começando nos dias 28 a 31 (e em 29/02) contra o laço de pd.DateOffset."""
+    inicios = [f"{ano}-{mes:02d}-{dia:02d}" for ano in (2023, 2024) for mes in range(1, 13) for dia in range(28, 32)
+               if dia <= pd.Period(f"{ano}-{mes:02d}").days_in_month]
+    linhas = [(i, d, r, dur) for i, (d, r, dur) in enumerate(
+        (d, r, dur) for d in inicios for r in RECURRENCES for dur in (0, 5, 12))]
+    fut = pd.DataFrame(linhas, columns=["ID", "Data", "Recorrencia", "Duracao_meses"])
+    occ = expand_schedules(fut)
+    erros = 0
+    for i, d, r, dur in linhas:
+        obtido = occ.loc[occ["ID"] == i, "Data"].tolist()
+        if obtido != _reference(d, r, dur):
+            erros += 1
+            if erros <= 5:
+                print(f"DIVERGE {d} {r} {dur}m: {[x.date() for x in obtido][:4]} != "
+                      f"{[x.date() for x in _reference(d, r, dur)][:4]}")
+    mensal = expand_schedules(pd.DataFrame([{"ID": 1, "Data": "2024-01-31", "Recorrencia": "monthly", "Duracao_meses": 3}]))
+    exemplo = [f"{x:%d/%m}" for x in mensal["Data"]]
+    assert exemplo == ["31/01", "29/02", "29/03", "29/04"], exemplo
+    print(f"{len(linhas)} agendamento(s) conferido(s), {erros} divergência(s); "
+          f"mensal a partir de 31/01/2024: {' -> '.join(exemplo)}")
+    return 0 if erros == 0 else 1
+
+
+def _main(argv):
+    if argv != ["check"]:
+        print(__doc__)
+        return 2
+    return _check()
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
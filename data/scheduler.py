@@ -0,0 +1,241 @@
+# data/scheduler.py
+"""Agendador em segundo plano: lança as ocorrências vencidas de todos os usuários.
+
+Faz o mesmo que o botão "✔️ Realizar" da tela de agendamentos, sem a
+interface: expande os agendamentos até hoje (data.schedule), ignora as
+instâncias já em future_exclusions e lança o resto com a regra de saldo
+insuficiente de data.posting, em um único commit por usuário.
+
+Os usuários ficam em um heap de mínimo ordenado pela próxima data de
+vencimento; cada tick só abre as pastas cujo vencimento já chegou. Depois de
+lançar, a próxima data é recalculada (ocorrência pulada por saldo
+insuficiente ou conta inexistente é tentada de novo no dia seguinte).
+Agendamentos criados ou alterados pela interface são percebidos por uma
+varredura periódica que só compara a assinatura da tabela de agendamentos
+de cada pasta.
+
+O estado (próxima data e assinatura de cada usuário) fica em
+`data/scheduler.json`, gravado de forma atômica a cada lote de usuários;
+ao reiniciar, o heap é remontado a partir dele. Um lote processado e não
+registrado no checkpoint é só recalculado: as instâncias lançadas já estão
+nas exclusões e não são lançadas de novo.
+
+Uso em linha de comando:
+    python -m data.scheduler run [--interval 60] [--rescan 300]
+    python -m data.scheduler once [AAAA-MM-DD]
+    python -m data.scheduler status
+"""
+import argparse
+import heapq
+import json
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from data.fileio import atomic_write_text
+from data.ledger import Ledger
+from data.locking import LockTimeout, file_lock, user_lock
+from data.posting import plan_postings
+from data.provision import USERS_DIR
+from data.rollup import Rollup
+from data.schedule import expand_schedules
+from data.storage import get_backend
+from data.transaction import UnitOfWork, pending, recover
+
+CHECKPOINT_FILE = Path("data/scheduler.json")
+LOCK_FILE = Path("data/scheduler.lock")
+CHECKPOINT_EVERY = 50
+
+
+def _signature(backend) -> list:
+    """Assinatura da tabela de agendamentos em forma JSON (listas em vez de tuplas)."""
+    return json.loads(json.dumps(backend.signature("future")))
+
+
+def _next_due(fut: pd.DataFrame, exclusions, after: date):
+    """Primeira ocorrência ainda não lançada depois de `after` (None se não houver)."""
+    occ = expand_schedules(fut, start=after + timedelta(days=1), exclusions=exclusions)
+    return None if occ.empty else occ["Data"].iloc[0].date()
+
+
+def post_due(folder: Path, until: date = None) -> dict:
+    """Lança as ocorrências pendentes da pasta com data até `until` (hoje).
+
+    Retorna os contadores de data.posting.plan_postings (executed, skipped,
+    missing), a próxima data de vencimento ("next") e a assinatura da tabela
+    de agendamentos depois do commit ("sig").
+    """
+    folder = Path(folder)
+    until = until or date.today()
+    with user_lock(folder):
+        backend = get_backend(folder)
+        if pending(folder):
+            recover(folder, backend)
+        fut = backend.load_table("future")
+        exclusions = backend.load_exclusions()
+        occ = expand_schedules(fut, end=until, exclusions=exclusions)
+        plano = {"executed": 0, "skipped": 0, "missing": 0}
+        if not occ.empty:
+            plano = plan_postings(occ, backend.load_table("accounts"), backend.next_id("history"))
+        if plano["executed"]:
+            rows = plano["history"]
+            ledger, rollup = Ledger.load(folder), Rollup.load(folder)
+            tx = UnitOfWork(backend)
+            tx.save_table("accounts", plano["accounts"])
+            tx.append_rows("history", rows)
+            tx.add_exclusions(plano["exclusions"])
+            tx.on_commit(lambda: (ledger.apply(added=rows), rollup.apply(added=rows)))
+            tx.commit()
+        proxima = _next_due(fut, exclusions, until)
+        if plano["skipped"] or plano["missing"]:
+            # o saldo (ou a conta) pode mudar pela interface: tenta de novo amanhã
+            proxima = until + timedelta(days=1)
+        return {
+            "executed": plano["executed"],
+            "skipped": plano["skipped"],
+            "missing": plano["missing"],
+            "next": proxima,
+            "sig": _signature(backend),
+        }
+
+
+class Scheduler:
+    """Heap (próximo vencimento, usuário) com checkpoint em disco."""
+
+    def __init__(self, users_dir: Path = USERS_DIR, checkpoint: Path = CHECKPOINT_FILE):
+        self.users_dir = Path(users_dir)
+        self.checkpoint = Path(checkpoint)
+        self.state = {}  # usuário -> {"next": "AAAA-MM-DD" | None, "sig": assinatura}
+        self.heap = []
+        self._dirty = 0
+
+    # --- checkpoint ---
+    def load(self) -> "Scheduler":
+        if self.checkpoint.exists():
+            self.state = json.loads(self.checkpoint.read_text(encoding="utf-8")).get("users", {})
+        self.heap = [(s["next"], user) for user, s in self.state.items() if s["next"]]
+        heapq.heapify(self.heap)
+        return self
+
+    def save(self):
+        atomic_write_text(self.checkpoint, json.dumps({"users": self.state}, indent=1, ensure_ascii=False))
+        self._dirty = 0
+
+    def _set(self, user: str, proxima, sig):
+        proxima = proxima.isoformat() if proxima else None
+        self.state[user] = {"next": proxima, "sig": sig}
+        if proxima:
+            heapq.heappush(self.heap, (proxima, user))
+        self._dirty += 1
+        if self._dirty >= CHECKPOINT_EVERY:
+            self.save()
+
+    # --- varredura ---
+    def rescan(self) -> int:
+        """Reavalia só as pastas novas ou com agendamentos alterados; retorna quantas."""
+        pastas = {p.name: p for p in self.users_dir.iterdir() if p.is_dir()}
+        for user in set(self.state) - set(pastas):
+            del self.state[user]  # usuário excluído: a entrada no heap é descartada ao sair
+        mudaram = 0
+        for user, folder in sorted(pastas.items()):
+            backend = get_backend(folder)
+            sig = _signature(backend)
+            if user in self.state and self.state[user]["sig"] == sig:
+                continue
+            # sem lançar nada: a pasta entra no heap pela primeira ocorrência ainda livre
+            fut = backend.load_table("future")
+            occ = expand_schedules(fut, exclusions=backend.load_exclusions())
+            self._set(user, None if occ.empty else occ["Data"].iloc[0].date(), sig)
+            mudaram += 1
+        if self._dirty:
+            self.save()
+        return mudaram
+
+    # --- execução ---
+    def tick(self, today: date = None) -> dict:
+        """Processa todos os usuários com vencimento até `today`."""
+        today = today or date.today()
+        limite = today.isoformat()
+        totais = {"users": 0, "executed": 0, "skipped": 0, "missing": 0, "errors": []}
+        while self.heap and self.heap[0][0] <= limite:
+            proxima, user = heapq.heappop(self.heap)
+            if self.state.get(user, {}).get("next") != proxima:
+                continue  # entrada antiga (usuário reagendado ou excluído)
+            try:
+                r = post_due(self.users_dir / user, today)
+            except Exception as e:  # um usuário com problema não para o agendador
+                totais["errors"].append(f"{user}: {type(e).__name__}: {e}")
+                self._set(user, today + timedelta(days=1), self.state[user]["sig"])
+                continue
+            self._set(user, r["next"], r["sig"])
+            totais["users"] += 1
+            for k in ("executed", "skipped", "missing"):
+                totais[k] += r[k]
+        if self._dirty:
+            self.save()
+        return totais
+
+    def run(self, interval: float = 60.0, rescan_every: float = 300.0, log=print):
+        """Laço do processo em segundo plano (Ctrl+C para parar)."""
+        ultima_varredura = 0.0
+        while True:
+            if time.monotonic() - ultima_varredura >= rescan_every:
+                n = self.rescan()
+                ultima_varredura = time.monotonic()
+                if n:
+                    log(f"varredura: {n} usuário(s) com agendamentos novos ou alterados")
+            inicio = time.perf_counter()
+            r = self.tick()
+            if r["users"] or r["errors"]:
+                log(_resumo(r, time.perf_counter() - inicio))
+            time.sleep(interval)
+
+
+def _resumo(r: dict, segundos: float) -> str:
+    linhas = [f"ERRO {e}" for e in r["errors"]]
+    linhas.append(f"{r['users']} usuário(s) vencido(s): {r['executed']} lançada(s), "
+                  f"{r['skipped']} sem saldo, {r['missing']} sem conta ({segundos * 1000:.0f} ms).")
+    return "\n".join(linhas)
+
+
+def _main(argv):
+    parser = argparse.ArgumentParser(prog="python -m data.scheduler", description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run", help="roda continuamente")
+    run.add_argument("--interval", type=float, default=60.0, help="segundos entre ticks")
+    run.add_argument("--rescan", type=float, default=300.0, help="segundos entre varreduras das pastas")
+    once = sub.add_parser("once", help="uma varredura e um tick (ex.: via cron)")
+    once.add_argument("today", nargs="?")
+    sub.add_parser("status", help="próximos vencimentos do checkpoint")
+    args = parser.parse_args(argv)
+
+    if args.cmd == "status":
+        sched = Scheduler().load()
+        for proxima, user in sorted(sched.heap)[:20]:
+            print(f"{proxima}  {user}")
+        print(f"{len(sched.heap)} usuário(s) com agendamentos pendentes de {len(sched.state)}.")
+        return 0
+    try:
+        with file_lock(LOCK_FILE, timeout=0):
+            sched = Scheduler().load()
+            if args.cmd == "run":
+                sched.run(args.interval, args.rescan)
+            today = pd.Timestamp(args.today).date() if args.today else date.today()
+            inicio = time.perf_counter()
+            n = sched.rescan()
+            r = sched.tick(today)
+            print(f"varredura: {n} usuário(s) reavaliado(s) de {len(sched.state)}.")
+            print(_resumo(r, time.perf_counter() - inicio))
+            return 1 if r["errors"] else 0
+    except LockTimeout:
+        print("Outro agendador já está rodando.")
+        return 1
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,464 @@
+# data/schema.py
+"""Schema fixo e compacto das tabelas do usuário e snapshot colunar dos CSVs.
+
+Cada tabela tem um tipo por coluna, aplicado por `conform` em toda leitura
+(CSV ou SQLite), para que BancoID, Categoria etc. não mudem de tipo conforme
+o conteúdo do arquivo (NaN vs texto vs inteiro) e para que o histórico ocupe
+pouca memória:
+
+- "id":       int32 (Int32 só se houver IDs faltando num arquivo corrompido);
+- "int":      Int32 anulável (BancoID, Duracao_meses);
+- "float":    float64;
+- "date":     datetime64 (Data);
+- "category": categórica, com "" no lugar de valores faltando (Tipo,
+              Operação, Categoria, Recorrencia e o Nome da conta no histórico
+              e nos agendamentos: um código por linha em vez de um texto);
+- "text":     texto livre (Nome das contas, Descrição, Detalhes), internado:
+              linhas com o mesmo texto apontam para o mesmo objeto.
+
+As tabelas em cache são compartilhadas entre reruns sem cópia (ver
+data/cache.py); alterações devem ser feitas em cópias ou via `set_cells`.
+
+O snapshot (`<arquivo>.snapshot.npz`, ao lado do CSV) guarda a tabela já
+convertida: categóricas como códigos + categorias, texto livre codificado por
+dicionário, datas como datetime64 e números como arrays numéricos. Ele carrega
+a assinatura (mtime, tamanho) do CSV de onde saiu; se o CSV mudar, a próxima
+leitura volta ao CSV e grava um snapshot novo. O CSV continua sendo a fonte da
+verdade e o formato de importação/exportação.
+
+Comparação de tempo de carga (CSV vs snapshot) e de memória (tipos padrão
+do read_csv vs schema compacto):
+    python -m data.schema bench [linhas]
+    python -m data.schema mem [linhas]
+
+Memória de um rerun das páginas 3 e 4 com o cache quente (AppTest, Linux/glibc):
+pico de alocação (tracemalloc), aumento do RSS durante o rerun e maxrss do
+processo, opcionalmente comparados com outra cópia do repositório:
+    python -m data.schema pages [linhas] [--baseline <pasta>]
+"""
+import json
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# texto do pandas instalado ("str" no pandas 3, object antes)
+TEXT_DTYPE = pd.Series(dtype="str").dtype
+
+SCHEMAS = {
+    "accounts": {"ID": "id", "Tipo": "category", "Nome": "text", "Saldo": "float", "Detalhes": "text"},
+    "history": {
+        "ID": "id", "BancoID": "int", "Tipo": "category", "Nome": "category", "Data": "date",
+        "Operação": "category", "Valor": "float", "Categoria": "category", "Descrição": "text",
+    },
+}
+SCHEMAS["future"] = {**SCHEMAS["history"], "Recorrencia": "category", "Duracao_meses": "int"}
+
+SNAPSHOT_SUFFIX = ".snapshot.npz"
+SNAPSHOT_VERSION = 2
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def _intern(s: pd.Series) -> pd.Series:
+    """Texto com um objeto por valor distinto (as linhas repetidas compartilham a mesma string)."""
+    codes, uniques = pd.factorize(s.astype(object).where(s.notna(), None), use_na_sentinel=True)
+    return pd.Series(pd.array(list(uniques), dtype=TEXT_DTYPE).take(codes, allow_fill=True), index=s.index)
+
+
+# --- conversão ---
+def _conform_column(s: pd.Series, kind: str, intern: bool = False) -> pd.Series:
+    if kind == "id":
+        if s.dtype == np.int32:
+            return s
+        v = pd.to_numeric(s, errors="coerce")
+        if v.abs().max() > INT32_MAX:
+            return v.astype("Int64") if v.isna().any() else v.astype(np.int64)
+        return v.astype("Int32") if v.isna().any() else v.astype(np.int32)
+    if kind == "int":
+        if isinstance(s.dtype, pd.Int32Dtype):
+            return s
+        v = pd.to_numeric(s, errors="coerce")
+        v = v.where((v == v.round()) & (v.abs() <= INT32_MAX))
+        return v.astype("Int32")
+    if kind == "float":
+        if s.dtype == np.float64:
+            return s
+        return pd.to_numeric(s, errors="coerce").astype(np.float64)
+    if kind == "date":
+        if pd.api.types.is_datetime64_any_dtype(s):
+            return s
+        # "YYYY-MM-DD" e "YYYY-MM-DD HH:MM:SS" convivem no mesmo arquivo
+        return pd.to_datetime(s, format="ISO8601", errors="coerce")
+    if kind == "category":
+        if isinstance(s.dtype, pd.CategoricalDtype) and not s.isna().any():
+            return s
+        return s.astype(object).where(s.notna(), "").astype(str).astype("category")
+    if kind == "text":
+        if s.dtype == TEXT_DTYPE and not intern:
+            return s
+        return _intern(s)
+    raise ValueError(f"Tipo de coluna desconhecido no schema: {kind}")
+
+
+def conform(table: str, df: pd.DataFrame, intern: bool = False) -> pd.DataFrame:
+    """Converte as colunas do schema da tabela para os tipos fixos (colunas já no tipo certo não são tocadas).
+
+    Com `intern=True` o texto livre é internado mesmo já estando no tipo de
+    texto (leitura de um CSV, em que cada linha traz uma string própria).
+    """
+    for col, kind in SCHEMAS[table].items():
+        if col in df.columns:
+            conv = _conform_column(df[col], kind, intern)
+            if conv is not df[col]:
+                df[col] = conv
+    return df
+
+
+def set_cells(df: pd.DataFrame, mask, values: dict):
+    """`df.loc[mask, col] = val` para cada coluna, aceitando valores novos em colunas categóricas/tipadas."""
+    for col, val in values.items():
+        if col in df.columns:
+            dtype = df[col].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                val = "" if val is None or (not isinstance(val, str) and pd.isna(val)) else str(val)
+                if val not in dtype.categories:
+                    # categorias em ordem alfabética: ordenar pela coluna continua igual ao texto
+                    df[col] = df[col].cat.set_categories(sorted([*dtype.categories, val]))
+            elif dtype != object and isinstance(val, str) and not pd.api.types.is_string_dtype(dtype):
+                df[col] = df[col].astype(object)
+        df.loc[mask, col] = val
+
+
+# --- snapshot ---
+def snapshot_path(csv_path: Path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + SNAPSHOT_SUFFIX)
+
+
+def _pack_strings(values) -> dict:
+    """Lista de textos -> bytes UTF-8 concatenados + posições de início/fim (em caracteres)."""
+    values = [str(v) for v in values]
+    ends = np.cumsum([len(v) for v in values], dtype=np.int64)
+    blob = np.frombuffer("".join(values).encode("utf-8"), dtype=np.uint8)
+    return {"blob": blob, "ends": ends}
+
+
+def _unpack_strings(blob: np.ndarray, ends: np.ndarray) -> list:
+    text = blob.tobytes().decode("utf-8")
+    starts = np.concatenate(([0], ends[:-1])).tolist()
+    return [text[a:b] for a, b in zip(starts, ends.tolist())]
+
+
+def _storage_kind(s: pd.Series) -> str:
+    """Como a coluna vai para o snapshot, pelo dtype em memória."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return "category"
+    if isinstance(s.dtype, pd.api.extensions.ExtensionDtype) and pd.api.types.is_integer_dtype(s):
+        return "int"
+    if pd.api.types.is_bool_dtype(s) or pd.api.types.is_numeric_dtype(s) or pd.api.types.is_datetime64_any_dtype(s):
+        return "values"
+    return "text"
+
+
+def _encode(df: pd.DataFrame, kinds: dict) -> dict:
+    arrays = {}
+    for i, col in enumerate(df.columns):
+        s, kind = df[col], kinds[col]
+        if kind == "int":
+            arrays[f"{i}.values"] = s.fillna(0).to_numpy(dtype=s.dtype.numpy_dtype)
+            arrays[f"{i}.mask"] = s.isna().to_numpy()
+            continue
+        if kind == "values":
+            arrays[f"{i}.values"] = s.to_numpy()
+            continue
+        if kind == "category":
+            codes, uniques = s.cat.codes.to_numpy(), s.cat.categories
+        else:
+            codes, uniques = pd.factorize(s.astype(object).where(s.notna(), None), use_na_sentinel=True)
+        arrays[f"{i}.codes"] = codes
+        for part, arr in _pack_strings(uniques).items():
+            arrays[f"{i}.{part}"] = arr
+    return arrays
+
+
+def _decode(data, columns: list, kinds: dict) -> pd.DataFrame:
+    out = {}
+    for i, col in enumerate(columns):
+        kind = kinds[col]
+        if kind == "int":
+            out[col] = pd.arrays.IntegerArray(data[f"{i}.values"], data[f"{i}.mask"])
+        elif kind == "values":
+            out[col] = data[f"{i}.values"]
+        else:
+            uniques = _unpack_strings(data[f"{i}.blob"], data[f"{i}.ends"])
+            codes = data[f"{i}.codes"]
+            if kind == "category":
+                out[col] = pd.Categorical.from_codes(codes, uniques)
+            else:
+                out[col] = pd.array(uniques, dtype=TEXT_DTYPE).take(codes, allow_fill=True)
+    return pd.DataFrame(out, columns=columns)
+
+
+def save_snapshot(csv_path: Path, df: pd.DataFrame, signature):
+    """Grava o snapshot de uma tabela já conformada, marcado com a assinatura do CSV de origem."""
+    if signature is None:
+        return
+    kinds = {col: _storage_kind(df[col]) for col in df.columns}
+    meta = {"version": SNAPSHOT_VERSION, "sig": list(signature), "columns": list(df.columns), "kinds": kinds}
+    path = snapshot_path(csv_path)
+    tmp = path.with_suffix(".tmp.npz")
+    try:
+        np.savez(tmp, meta=np.array(json.dumps(meta, ensure_ascii=False)), **_encode(df, kinds))
+        tmp.replace(path)
+    except OSError:
+        tmp.unlink(missing_ok=True)  # o snapshot é só cache: sem espaço/permissão, segue lendo o CSV
+
+
+def load_snapshot(csv_path: Path, signature):
+    """Tabela do snapshot se ele corresponder à assinatura atual do CSV; senão None."""
+    path = snapshot_path(csv_path)
+    if signature is None or not path.exists():
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != SNAPSHOT_VERSION or meta.get("sig") != list(signature):
+                return None
+            return _decode(data, meta["columns"], meta["kinds"])
+    except (OSError, ValueError, KeyError):
+        return None  # snapshot truncado ou de outra versão: refeito a partir do CSV
+
+
+# --- benchmark ---
+def _synthetic_history(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    contas = np.array([f"Conta {i}" for i in range(40)])
+    categorias = np.array(["", "Mercado", "Aluguel", "Salário", "Lazer", "Transporte", "Saúde", "Rendimento"])
+    banco = rng.integers(1, 41, n)
+    dias = np.datetime64("2015-01-01") + rng.integers(0, 3650, n).astype("timedelta64[D]")
+    return pd.DataFrame({
+        "ID": np.arange(1, n + 1),
+        "BancoID": banco,
+        "Tipo": np.where(banco % 3 == 0, "Investimento", "Banco"),
+        "Nome": contas[banco - 1],
+        "Data": pd.to_datetime(dias).strftime("%Y-%m-%d 00:00:00"),
+        "Operação": np.where(rng.random(n) < 0.6, "Retirada", "Depósito"),
+        "Valor": np.round(rng.random(n) * 1000, 2),
+        "Categoria": categorias[rng.integers(0, len(categorias), n)],
+        "Descrição": np.char.add("compra ", rng.integers(0, 50_000, n).astype(str)),
+    })
+
+
+def _bench(n: int = 1_000_000):
+    from data.storage import CSVBackend
+
+    with tempfile.TemporaryDirectory() as folder:
+        backend = CSVBackend(Path(folder))
+        path = backend.path("history")
+        _synthetic_history(n).to_csv(path, index=False)
+
+        inicio = time.perf_counter()
+        ref = conform("history", pd.read_csv(path))
+        t_csv = time.perf_counter() - inicio
+
+        backend.load_table("history")  # primeira leitura: parse do CSV + gravação do snapshot
+        inicio = time.perf_counter()
+        snap = backend.load_table("history")
+        t_snap = time.perf_counter() - inicio
+
+        pd.testing.assert_frame_equal(ref, snap)
+        mb = path.stat().st_size / 1e6
+        snap_mb = snapshot_path(path).stat().st_size / 1e6
+        print(f"{n} linhas: CSV {mb:.0f} MB, snapshot {snap_mb:.0f} MB")
+        print(f"  CSV (read_csv + tipos): {t_csv:.2f} s")
+        print(f"  snapshot:               {t_snap:.2f} s ({t_csv / t_snap:.1f}x mais rápido)")
+        print("  tipos:", ", ".join(f"{c}={snap[c].dtype}" for c in snap.columns))
+
+
+def _deep_bytes(df: pd.DataFrame) -> int:
+    """Memória da tabela contando cada objeto Python (string) uma única vez."""
+    total = int(df.memory_usage(index=True, deep=False).sum())
+    vistos = set()
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            s = pd.Series(s.cat.categories)
+        elif _storage_kind(s) != "text":
+            continue
+        for v in s.array if s.dtype != object else s.to_numpy():
+            if isinstance(v, str) and id(v) not in vistos:
+                vistos.add(id(v))
+                total += sys.getsizeof(v)
+    return total
+
+
+def _peak(func) -> int:
+    """Pico de memória alocada durante `func()` (tracemalloc: numpy e objetos Python)."""
+    import tracemalloc
+
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _mem(n: int = 500_000):
+    """Tipos padrão do read_csv + cópia profunda por acesso vs schema compacto + cópia rasa."""
+    from data.storage import CSVBackend, filter_page
+
+    def rerun(df, deep):
+        # o que um rerun das páginas faz com o histórico em cache: pega a tabela,
+        # conta o filtro, monta a página visível e as últimas movimentações
+        h = df.copy(deep=deep)
+        filter_page(h, limit=0)
+        filter_page(h, sort_by="Data", limit=25)
+        filter_page(h, sort_by="Nome", ascending=True, offset=100, limit=25)
+        filter_page(h, sort_by="Data", limit=12)
+
+    with tempfile.TemporaryDirectory() as folder:
+        backend = CSVBackend(Path(folder))
+        path = backend.path("history")
+        _synthetic_history(n).to_csv(path, index=False)
+        legado = pd.read_csv(path)
+        legado["Data"] = pd.to_datetime(legado["Data"], format="ISO8601", errors="coerce")
+        backend.load_table("history")
+        compacto = backend.load_table("history")
+
+        linhas = []
+        for nome, df, deep in (("padrão", legado, True), ("compacto", compacto, False)):
+            linhas.append((nome, _deep_bytes(df), _peak(lambda: rerun(df, deep))))
+        print(f"{n} linhas de histórico (maxrss do processo: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3:.0f} MB)")
+        for nome, tabela, pico in linhas:
+            print(f"  {nome:>8}: tabela {tabela / 1e6:6.1f} MB, pico por rerun {pico / 1e6:6.1f} MB")
+        (_, t0, p0), (_, t1, p1) = linhas
+        print(f"  redução: tabela {t0 / t1:.1f}x, pico por rerun {p0 / p1:.1f}x")
+
+
+# roda em um processo novo, com PYTHONPATH na árvore medida e cwd numa pasta com data/data_users/<usuário>
+_PAGE_RERUN = """
+import ctypes, gc, os, resource, sys, threading, time, tracemalloc
+from streamlit.testing.v1 import AppTest
+tree, page, user = sys.argv[1:4]
+pagina = os.sysconf("SC_PAGE_SIZE")
+libc = ctypes.CDLL("libc.so.6")
+
+def rss():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * pagina
+
+def rerun_rss(at):
+    # RSS amostrado a cada ~1 ms durante o rerun: pico menos o RSS de antes. O malloc_trim
+    # devolve ao sistema o que o rerun anterior liberou; sem ele o rerun reaproveita essa
+    # memória e o aumento do RSS sai quase zero em qualquer versão
+    gc.collect()
+    libc.malloc_trim(0)
+    antes, pico, fim = rss(), [0], threading.Event()
+    def amostra():
+        while not fim.is_set():
+            pico[0] = max(pico[0], rss())
+            time.sleep(0.001)
+    t = threading.Thread(target=amostra)
+    t.start()
+    at.run()
+    fim.set()
+    t.join()
+    return max(pico[0], rss()) - antes
+
+at = AppTest.from_file(f"{tree}/pages/{page}", default_timeout=900)
+at.session_state["user"] = user
+at.run()  # primeira carga: snapshot, ledger e rollup
+at.run()  # primeiro rerun: preenche o que as páginas calculam só quando precisam
+assert not at.exception, [e.value for e in at.exception]
+delta_rss = rerun_rss(at)
+assert not at.exception, [e.value for e in at.exception]
+gc.collect()
+tracemalloc.start()
+antes = tracemalloc.get_traced_memory()[0]
+inicio = time.perf_counter()
+at.run()
+segundos = time.perf_counter() - inicio
+pico = tracemalloc.get_traced_memory()[1] - antes
+tracemalloc.stop()
+assert not at.exception, [e.value for e in at.exception]
+print(pico, segundos, delta_rss, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+"""
+BENCH_PAGES = ("3_manage_banks.py", "4_quick_actions.py")
+
+
+def _pages(n: int = 500_000, baseline: str = None):
+    """Pico de memória de um rerun das páginas (AppTest, cache quente) com um histórico de `n` linhas.
+
+    Cada página roda em um processo novo, numa cópia do código com o usuário
+    dentro dela. Com `baseline` (outra cópia do repositório, ex.:
+    `git archive <commit> | tar -x -C /tmp/base`), a mesma medição é feita
+    nela para comparar. Versões que desenham um widget por linha do histórico
+    (anteriores à paginação) não terminam nesses tamanhos.
+    """
+    import os
+    import shutil
+    import subprocess
+
+    arvores = [("atual", Path(__file__).resolve().parents[1])]
+    if baseline:
+        arvores.insert(0, ("base", Path(baseline).resolve()))
+    with tempfile.TemporaryDirectory() as tmp:
+        modelo = Path(tmp) / "modelo"
+        modelo.mkdir()
+        hist = _synthetic_history(n)
+        contas = hist.drop_duplicates("BancoID").sort_values("BancoID")
+        pd.DataFrame({"ID": contas["BancoID"], "Tipo": contas["Tipo"], "Nome": contas["Nome"],
+                      "Saldo": 1e6, "Detalhes": ""}).to_csv(modelo / "db.csv", index=False)
+        hist.to_csv(modelo / "history.csv", index=False)
+        pd.DataFrame(columns=list(SCHEMAS["future"])).to_csv(modelo / "future_transactions.csv", index=False)
+
+        medidas = {}
+        for nome, arvore in arvores:
+            for page in BENCH_PAGES:
+                # cópia nova do código a cada execução, com o usuário dentro dela: versões antigas
+                # resolvem a pasta pelo __file__ das páginas, as atuais pelo diretório corrente
+                cwd = Path(tmp) / f"{nome}-{page}"
+                shutil.copytree(arvore, cwd, ignore=shutil.ignore_patterns(".git", "data_users", "__pycache__", "tmp"))
+                shutil.copytree(modelo, cwd / "data" / "data_users" / "bench_mem")
+                r = subprocess.run([sys.executable, "-c", _PAGE_RERUN, str(cwd), page, "bench_mem"], cwd=cwd,
+                                   env={**os.environ, "PYTHONPATH": str(cwd)}, capture_output=True, text=True)
+                if r.returncode:
+                    raise RuntimeError(f"{nome} {page}:\n{r.stderr[-3000:]}")
+                pico, segundos, delta_rss, maxrss = r.stdout.split()[-4:]
+                medidas[nome, page] = (int(pico), float(segundos), int(delta_rss), int(maxrss))
+                shutil.rmtree(cwd)
+
+    print(f"{n} linhas de histórico, rerun com o cache quente: alocação (tracemalloc) | "
+          f"aumento do RSS no rerun | maxrss do processo")
+    for page in BENCH_PAGES:
+        linha = "  ".join(f"{nome}: {m[0] / 1e6:6.1f} MB em {m[1]:.2f}s | {m[2] / 1e6:6.1f} MB | {m[3] / 1e6:5.0f} MB"
+                          for nome, m in ((nome, medidas[nome, page]) for nome, _ in arvores))
+        if baseline:
+            (p0, _, d0, r0), (p1, _, d1, r1) = medidas["base", page], medidas["atual", page]
+            linha += (f"  -> alocação {p0 / max(p1, 1):.1f}x, RSS do rerun {d0 / max(d1, 1):.1f}x, "
+                      f"maxrss {r0 / r1:.2f}x")
+        print(f"  {page:>20}  {linha}")
+
+
+def _main(argv):
+    if argv[:1] == ["bench"]:
+        _bench(int(argv[1]) if len(argv) > 1 else 1_000_000)
+    elif argv[:1] == ["mem"]:
+        _mem(int(argv[1]) if len(argv) > 1 else 500_000)
+    elif argv[:1] == ["pages"]:
+        base = argv.index("--baseline") if "--baseline" in argv else None
+        resto = [a for i, a in enumerate(argv[1:], 1) if base is None or i not in (base, base + 1)]
+        _pages(int(resto[0]) if resto else 500_000, argv[base + 1] if base is not None else None)
+    else:
+        print(__doc__)
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
@@ -0,0 +1,563 @@
+# data/storage.py
+"""Backends de armazenamento das tabelas de cada usuário.
+
+O layout em CSV (db.csv, history.csv, future_transactions.csv e
+future_exclusions.json) continua sendo o padrão e o formato de
+importação/exportação. O backend SQLite guarda as mesmas tabelas em um único
+arquivo com índices por ID/BancoID e atualizações por linha.
+
+O backend é escolhido pela variável de ambiente CASH_STORAGE ("csv" ou "sqlite").
+"""
+import json
+import os
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.exclusions import ExclusionIndex, to_ordinal
+from data.fileio import atomic_write_csv, atomic_write_text
+from data.journal import COMPACT_THRESHOLD, Journal
+from data.schema import conform, load_snapshot, save_snapshot, set_cells
+
+ACCOUNT_COLUMNS = ["ID", "Tipo", "Nome", "Saldo", "Detalhes"]
+HISTORY_COLUMNS = ["ID", "BancoID", "Tipo", "Nome", "Data", "Operação", "Valor", "Categoria", "Descrição"]
+FUTURE_COLUMNS = HISTORY_COLUMNS + ["Recorrencia", "Duracao_meses"]
+
+# tabela -> (arquivo CSV, colunas)
+TABLES = {
+    "accounts": ("db.csv", ACCOUNT_COLUMNS),
+    "history": ("history.csv", HISTORY_COLUMNS),
+    "future": ("future_transactions.csv", FUTURE_COLUMNS),
+}
+EXCLUSIONS_FILE = "future_exclusions.json"
+EXCLUSIONS_LOG = "future_exclusions.log"
+EXCLUSIONS_LOG_MAX_BYTES = 16 * 1024
+SQLITE_FILE = "cash.sqlite3"
+
+DEFAULT_BACKEND = "csv"
+
+# tabelas CSV gravadas via journal append-only (ver data/journal.py)
+JOURNALED_TABLES = ("history",)
+
+
+def empty_table(table: str) -> pd.DataFrame:
+    """DataFrame vazio com as colunas (e os tipos) da tabela."""
+    return conform(table, pd.DataFrame(columns=TABLES[table][1]))
+
+
+def _ensure_columns(table: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Garante que as colunas do schema existam (compatibilidade retroativa)."""
+    for c in TABLES[table][1]:
+        if c not in df.columns:
+            df[c] = None
+    return df
+
+
+# colunas aceitas para ordenar consultas paginadas
+SORTABLE_COLUMNS = ("Data", "Valor", "Nome", "ID")
+
+
+def _sort_key(s: pd.Series, ascending: bool) -> np.ndarray:
+    """Chave numérica cuja ordem crescente é a ordem pedida, com ausentes no fim."""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats = s.cat.categories
+        rank = np.arange(len(cats)) if cats.is_monotonic_increasing else np.argsort(np.argsort(cats.to_numpy()))
+        codes = s.cat.codes.to_numpy()
+        na = codes < 0
+        key = rank[codes].astype(np.float64)
+    elif pd.api.types.is_datetime64_any_dtype(s):
+        valores = s.to_numpy()
+        na = np.isnat(valores)
+        key = valores.view(np.int64).astype(np.float64)
+    elif pd.api.types.is_numeric_dtype(s):
+        key = s.to_numpy(dtype=np.float64, na_value=np.nan, copy=True)
+        na = np.isnan(key)
+    else:
+        codes, _ = pd.factorize(s, sort=True)
+        na = codes < 0
+        key = codes.astype(np.float64)
+    if not ascending:
+        np.negative(key, out=key)
+    key[na] = np.inf
+    return key
+
+
+def filter_page(df: pd.DataFrame, tipos=None, operacoes=None, categorias=None, start=None, end=None,
+                sort_by: str = "Data", ascending: bool = False, offset: int = 0, limit: int = None):
+    """Filtra, ordena e pagina uma tabela já carregada; retorna (página, total filtrado).
+
+    `start`/`end` são datas inclusivas; empates na ordenação seguem o ID. A
+    ordenação usa só chaves numéricas (argsort estável, ou np.lexsort com o ID
+    quando os IDs não seguem a ordem das linhas) e só as linhas da página são
+    copiadas da tabela.
+    """
+    if sort_by not in SORTABLE_COLUMNS:
+        raise ValueError(f"Coluna de ordenação inválida: {sort_by}")
+    mask = None
+    if tipos:
+        mask = df["Tipo"].isin(list(tipos)).to_numpy()
+    if operacoes:
+        m = df["Operação"].isin(list(operacoes)).to_numpy()
+        mask = m if mask is None else mask & m
+    if categorias:
+        m = df["Categoria"].isin(list(categorias)).to_numpy()
+        mask = m if mask is None else mask & m
+    if start is not None or end is not None:
+        # compara o instante com os limites do dia, sem normalizar a coluna
+        datas = df["Data"]
+        if not pd.api.types.is_datetime64_any_dtype(datas):
+            datas = pd.to_datetime(datas, errors="coerce")
+        if start is not None:
+            m = (datas >= pd.Timestamp(start).normalize()).to_numpy()
+            mask = m if mask is None else mask & m
+        if end is not None:
+            m = (datas < pd.Timestamp(end).normalize() + pd.Timedelta(days=1)).to_numpy()
+            mask = m if mask is None else mask & m
+    total = len(df) if mask is None else int(mask.sum())
+    stop = None if limit is None else offset + limit
+    if total == 0 or (stop is not None and stop <= offset):
+        return df.iloc[0:0].reset_index(drop=True), total
+
+    pos = None if mask is None else np.flatnonzero(mask)
+    key = _sort_key(df[sort_by], ascending)
+    if pos is not None:
+        key = key[pos]
+    ids = df["ID"].to_numpy()
+    if sort_by == "ID" or (ids.dtype.kind in "iu" and bool((ids[1:] >= ids[:-1]).all())):
+        # IDs na ordem das linhas: basta uma ordenação estável pela coluna
+        # (no decrescente, os empates ficam com o ID maior primeiro)
+        if ascending:
+            ordem = np.argsort(key, kind="stable")
+        else:
+            ordem = np.argsort(key[::-1], kind="stable")
+            np.subtract(len(key) - 1, ordem, out=ordem)
+    else:
+        id_key = _sort_key(df["ID"], ascending)
+        ordem = np.lexsort((id_key if pos is None else id_key[pos], key))  # a última chave é a principal
+    ordem = ordem[offset:stop]
+    return df.take(ordem if pos is None else pos[ordem]).reset_index(drop=True), total
+
+
+def _file_signature(path: Path):
+    """(mtime_ns, tamanho) do arquivo, ou None se ele não existir."""
+    try:
+        st_ = path.stat()
+    except FileNotFoundError:
+        return None
+    return st_.st_mtime_ns, st_.st_size
+
+
+class StorageBackend:
+    """Interface comum. As operações por linha usam a tabela completa por padrão;
+    backends com acesso indexado sobrescrevem esses métodos."""
+
+    name = "base"
+    # True quando query_rows usa índices em vez de carregar a tabela inteira
+    indexed_queries = False
+
+    def __init__(self, folder: Path):
+        self.folder = Path(folder)
+
+    def signature(self, table: str):
+        """Identifica a versão em disco da tabela ("exclusions" incluso); muda a cada escrita."""
+        raise NotImplementedError
+
+    # --- tabelas completas ---
+    def load_table(self, table: str) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def save_table(self, table: str, df: pd.DataFrame):
+        raise NotImplementedError
+
+    # --- operações por linha ---
+    def get_rows(self, table: str, ids) -> pd.DataFrame:
+        df = self.load_table(table)
+        return df[df["ID"].isin(list(ids))]
+
+    def rows_for_account(self, table: str, banco_id: int) -> pd.DataFrame:
+        df = self.load_table(table)
+        return df[pd.to_numeric(df["BancoID"], errors="coerce") == banco_id]
+
+    def query_rows(self, table: str, **query):
+        """Consulta paginada (ver `filter_page`); retorna (página, total filtrado)."""
+        return filter_page(self.load_table(table), **query)
+
+    def next_id(self, table: str) -> int:
+        df = self.load_table(table)
+        return 1 if df.empty else int(pd.to_numeric(df["ID"], errors="coerce").max()) + 1
+
+    def append_rows(self, table: str, rows: pd.DataFrame):
+        df = self.load_table(table)
+        df = rows.copy() if df.empty else pd.concat([df, rows], ignore_index=True)
+        self.save_table(table, df)
+
+    def update_rows(self, table: str, row_id: int, values: dict) -> int:
+        df = self.load_table(table)
+        mask = df["ID"] == row_id
+        set_cells(df, mask, values)
+        if mask.any():
+            self.save_table(table, df)
+        return int(mask.sum())
+
+    def delete_rows(self, table: str, ids) -> int:
+        df = self.load_table(table)
+        mask = df["ID"].isin(list(ids))
+        if mask.any():
+            self.save_table(table, df[~mask].reset_index(drop=True))
+        return int(mask.sum())
+
+    # --- exclusões de instâncias futuras (ver data/exclusions.py) ---
+    def load_exclusions(self) -> ExclusionIndex:
+        raise NotImplementedError
+
+    def save_exclusions(self, index: ExclusionIndex):
+        raise NotImplementedError
+
+    def add_exclusions(self, pairs):
+        """Inclui pares (sched_id, data ou ordinal) sem regravar o índice inteiro."""
+        index = self.load_exclusions()
+        for sched_id, day in pairs:
+            index.add(sched_id, day)
+        self.save_exclusions(index)
+
+    def drop_exclusions(self, sched_ids):
+        """Remove as exclusões de agendamentos apagados."""
+        index = self.load_exclusions()
+        if index.drop_schedules(sched_ids):
+            self.save_exclusions(index)
+
+
+class CSVBackend(StorageBackend):
+    """Layout original: um CSV por tabela e um JSON com as exclusões."""
+
+    name = "csv"
+
+    def __init__(self, folder: Path):
+        super().__init__(folder)
+        # history.csv recebe inclusões/edições/exclusões via journal append-only
+        self.journals = {t: Journal(self.path(t), TABLES[t][1]) for t in JOURNALED_TABLES}
+
+    def path(self, table: str) -> Path:
+        if table == "exclusions":
+            return self.folder / EXCLUSIONS_FILE
+        return self.folder / TABLES[table][0]
+
+    def signature(self, table: str):
+        if table == "exclusions":
+            return _file_signature(self.path(table)), _file_signature(self.folder / EXCLUSIONS_LOG)
+        if table in self.journals:
+            return _file_signature(self.path(table)), _file_signature(self.journals[table].path)
+        return _file_signature(self.path(table))
+
+    def _load_base(self, table: str) -> pd.DataFrame:
+        """CSV base já tipado, pelo snapshot colunar quando ele corresponde ao CSV (ver data/schema.py)."""
+        path = self.path(table)
+        sig = _file_signature(path)  # antes da leitura: um CSV trocado no meio invalida o snapshot
+        if sig is None:
+            return empty_table(table)
+        df = load_snapshot(path, sig)
+        if df is None:
+            df = conform(table, _ensure_columns(table, pd.read_csv(path)), intern=True)
+            save_snapshot(path, df, sig)
+        return df
+
+    def load_table(self, table: str) -> pd.DataFrame:
+        df = self._load_base(table)
+        if table in self.journals:
+            df = conform(table, self.journals[table].replay(df))
+        return df
+
+    def save_table(self, table: str, df: pd.DataFrame):
+        if table in self.journals:
+            self.journals[table].compact(df)
+            return
+        atomic_write_csv(self.path(table), df)
+
+    def compact(self, table: str = "history"):
+        """Incorpora o journal ao CSV base."""
+        self.journals[table].compact(self.load_table(table))
+
+    def _after_journal_write(self, table: str):
+        if self.journals[table].needs_compaction():
+            self.compact(table)
+
+    def append_rows(self, table: str, rows: pd.DataFrame):
+        if table not in self.journals:
+            return super().append_rows(table, rows)
+        if len(rows) >= COMPACT_THRESHOLD:
+            # lote que compactaria logo em seguida: vai direto para o CSV base, sem passar pelo journal
+            df = self.load_table(table)
+            df = rows.copy() if df.empty else pd.concat([df, rows], ignore_index=True)
+            return self.journals[table].compact(df)
+        self.journals[table].add(rows)
+        self._after_journal_write(table)
+
+    def update_rows(self, table: str, row_id: int, values: dict) -> int:
+        if table not in self.journals:
+            return super().update_rows(table, row_id, values)
+        # sem reler a tabela: o journal só registra a operação (retorna 1 linha pedida)
+        self.journals[table].update(row_id, values)
+        self._after_journal_write(table)
+        return 1
+
+    def delete_rows(self, table: str, ids) -> int:
+        if table not in self.journals:
+            return super().delete_rows(table, ids)
+        ids = [int(i) for i in ids]
+        if ids:
+            self.journals[table].delete(ids)
+            self._after_journal_write(table)
+        return len(ids)
+
+    def load_exclusions(self) -> ExclusionIndex:
+        path = self.path("exclusions")
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                index = ExclusionIndex.from_json(json.load(f))
+        else:
+            index = ExclusionIndex()
+        # inclusões incrementais ainda não incorporadas ao JSON ("sched_id,ordinal" por linha)
+        log = self.folder / EXCLUSIONS_LOG
+        if log.exists():
+            for line in log.read_text(encoding="utf-8").splitlines():
+                sched_id, _, ordinal = line.partition(",")
+                if sched_id.isdigit() and ordinal.isdigit():
+                    index.add(int(sched_id), int(ordinal))
+        return index
+
+    def save_exclusions(self, index: ExclusionIndex):
+        atomic_write_text(self.path("exclusions"), json.dumps(index.to_json(), indent=2))
+        (self.folder / EXCLUSIONS_LOG).unlink(missing_ok=True)
+
+    def add_exclusions(self, pairs):
+        lines = "".join(
+            f"{int(s)},{d if isinstance(d, (int, np.integer)) else to_ordinal(d)}\n" for s, d in pairs
+        )
+        if not lines:
+            return
+        log = self.folder / EXCLUSIONS_LOG
+        with open(log, "a", encoding="utf-8") as f:
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        if log.stat().st_size > EXCLUSIONS_LOG_MAX_BYTES:
+            self.save_exclusions(self.load_exclusions())
+
+
+# tipos SQLite por coluna (as demais são TEXT)
+_SQL_TYPES = {"ID": "INTEGER", "BancoID": "INTEGER", "Saldo": "REAL", "Valor": "REAL", "Duracao_meses": "INTEGER"}
+
+
+def _q(col: str) -> str:
+    return f'"{col}"'
+
+
+def _to_records(df: pd.DataFrame, columns) -> list:
+    """Converte o DataFrame em tuplas prontas para o sqlite (NaN -> NULL, datas -> texto)."""
+    out = pd.DataFrame(index=df.index)
+    for c in columns:
+        s = df[c] if c in df.columns else pd.Series(None, index=df.index, dtype=object)
+        if pd.api.types.is_datetime64_any_dtype(s):
+            s = s.dt.strftime("%Y-%m-%d %H:%M:%S")
+        elif s.dtype == object:
+            # colunas mistas (ex.: concat de texto com Timestamp): o sqlite não aceita datas
+            datas = s.map(lambda v: isinstance(v, date))
+            if datas.any():
+                s = s.where(~datas, pd.to_datetime(s[datas]).dt.strftime("%Y-%m-%d %H:%M:%S"))
+        out[c] = s.astype(object).where(s.notna(), None)
+    for c in columns:
+        if c in _SQL_TYPES and _SQL_TYPES[c] == "INTEGER":
+            out[c] = [None if v is None else int(v) for v in out[c]]
+    return list(out.itertuples(index=False, name=None))
+
+
+class SQLiteBackend(StorageBackend):
+    """Todas as tabelas do usuário em um arquivo SQLite com índices por ID e BancoID."""
+
+    name = "sqlite"
+    indexed_queries = True
+
+    def __init__(self, folder: Path):
+        super().__init__(folder)
+        self.db_path = self.folder / SQLITE_FILE
+        is_new = not self.db_path.exists()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self._create_schema()
+        if is_new:
+            # primeira abertura: migra o layout CSV existente
+            copy_tables(CSVBackend(self.folder), self)
+
+    def _create_schema(self):
+        with self.conn:
+            for table, (_, columns) in TABLES.items():
+                cols = ", ".join(f"{_q(c)} {_SQL_TYPES.get(c, 'TEXT')}" for c in columns)
+                self.conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols})")
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_id ON {table} ({_q('ID')})")
+                if "BancoID" in columns:
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_banco ON {table} ({_q('BancoID')})")
+            # ordenação/filtro por data do editor de histórico
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_history_data ON history ({_q('Data')}, {_q('ID')})")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS future_exclusions ("
+                "sched_id INTEGER NOT NULL, day INTEGER NOT NULL, PRIMARY KEY (sched_id, day)) WITHOUT ROWID"
+            )
+            # tabela antiga com as chaves "{sched_id}_{YYYY-MM-DD}"
+            legacy = self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'exclusions'"
+            ).fetchone()
+            if legacy:
+                keys = [k for (k,) in self.conn.execute("SELECT key FROM exclusions")]
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO future_exclusions (sched_id, day) VALUES (?, ?)",
+                    list(ExclusionIndex.from_legacy(keys).pairs()),
+                )
+                self.conn.execute("DROP TABLE exclusions")
+
+    def _select(self, table: str, where: str = "", params=(), order: str = "rowid") -> pd.DataFrame:
+        columns = TABLES[table][1]
+        sql = f"SELECT {', '.join(_q(c) for c in columns)} FROM {table} {where} ORDER BY {order}"
+        rows = self.conn.execute(sql, params).fetchall()
+        return conform(table, pd.DataFrame(rows, columns=columns))
+
+    def _insert(self, table: str, df: pd.DataFrame):
+        columns = TABLES[table][1]
+        sql = f"INSERT INTO {table} ({', '.join(_q(c) for c in columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        self.conn.executemany(sql, _to_records(df, columns))
+
+    def signature(self, table: str):
+        # qualquer escrita altera o arquivo principal ou o WAL
+        wal = self.db_path.with_name(self.db_path.name + "-wal")
+        return _file_signature(self.db_path), _file_signature(wal)
+
+    def load_table(self, table: str) -> pd.DataFrame:
+        return self._select(table)
+
+    def save_table(self, table: str, df: pd.DataFrame):
+        with self.conn:
+            self.conn.execute(f"DELETE FROM {table}")
+            self._insert(table, df)
+
+    def get_rows(self, table: str, ids) -> pd.DataFrame:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return empty_table(table)
+        marks = ", ".join("?" for _ in ids)
+        return self._select(table, f"WHERE {_q('ID')} IN ({marks})", ids)
+
+    def rows_for_account(self, table: str, banco_id: int) -> pd.DataFrame:
+        return self._select(table, f"WHERE {_q('BancoID')} = ?", (int(banco_id),))
+
+    def query_rows(self, table: str, tipos=None, operacoes=None, categorias=None, start=None, end=None,
+                   sort_by: str = "Data", ascending: bool = False, offset: int = 0, limit: int = None):
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Coluna de ordenação inválida: {sort_by}")
+        conds, params = [], []
+        for col, values in (("Tipo", tipos), ("Operação", operacoes), ("Categoria", categorias)):
+            if values:
+                conds.append(f"{_q(col)} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+        # Data é texto ISO ("YYYY-MM-DD" ou "YYYY-MM-DD HH:MM:SS"): comparação lexicográfica
+        if start is not None:
+            conds.append(f"{_q('Data')} >= ?")
+            params.append(pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            conds.append(f"{_q('Data')} < ?")
+            params.append((pd.Timestamp(end) + pd.Timedelta(days=1)).strftime("%Y-%m-%d"))
+        where = f"WHERE {' AND '.join(conds)}" if conds else ""
+
+        (total,) = self.conn.execute(f"SELECT COUNT(*) FROM {table} {where}", params).fetchone()
+        direction = "ASC" if ascending else "DESC"
+        order = f"{_q(sort_by)} IS NULL, {_q(sort_by)} {direction}"
+        if sort_by != "ID":
+            order += f", {_q('ID')} {direction}"
+        page = self._select(table, where, [*params, -1 if limit is None else int(limit), int(offset)],
+                            order=f"{order} LIMIT ? OFFSET ?")
+        return page, total
+
+    def next_id(self, table: str) -> int:
+        (max_id,) = self.conn.execute(f"SELECT MAX({_q('ID')}) FROM {table}").fetchone()
+        return 1 if max_id is None else int(max_id) + 1
+
+    def append_rows(self, table: str, rows: pd.DataFrame):
+        with self.conn:
+            self._insert(table, rows)
+
+    def update_rows(self, table: str, row_id: int, values: dict) -> int:
+        if not values:
+            return 0
+        cols = list(values)
+        record = _to_records(pd.DataFrame([values]), cols)[0]
+        sets = ", ".join(f"{_q(c)} = ?" for c in cols)
+        with self.conn:
+            cur = self.conn.execute(f"UPDATE {table} SET {sets} WHERE {_q('ID')} = ?", (*record, int(row_id)))
+        return cur.rowcount
+
+    def delete_rows(self, table: str, ids) -> int:
+        ids = [int(i) for i in ids]
+        if not ids:
+            return 0
+        marks = ", ".join("?" for _ in ids)
+        with self.conn:
+            cur = self.conn.execute(f"DELETE FROM {table} WHERE {_q('ID')} IN ({marks})", ids)
+        return cur.rowcount
+
+    def load_exclusions(self) -> ExclusionIndex:
+        index = ExclusionIndex()
+        for sched_id, day in self.conn.execute("SELECT sched_id, day FROM future_exclusions"):
+            index.add(sched_id, day)
+        return index
+
+    def save_exclusions(self, index: ExclusionIndex):
+        with self.conn:
+            self.conn.execute("DELETE FROM future_exclusions")
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO future_exclusions (sched_id, day) VALUES (?, ?)", list(index.pairs())
+            )
+
+    def add_exclusions(self, pairs):
+        rows = [(int(s), int(d) if isinstance(d, (int, np.integer)) else to_ordinal(d)) for s, d in pairs]
+        with self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO future_exclusions (sched_id, day) VALUES (?, ?)", rows)
+
+    def drop_exclusions(self, sched_ids):
+        ids = [(int(i),) for i in sched_ids]
+        with self.conn:
+            self.conn.executemany("DELETE FROM future_exclusions WHERE sched_id = ?", ids)
+
+
+BACKENDS = {"csv": CSVBackend, "sqlite": SQLiteBackend}
+_instances = {}
+
+
+def get_backend(folder: Path, kind: str = None) -> StorageBackend:
+    """Retorna (e reaproveita) o backend configurado para a pasta do usuário."""
+    kind = kind or os.environ.get("CASH_STORAGE", DEFAULT_BACKEND)
+    if kind not in BACKENDS:
+        raise ValueError(f"Backend de armazenamento desconhecido: {kind}")
+    key = (kind, Path(folder).resolve())
+    if key not in _instances:
+        _instances[key] = BACKENDS[kind](folder)
+    return _instances[key]
+
+
+def copy_tables(src: StorageBackend, dst: StorageBackend):
+    """Copia todas as tabelas e exclusões de um backend para outro (importação/exportação)."""
+    for table in TABLES:
+        dst.save_table(table, src.load_table(table))
+    dst.save_exclusions(src.load_exclusions())
+
+
+def export_csv(src: StorageBackend, dest_folder: Path):
+    """Exporta as tabelas de qualquer backend para o layout CSV em dest_folder."""
+    dest_folder = Path(dest_folder)
+    dest_folder.mkdir(parents=True, exist_ok=True)
+    copy_tables(src, CSVBackend(dest_folder))
+
+
+def import_csv(dst: StorageBackend, src_folder: Path):
+    """Importa um diretório no layout CSV para o backend informado."""
+    copy_tables(CSVBackend(Path(src_folder)), dst)
@@ -0,0 +1,318 @@
+# data/transaction.py
+"""Unidade de trabalho: grava várias tabelas do usuário como uma só operação.
+
+As alterações (tabelas inteiras, linhas incluídas/alteradas/removidas,
+exclusões de instâncias futuras e arquivos auxiliares como indexers.json)
+são acumuladas em um UnitOfWork. No commit:
+
+1. o registro completo das operações é gravado em `commit.wal` (escrita
+   atômica; o rename é o ponto de commit);
+2. as operações são aplicadas no backend, na ordem em que foram feitas;
+3. os hooks de `on_commit` atualizam o estado derivado (ledger.json,
+   rollup.csv, cache da sessão);
+4. o registro é apagado.
+
+Se o processo cair nos passos 2 ou 3 (ou um hook falhar), `recover` encontra
+o registro na próxima abertura e reaplica todas as operações (todas são
+idempotentes), reconstruindo em seguida o ledger e o rollup a partir das
+tabelas. Um registro ilegível significa que o commit não chegou ao passo 2:
+ele é descartado e nada muda.
+
+Commits com uma única operação não precisam das operações no registro, pois
+cada escrita do backend já é atômica por si; se tiverem hooks, gravam um
+registro sem operações, que só marca o estado derivado para reconstrução.
+
+Verificação de queda no meio do commit:
+    python -m data.transaction
+    python -m data.transaction recover <usuário>
+"""
+import json
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data.exclusions import ExclusionIndex, to_ordinal
+from data.fileio import atomic_write_text
+from data.journal import _row_dict, _row_dicts
+from data.storage import TABLES, get_backend
+
+WAL_FILE = "commit.wal"
+
+# pastas com commit em andamento nesta thread: o registro delas não é de um commit interrompido
+_committing = threading.local()
+
+
+def wal_path(folder: Path) -> Path:
+    return Path(folder) / WAL_FILE
+
+
+def _records(df: pd.DataFrame) -> list:
+    return _row_dicts(df)
+
+
+class UnitOfWork:
+    """Operações pendentes sobre as tabelas de um backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.folder = Path(backend.folder)
+        self.ops = []
+        self._hooks = []
+
+    # --- operações ---
+    def save_table(self, table: str, df: pd.DataFrame):
+        self.ops.append(("save_table", table, df.copy()))
+
+    def append_rows(self, table: str, rows: pd.DataFrame):
+        if not rows.empty:
+            self.ops.append(("append_rows", table, rows.copy()))
+
+    def update_rows(self, table: str, row_id: int, values: dict):
+        self.ops.append(("update_rows", table, (int(row_id), dict(values))))
+
+    def delete_rows(self, table: str, ids):
+        ids = [int(i) for i in ids]
+        if ids:
+            self.ops.append(("delete_rows", table, ids))
+
+    def save_exclusions(self, index: ExclusionIndex):
+        self.ops.append(("save_exclusions", "exclusions", index))
+
+    def add_exclusions(self, pairs):
+        pairs = [(int(s), int(d) if isinstance(d, (int, np.integer)) else to_ordinal(d)) for s, d in pairs]
+        if pairs:
+            self.ops.append(("add_exclusions", "exclusions", pairs))
+
+    def drop_exclusions(self, sched_ids):
+        ids = [int(i) for i in sched_ids]
+        if ids:
+            self.ops.append(("drop_exclusions", "exclusions", ids))
+
+    def save_file(self, name: str, text: str):
+        """Grava um arquivo auxiliar da pasta do usuário (ex.: JSON de configuração) no mesmo commit."""
+        self.ops.append(("save_file", "files", {"name": name, "text": text}))
+
+    def on_commit(self, func):
+        """Agenda `func()` para depois do commit (atualizações derivadas: ledger, rollup, cache)."""
+        self._hooks.append(func)
+
+    @property
+    def tables(self) -> set:
+        return {table for _, table, _ in self.ops}
+
+    # --- commit ---
+    def to_json(self) -> dict:
+        ops = []
+        for kind, table, arg in self.ops:
+            if kind in ("save_table", "append_rows"):
+                arg = _records(arg)
+            elif kind == "update_rows":
+                arg = [arg[0], _row_dict(arg[1])]
+            elif kind == "save_exclusions":
+                arg = arg.to_json()
+            ops.append({"op": kind, "table": table, "arg": arg})
+        return {"version": 1, "ops": ops}
+
+    def commit(self):
+        """Grava o registro, aplica tudo, roda os hooks e só então apaga o registro."""
+        wal = wal_path(self.folder)
+        if len(self.ops) > 1:
+            atomic_write_text(wal, json.dumps(self.to_json(), ensure_ascii=False))
+        elif self.ops and self._hooks:
+            atomic_write_text(wal, json.dumps({"version": 1, "ops": []}))
+        ops, hooks = self.ops, self._hooks
+        self.ops, self._hooks = [], []
+        folders = _committing.__dict__.setdefault("folders", set())
+        key = str(self.folder.resolve())
+        folders.add(key)
+        try:
+            for kind, table, arg in ops:
+                _apply(self.backend, kind, table, arg)
+            for func in hooks:
+                func()
+        finally:
+            folders.discard(key)
+        wal.unlink(missing_ok=True)
+
+
+def _apply(backend, kind: str, table: str, arg, recovering: bool = False):
+    """Aplica uma operação; em recuperação, ignora inclusões cujos IDs já existem."""
+    if kind == "save_table":
+        backend.save_table(table, arg)
+    elif kind == "append_rows":
+        if recovering and "ID" in arg.columns:
+            existentes = set(backend.get_rows(table, arg["ID"].dropna().astype(int))["ID"].astype(int))
+            arg = arg[~arg["ID"].isin(existentes)]
+        if not arg.empty:
+            backend.append_rows(table, arg)
+    elif kind == "update_rows":
+        backend.update_rows(table, *arg)
+    elif kind == "delete_rows":
+        backend.delete_rows(table, arg)
+    elif kind == "save_exclusions":
+        backend.save_exclusions(arg)
+    elif kind == "add_exclusions":
+        backend.add_exclusions(arg)
+    elif kind == "drop_exclusions":
+        backend.drop_exclusions(arg)
+    elif kind == "save_file":
+        atomic_write_text(Path(backend.folder) / Path(arg["name"]).name, arg["text"])
+    else:
+        raise ValueError(f"Operação desconhecida no registro de commit: {kind}")
+
+
+def _decode(op: dict):
+    kind, table, arg = op["op"], op["table"], op["arg"]
+    if kind in ("save_table", "append_rows"):
+        arg = pd.DataFrame(arg, columns=TABLES[table][1])
+    elif kind == "update_rows":
+        arg = (int(arg[0]), arg[1])
+    elif kind == "save_exclusions":
+        arg = ExclusionIndex.from_json(arg)
+    elif kind == "add_exclusions":
+        arg = [tuple(p) for p in arg]
+    return kind, table, arg
+
+
+# --- recuperação ---
+def pending(folder: Path) -> bool:
+    """Há um registro de commit na pasta? (interrompido, ou em andamento em outra thread)
+
+    O registro do commit em andamento na própria thread (visto pelos hooks) não conta.
+    """
+    if str(Path(folder).resolve()) in _committing.__dict__.get("folders", ()):
+        return False
+    return wal_path(folder).exists()
+
+
+def recover(folder: Path, backend=None) -> str:
+    """Conclui ou descarta um commit interrompido; retorna "none", "rolled_back" ou "replayed".
+
+    Deve ser chamada com o lock do usuário: como o commit também segura o lock,
+    um registro visto dentro dele é sempre de um commit interrompido.
+    """
+    from data.ledger import Ledger
+    from data.rollup import Rollup
+
+    wal = wal_path(folder)
+    if not wal.exists():
+        return "none"
+    try:
+        ops = [_decode(op) for op in json.loads(wal.read_text(encoding="utf-8"))["ops"]]
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        wal.unlink(missing_ok=True)
+        return "rolled_back"
+
+    backend = backend or get_backend(folder)
+    for kind, table, arg in ops:
+        _apply(backend, kind, table, arg, recovering=True)
+    # ledger e rollup podem ter ficado no meio do caminho: recalcula a partir das tabelas
+    hist = backend.load_table("history")
+    ledger = Ledger.load(folder)
+    ledger.rebuild(hist, backend.load_table("accounts"))
+    Rollup(folder).rebuild(hist)
+    wal.unlink(missing_ok=True)
+    return "replayed"
+
+
+# --- verificação de queda no meio do commit ---
+class _Crash(Exception):
+    pass
+
+
+def _simulate(crash_after: int) -> dict:
+    """Commit de 3 tabelas interrompido após `crash_after` operações, seguido de recover.
+
+    Com `crash_after` 3 a queda é no hook que atualiza o ledger, depois de todas as operações.
+    """
+    from data.ledger import Ledger
+    from data.storage import CSVBackend
+
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        pd.DataFrame([{"ID": 1, "Tipo": "Banco", "Nome": "Conta", "Saldo": 100.0, "Detalhes": ""}]).to_csv(
+            folder / "db.csv", index=False)
+        backend = CSVBackend(folder)
+        ledger = Ledger.load(folder)
+
+        tx = UnitOfWork(backend)
+        accounts = backend.load_table("accounts")
+        accounts["Saldo"] = 150.0
+        tx.save_table("accounts", accounts)
+        rows = pd.DataFrame([{
+            "ID": 1, "BancoID": 1, "Tipo": "Banco", "Nome": "Conta", "Data": "2025-01-10",
+            "Operação": "Depósito", "Valor": 50.0, "Categoria": "", "Descrição": "",
+        }])
+        tx.append_rows("history", rows)
+        tx.add_exclusions([(7, pd.Timestamp("2025-01-10"))])
+        calls = {"n": 0}
+
+        def hook():
+            if calls["n"] == crash_after:
+                raise _Crash()
+            ledger.apply(added=rows)
+        tx.on_commit(hook)
+
+        original = _apply
+
+        def crashing(*args, **kwargs):
+            if calls["n"] == crash_after:
+                raise _Crash()
+            calls["n"] += 1
+            return original(*args, **kwargs)
+
+        globals()["_apply"] = crashing
+        try:
+            tx.commit()
+        except _Crash:
+            pass
+        finally:
+            globals()["_apply"] = original
+
+        resultado = recover(folder, CSVBackend(folder))
+        backend = CSVBackend(folder)
+        return {
+            "resultado": resultado,
+            "saldo": float(backend.load_table("accounts")["Saldo"].iloc[0]),
+            "linhas": len(backend.load_table("history")),
+            "exclusoes": len(backend.load_exclusions()),
+            "ledger": Ledger.load(folder).verify(backend.load_table("accounts")).empty,
+        }
+
+
+def _main(argv):
+    if argv:
+        if len(argv) != 2 or argv[0] != "recover":
+            print(__doc__)
+            return 2
+        from data.locking import user_lock
+
+        folder = Path("data/data_users") / argv[1]
+        with user_lock(folder):
+            print(recover(folder))
+        return 0
+
+    ok = True
+    # registro truncado: o commit não chegou a aplicar nada e é descartado
+    with tempfile.TemporaryDirectory() as folder:
+        wal_path(folder).write_text('{"version": 1, "ops": [{"op": "save_t', encoding="utf-8")
+        r = recover(Path(folder))
+        ok &= r == "rolled_back" and not wal_path(folder).exists()
+        print(f"registro truncado: {r}")
+    for crash_after in range(5):
+        r = _simulate(crash_after)
+        consistente = (r["saldo"], r["linhas"], r["exclusoes"], r["ledger"]) == (150.0, 1, 1, True)
+        ok &= consistente
+        print(f"queda após {crash_after} operação(ões): {r['resultado']:>8} -> saldo {r['saldo']:.0f}, "
+              f"{r['linhas']} linha(s) no histórico, {r['exclusoes']} exclusão(ões), "
+              f"ledger {'igual' if r['ledger'] else 'divergente'} "
+              f"{'OK' if consistente else 'INCONSISTENTE'}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(_main(sys.argv[1:]))
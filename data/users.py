@@ -0,0 +1,227 @@
+# data/users.py
+"""Cadastro de usuários indexado (SQLite), no lugar do users.json monolítico.
+
+Cada usuário é uma linha com chave primária `username`: login, cadastro,
+troca de credenciais e exclusão leem ou gravam um único registro, em vez de
+interpretar e regravar o arquivo inteiro. Escritores concorrentes (abas,
+processos) são serializados pelo próprio SQLite: cada escrita é uma
+transação `BEGIN IMMEDIATE` e quem chega depois espera até `DEFAULT_TIMEOUT`.
+
+Na primeira abertura o conteúdo de data/users.json é importado (o arquivo
+não é mais gravado).
+
+Benchmark (leitura/gravação de um usuário, JSON x registro):
+    python -m data.users [usuários]
+"""
+import json
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from data.locking import DEFAULT_TIMEOUT
+
+USERS_DB = Path("data/users.sqlite3")
+LEGACY_FILE = Path("data/users.json")
+
+_registries = {}
+# conexões ociosas mantidas por registro (as demais são fechadas ao serem devolvidas)
+POOL_SIZE = 4
+
+
+def _flag(value) -> bool:
+    """is_guest veio como bool, "true"/"false" ou 0/1 nas versões do users.json."""
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes")
+    return bool(value)
+
+
+class UserRegistry:
+    """Usuários (senha e flag de visitante) em uma tabela SQLite indexada pelo nome."""
+
+    def __init__(self, path: Path = USERS_DB, legacy: Path = LEGACY_FILE):
+        self.path = Path(path)
+        self.legacy = Path(legacy) if legacy else None
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            # o modo WAL fica gravado no arquivo: vale para as conexões seguintes
+            conn.execute("PRAGMA journal_mode=WAL")
+        with self._write() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " username TEXT PRIMARY KEY,"
+                " password TEXT NOT NULL DEFAULT '',"
+                " is_guest INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            migrated = conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_imported'").fetchone()
+            if not migrated:
+                self._import_legacy(conn)
+                conn.execute("INSERT INTO meta VALUES ('legacy_imported', ?)", (time.strftime("%Y-%m-%d %H:%M:%S"),))
+
+    # --- conexão ---
+    @contextmanager
+    def _connect(self):
+        """Empresta uma conexão do pool durante uma operação.
+
+        As sessões do Streamlit rodam em threads que vêm e vão: uma conexão
+        por thread ficaria aberta depois que a thread termina. Abrir e fechar
+        a cada operação também não serve, porque fechar a última conexão
+        desfaz os arquivos do WAL. O pool guarda até POOL_SIZE conexões
+        ociosas, usadas por uma thread de cada vez.
+        """
+        with self._pool_lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=DEFAULT_TIMEOUT, isolation_level=None,
+                                   check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            with self._pool_lock:
+                keep = len(self._idle) < POOL_SIZE
+                if keep:
+                    self._idle.append(conn)
+            if not keep:
+                conn.close()
+
+    def close(self):
+        """Fecha as conexões ociosas (as emprestadas voltam e ficam no pool)."""
+        with self._pool_lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._connect() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    @contextmanager
+    def _write(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _import_legacy(self, conn: sqlite3.Connection):
+        if not self.legacy or not self.legacy.exists():
+            return
+        users = json.loads(self.legacy.read_text(encoding="utf-8") or "{}")
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (username, password, is_guest) VALUES (?, ?, ?)",
+            [(name, rec.get("password", "") or "", int(_flag(rec.get("is_guest", False))))
+             for name, rec in users.items()],
+        )
+
+    # --- consultas ---
+    def get(self, username: str):
+        """Registro do usuário ({"password", "is_guest"}) ou None."""
+        rows = self._query("SELECT password, is_guest FROM users WHERE username = ?", (username,))
+        if not rows:
+            return None
+        return {"password": rows[0][0], "is_guest": bool(rows[0][1])}
+
+    def exists(self, username: str) -> bool:
+        return bool(self._query("SELECT 1 FROM users WHERE username = ?", (username,)))
+
+    def usernames(self) -> list:
+        return [r[0] for r in self._query("SELECT username FROM users ORDER BY username")]
+
+    def __len__(self) -> int:
+        return self._query("SELECT COUNT(*) FROM users")[0][0]
+
+    # --- escritas (um registro por vez) ---
+    def create(self, username: str, password: str, is_guest: bool = False) -> bool:
+        """Cadastra o usuário; False se o nome já existe."""
+        with self._write() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO users (username, password, is_guest) VALUES (?, ?, ?)",
+                (username, password, int(is_guest)),
+            )
+        return cur.rowcount == 1
+
+    def set_password(self, username: str, password: str) -> bool:
+        with self._write() as conn:
+            cur = conn.execute("UPDATE users SET password = ? WHERE username = ?", (password, username))
+        return cur.rowcount == 1
+
+    def rename(self, old: str, new: str, password: str = None) -> bool:
+        """Troca o nome (e opcionalmente a senha) e marca a conta como não visitante.
+
+        Retorna False se `new` já pertence a outro usuário. Se `old` não está
+        cadastrado, `new` é criado (mesmo efeito da regravação do users.json).
+        """
+        with self._write() as conn:
+            if new != old and conn.execute("SELECT 1 FROM users WHERE username = ?", (new,)).fetchone():
+                return False
+            cur = conn.execute(
+                "UPDATE users SET username = ?, password = COALESCE(?, password), is_guest = 0 WHERE username = ?",
+                (new, password, old),
+            )
+            if cur.rowcount == 0:
+                conn.execute("INSERT INTO users (username, password, is_guest) VALUES (?, ?, 0)", (new, password or ""))
+        return True
+
+    def delete(self, username: str) -> bool:
+        with self._write() as conn:
+            cur = conn.execute("DELETE FROM users WHERE username = ?", (username,))
+        return cur.rowcount == 1
+
+
+def get_registry(path: Path = USERS_DB, legacy: Path = LEGACY_FILE) -> UserRegistry:
+    """Registro compartilhado por caminho (abre e migra uma vez por processo)."""
+    key = str(Path(path).resolve())
+    if key not in _registries:
+        _registries[key] = UserRegistry(path, legacy)
+    return _registries[key]
+
+
+# --- benchmark ---
+def _bench(n: int = 10_000, ops: int = 200):
+    with tempfile.TemporaryDirectory() as folder:
+        folder = Path(folder)
+        legacy = folder / "users.json"
+        legacy.write_text(json.dumps(
+            {f"user{i}": {"password": f"{i:064x}", "is_guest": False} for i in range(n)}, indent=4))
+
+        inicio = time.perf_counter()
+        registry = UserRegistry(folder / "users.sqlite3", legacy)
+        migracao = (time.perf_counter() - inicio) * 1000
+
+        def medir(func):
+            inicio = time.perf_counter()
+            for i in range(ops):
+                func(f"user{(i * 7919) % n}")
+            return (time.perf_counter() - inicio) * 1000 / ops
+
+        def json_login(name):
+            return json.loads(legacy.read_text())[name]
+
+        def json_update(name):
+            users = json.loads(legacy.read_text())
+            users[name]["password"] = "x" * 64
+            legacy.write_text(json.dumps(users, indent=4))
+
+        casos = [
+            ("login (busca)", json_login, registry.get),
+            ("troca de senha", json_update, lambda name: registry.set_password(name, "x" * 64)),
+        ]
+        print(f"{n} usuários (migração do users.json: {migracao:.1f} ms)")
+        for nome, antigo, novo in casos:
+            t_antigo, t_novo = medir(antigo), medir(novo)
+            print(f"{nome:>16}: users.json {t_antigo:8.3f} ms | registro {t_novo:7.3f} ms | {t_antigo / t_novo:6.1f}x")
+        assert registry.get("user0")["password"] == "x" * 64 and len(registry) == n
+        registry.close()
+
+
+if __name__ == "__main__":
+    _bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
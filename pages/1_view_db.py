@@ -1,69 +1,23 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from data.db import load_data, get_summary
-from pathlib import Path
+from data.db import get_context, get_accrual
+from data.schedule import expand_schedules
+from data.vectorized import format_brl
 from datetime import date
 import calendar
 
-user = st.session_state.get("user", "default")
-
-DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "data_users" / user
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-FUTURE_PATH = DATA_DIR / "future_transactions.csv"
-
-def generate_occurrences(start_date, recurr: str, dur_months: int):
-    start = pd.to_datetime(start_date).normalize()
-    today = pd.Timestamp(date.today())
-
-    # define limite máximo (ou 12 meses, ou duração informada)
-    if dur_months and dur_months > 0:
-        end_limit = start + pd.DateOffset(months=dur_months)
-    else:
-        end_limit = start + pd.DateOffset(years=1)
-
-    # garante que o limite nunca passe de 1 ano (proteção)
-    end_limit = min(end_limit, start + pd.DateOffset(years=1))
-
-    dates = []
-    if not recurr or recurr in ("none", None, "once"):
-        # se não há recorrência, só retorna a data se ainda não passou
-        if start >= today:
-            dates = [start]
-        return dates
-
-    # Gera recorrências
-    cur = start
-    while cur <= end_limit:
-        if cur >= today:
-            dates.append(cur)
-
-        if recurr == "weekly":
-            cur += pd.DateOffset(weeks=1)
-        elif recurr == "biweekly":
-            cur += pd.DateOffset(weeks=2)
-        elif recurr == "monthly":
-            cur += pd.DateOffset(months=1)
-        elif recurr == "quarterly":
-            cur += pd.DateOffset(months=3)
-        elif recurr == "yearly":
-            cur += pd.DateOffset(years=1)
-        else:
-            break  # tipo de recorrência desconhecido → interrompe
-    return dates
-
-
 st.set_page_config(layout="wide")
 st.title("📊 Visão Geral")
 
-df = load_data()
+ctx = get_context()
+df = ctx.accounts
 
 if df.empty:
     st.warning("⚠️ Nenhum dado encontrado. Cadastre bancos e investimentos na aba 'Gerenciar Dados'.")
     st.stop()
 
-total_bancos, total_invest, total_geral = get_summary()
+total_bancos, total_invest, total_geral = ctx.totals()
 
 # === MÉTRICAS ===
 col1, col2, col3 = st.columns(3)
@@ -76,76 +30,54 @@ st.markdown("---")
 # === LANÇAMENTOS FUTUROS DO MÊS ===
 st.subheader("📅 Lançamentos Futuros do Mês")
 
-if FUTURE_PATH.exists():
-    fut_df = pd.read_csv(FUTURE_PATH)
-    if not fut_df.empty:
-        fut_df["Data"] = pd.to_datetime(fut_df["Data"], errors="coerce")
-        hoje = date.today()
-        primeiro_dia = hoje.replace(day=1)
-        ultimo_dia = date(hoje.year, hoje.month, calendar.monthrange(hoje.year, hoje.month)[1])
-        primeiro_dia = pd.Timestamp(primeiro_dia)
-        ultimo_dia = pd.Timestamp(ultimo_dia)
-
-        linhas = []
-        for _, row in fut_df.iterrows():
-            rec = row.get("Recorrencia", "none")
-            dur = int(row.get("Duracao_meses") or 0)
-            ocorrencias = generate_occurrences(row["Data"], rec, dur)
-            for d in ocorrencias:
-                if primeiro_dia <= pd.Timestamp(d) <= ultimo_dia:
-                    linhas.append({
-                        "Data": pd.Timestamp(d),
-                        "Operação": row["Operação"],
-                        "Nome": row["Nome"],
-                        "Valor": float(row["Valor"]),
-                        "Categoria": row.get("Categoria", ""),
-                        "Descrição": row.get("Descrição", ""),
-                    })
-
-        if linhas:
-            fut_mes = pd.DataFrame(linhas).sort_values("Data").copy()
-
-            # ✅ Formatações
-            fut_mes["Data_formatada"] = fut_mes["Data"].dt.strftime("%d/%m/%Y")
-            fut_mes["Valor_formatado"] = fut_mes["Valor"].apply(
-                lambda v: f"R$ {v:,.2f}".replace(",", "v").replace(".", ",").replace("v", ".")
-            )
-
-            tabela = fut_mes[[
-                "Data_formatada",
-                "Operação",
-                "Nome",
-                "Valor_formatado",
-                "Categoria",
-                "Descrição"
-            ]]
-
-            tabela.columns = [
-                "📅 Data",
-                "💼 Tipo",
-                "🏦 Conta",
-                "💰 Valor",
-                "🏷️ Categoria",
-                "📝 Descrição"
-            ]
-
-            st.dataframe(
-                tabela,
-                width='stretch',
-                hide_index=True
-            )
-        else:
-            st.info("✅ Nenhuma movimentação futura agendada para este mês.")
+fut_df = ctx.future
+if not fut_df.empty:
+    hoje = date.today()
+    ultimo_dia = date(hoje.year, hoje.month, calendar.monthrange(hoje.year, hoje.month)[1])
+
+    # ocorrências de hoje até o fim do mês, todas expandidas de uma vez
+    fut_mes = expand_schedules(fut_df, start=hoje, end=ultimo_dia)
+
+    if not fut_mes.empty:
+        fut_mes["Valor"] = fut_mes["Valor"].astype(float)
+
+        # ✅ Formatações
+        fut_mes["Data_formatada"] = fut_mes["Data"].dt.strftime("%d/%m/%Y")
+        fut_mes["Valor_formatado"] = format_brl(fut_mes["Valor"])
+
+        tabela = fut_mes[[
+            "Data_formatada",
+            "Operação",
+            "Nome",
+            "Valor_formatado",
+            "Categoria",
+            "Descrição"
+        ]]
+
+        tabela.columns = [
+            "📅 Data",
+            "💼 Tipo",
+            "🏦 Conta",
+            "💰 Valor",
+            "🏷️ Categoria",
+            "📝 Descrição"
+        ]
+
+        st.dataframe(
+            tabela,
+            width='stretch',
+            hide_index=True
+        )
     else:
-        st.info("✅ Nenhuma movimentação futura cadastrada.")
+        st.info("✅ Nenhuma movimentação futura agendada para este mês.")
 else:
-    st.info("✅ Nenhum arquivo de lançamentos futuros encontrado.")
+    st.info("✅ Nenhuma movimentação futura cadastrada.")
 
 # === GRÁFICOS ===
 st.markdown("---")
 col1, col2 = st.columns(2)
-df_bancos = df[df["Tipo"] == "Banco"]
-df_inv = df[df["Tipo"] == "Investimento"]
+df_bancos = ctx.by_type("Banco")
+df_inv = ctx.by_type("Investimento")
 
 with col1:
     st.subheader("🏦 Bancos")
@@ -161,3 +93,22 @@ with col2:
     if not df_inv.empty:
         fig_i = px.pie(df_inv, names="Nome", values="Saldo", title="Distribuição dos Investimentos", hole=0.4)
         st.plotly_chart(fig_i, width='stretch')
+
+# === INVESTIMENTOS INDEXADOS (CDI / Tesouro) ===
+try:
+    corrigidos = get_accrual()
+except FileNotFoundError as e:
+    corrigidos = pd.DataFrame()
+    st.warning(f"Série de taxas não encontrada ({e.filename}). Importe-a com `python -m data.rates import`.")
+if not corrigidos.empty:
+    st.markdown("---")
+    st.subheader("📈 Investimentos corrigidos pelo índice")
+    tabela = pd.DataFrame({
+        "💰 Investimento": corrigidos["Nome"],
+        "📊 Índice": corrigidos["Pct"].map("{:g}%".format) + " " + corrigidos["Serie"],
+        "💵 Saldo lançado": format_brl(corrigidos["Lancado"]),
+        "📈 Saldo corrigido": format_brl(corrigidos["Saldo"]),
+        "✨ Rendimento a lançar": format_brl(corrigidos["Rendimento"]),
+        "📅 Dados até": corrigidos["DadosAte"].dt.strftime("%d/%m/%Y"),
+    })
+    st.dataframe(tabela, width='stretch', hide_index=True)
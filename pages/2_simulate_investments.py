@@ -1,6 +1,8 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
+from data.simulation import simulate_grid, growth_paths, monthly_rate, monte_carlo
 
 st.set_page_config(layout="wide")
 st.title("💰 Simulador de Investimentos")
@@ -19,16 +21,18 @@ col4, col5 = st.columns(2)
 cdi_atual = col4.number_input("🏦 CDI atual (%)", min_value=0.0, step=0.1, value=10.65)
 percentual_cdi = col5.number_input("⚙️ Percentual do CDI (%)", min_value=0.0, step=1.0, value=106.0)
 
-if st.button("Calcular Simulação"):
-    taxa_mensal = (cdi_atual / 100) * (percentual_cdi / 100) / 12
-    valor_total = valor_inicial
-    historico = []
-
-    for mes in range(1, int(meses) + 1):
-        valor_total = (valor_total + aporte_mensal) * (1 + taxa_mensal)
-        historico.append({"Mês": mes, "Valor acumulado": valor_total})
+estocastico = st.toggle("🎲 CDI variável (Monte Carlo)", help="Simula milhares de trajetórias do CDI com reversão à média em vez de um CDI fixo.")
+if estocastico:
+    mc1, mc2, mc3, mc4 = st.columns(4)
+    cdi_longo = mc1.number_input("CDI de longo prazo (%)", min_value=0.0, step=0.25, value=float(cdi_atual))
+    volatilidade = mc2.number_input("Volatilidade (p.p. ao ano)", min_value=0.0, step=0.25, value=1.5)
+    n_trajetorias = mc3.number_input("Trajetórias", min_value=100, max_value=50_000, step=1000, value=5000)
+    semente = mc4.number_input("Semente", min_value=0, step=1, value=0)
 
-    df = pd.DataFrame(historico)
+if st.button("Calcular Simulação"):
+    caminho = growth_paths(valor_inicial, aporte_mensal, monthly_rate(cdi_atual, percentual_cdi), int(meses))[0]
+    df = pd.DataFrame({"Mês": np.arange(1, int(meses) + 1), "Valor acumulado": caminho})
+    valor_total = float(caminho[-1])
     total_aportado = valor_inicial + aporte_mensal * meses
     rendimento = valor_total - total_aportado
 
@@ -46,3 +50,52 @@ if st.button("Calcular Simulação"):
     ))
     fig.update_layout(title="📈 Crescimento do Investimento", xaxis_title="Mês", yaxis_title="Valor (R$)")
     st.plotly_chart(fig, width='stretch')
+
+    # === Sensibilidade: vários cenários ao redor dos valores informados ===
+    st.subheader("🔍 Sensibilidade")
+    cdis = np.round(np.linspace(max(cdi_atual - 4, 0), cdi_atual + 4, 17), 2)
+    percentuais = np.round(np.linspace(max(percentual_cdi - 30, 0), percentual_cdi + 30, 13), 1)
+    grade = simulate_grid(valor_inicial, aporte_mensal, cdis, percentuais, int(meses))
+    mapa = grade.surface("cdi", "pct")
+
+    fig_mapa = go.Figure(go.Heatmap(
+        z=mapa.to_numpy(), x=[f"{p:g}%" for p in mapa.columns], y=[f"{c:g}%" for c in mapa.index],
+        colorscale="Greens", hovertemplate="CDI %{y} · %{x} do CDI<br>R$ %{z:,.2f}<extra></extra>",
+    ))
+    fig_mapa.update_layout(title=f"Valor final após {meses} meses", xaxis_title="Percentual do CDI", yaxis_title="CDI")
+    st.plotly_chart(fig_mapa, width='stretch')
+
+    comparacao = simulate_grid(
+        valor_inicial, aporte_mensal, cdi_atual, sorted({80.0, 100.0, float(percentual_cdi), 120.0}), int(meses),
+        keep_paths=True,
+    ).curves("pct")
+    fig_comp = go.Figure()
+    for p in comparacao.columns[1:]:
+        fig_comp.add_trace(go.Scatter(x=comparacao["Mês"], y=comparacao[p], mode="lines", name=f"{p:g}% do CDI"))
+    fig_comp.update_layout(title="📊 Comparação por percentual do CDI", xaxis_title="Mês", yaxis_title="Valor (R$)")
+    st.plotly_chart(fig_comp, width='stretch')
+
+    # === Monte Carlo: faixas de percentis do saldo ===
+    if estocastico:
+        st.subheader("🎲 CDI variável (Monte Carlo)")
+        mc = monte_carlo(
+            valor_inicial, aporte_mensal, cdi_atual, percentual_cdi, int(meses),
+            n_paths=int(n_trajetorias), long_run=cdi_longo, vol=volatilidade, seed=int(semente),
+        )
+        faixas = mc.final_percentiles()
+        col_p5, col_p50, col_p95 = st.columns(3)
+        col_p5.metric("Pessimista (P5)", f"R$ {faixas['P5']:,.2f}")
+        col_p50.metric("Mediana (P50)", f"R$ {faixas['P50']:,.2f}")
+        col_p95.metric("Otimista (P95)", f"R$ {faixas['P95']:,.2f}")
+
+        leque = mc.fan()
+        fig_mc = go.Figure()
+        fig_mc.add_trace(go.Scatter(x=leque["Mês"], y=leque["P95"], mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+        fig_mc.add_trace(go.Scatter(
+            x=leque["Mês"], y=leque["P5"], mode="lines", line=dict(width=0), fill="tonexty",
+            fillcolor="rgba(0,128,0,0.2)", name="P5–P95",
+        ))
+        fig_mc.add_trace(go.Scatter(x=leque["Mês"], y=leque["P50"], mode="lines", line=dict(color="green"), name="Mediana"))
+        fig_mc.add_trace(go.Scatter(x=df["Mês"], y=df["Valor acumulado"], mode="lines", line=dict(color="gray", dash="dash"), name="CDI fixo"))
+        fig_mc.update_layout(title=f"Leque de {int(n_trajetorias):,} trajetórias do CDI", xaxis_title="Mês", yaxis_title="Valor (R$)")
+        st.plotly_chart(fig_mc, width='stretch')
@@ -1,8 +1,11 @@
 import streamlit as st
-from pathlib import Path
 import pandas as pd
-from data.db import load_data, save_data, add_entry, update_balance
-import json
+from data.db import (
+    get_context, get_account_index, load_data, save_data, add_entry, update_balance,
+    load_history, save_history, load_future, save_future, locked, transaction,
+)
+from data.schema import set_cells
+from data.vectorized import map_ids
 
 # --- CONFIGURAÇÃO INICIAL ---
 st.set_page_config(layout="wide")
@@ -13,72 +16,27 @@ st.markdown(
     "Adicione, visualize e gerencie seus **bancos** e **investimentos** registrados no sistema."
 )
 
-# --- CAMINHOS DE ARQUIVOS POR USUÁRIO ---
-user = st.session_state.get("user", "default")
-
-DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "data_users" / user
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-HIST_PATH = DATA_DIR / "history.csv"
-FUTURE_PATH = DATA_DIR / "future_transactions.csv"
-EXCLUSIONS_PATH = DATA_DIR / "future_exclusions.json"
-
-
 if "pending_action" not in st.session_state:
     st.session_state["pending_action"] = None
 
 
-# --- FUNÇÕES AUXILIARES ---
-def load_history():
-    """Carrega history.csv e garante a coluna BancoID (compatibilidade retroativa)."""
-    if HIST_PATH.exists():
-        h = pd.read_csv(HIST_PATH)
-    else:
-        h = pd.DataFrame(columns=["ID", "BancoID", "Tipo", "Nome", "Data", "Operação", "Valor", "Categoria", "Descrição"])
-
-    # Normaliza colunas mínimas
-    if "BancoID" not in h.columns:
-        h["BancoID"] = None
-    # garante ordem de colunas desejada quando possível
-    cols_pref = ["ID", "BancoID", "Tipo", "Nome", "Data", "Operação", "Valor", "Categoria", "Descrição"]
-    h = h[[c for c in cols_pref if c in h.columns] + [c for c in h.columns if c not in cols_pref]]
-    return h
-
-def load_future():
-    """Carrega o arquivo de agendamentos futuros."""
-    if FUTURE_PATH.exists():
-        return pd.read_csv(FUTURE_PATH)
-    return pd.DataFrame(columns=["ID","BancoID","Tipo","Nome","Data","Operação","Valor","Categoria","Descrição","Recorrencia","Duracao_meses"])
-
-def save_future(df):
-    """Salva o DataFrame de agendamentos futuros."""
-    df.to_csv(FUTURE_PATH, index=False)
-
-
-def load_future_exclusions():
-    """Carrega IDs excluídos (opcional, usado apenas se precisar)."""
-    if EXCLUSIONS_PATH.exists():
-        return set(json.loads(EXCLUSIONS_PATH.read_text()))
-    return set()
-
-def save_future_exclusions(exclusions):
-    """Salva exclusões de instâncias futuras."""
-    EXCLUSIONS_PATH.write_text(json.dumps(list(exclusions)))
-
 # --- CARREGA DADOS PRINCIPAIS ---
-df = load_data()
-hist_df = load_history()
+# (contexto da sessão: tabelas com o schema de data/schema.py, BancoID incluso)
+ctx = get_context()
+df = ctx.accounts
+hist_df = ctx.history
 
 # --- Compatibilidade retroativa: se BancoID ausente tente recuperar por Nome+Tipo ---
-if "BancoID" in hist_df.columns and hist_df["BancoID"].isnull().all():
+# (histórico vazio não tem o que recuperar; sem nenhum nome mapeado não regrava a cada rerun)
+if not hist_df.empty and "BancoID" in hist_df.columns and hist_df["BancoID"].isnull().all():
     # tenta mapear nomes -> IDs do DB atual
     if not df.empty and "ID" in df.columns:
-        name_map = df.set_index(["Tipo", "Nome"])["ID"].to_dict()
-        def map_bankid(row):
-            key = (row.get("Tipo"), row.get("Nome"))
-            return name_map.get(key)
-        hist_df["BancoID"] = hist_df.apply(map_bankid, axis=1)
-        hist_df.to_csv(HIST_PATH, index=False)
+        with locked():
+            hist_df = load_history()
+            ids = map_ids(hist_df, df, ["Tipo", "Nome"])
+            if ids.notna().any():
+                hist_df["BancoID"] = ids
+                save_history(hist_df)
 
 # === TABS PRINCIPAIS ===
 tab1, tab2, tab3 = st.tabs(
@@ -113,7 +71,7 @@ with tab1:
 
     st.markdown("---")
     st.subheader("📋 Bancos cadastrados")
-    bancos_df = df[df["Tipo"] == "Banco"]
+    bancos_df = ctx.by_type("Banco")
     st.dataframe(bancos_df, width='stretch')
 
 # ================================================
@@ -135,7 +93,7 @@ with tab2:
 
     st.markdown("---")
     st.subheader("📋 Investimentos cadastrados")
-    inv_df = df[df["Tipo"] == "Investimento"]
+    inv_df = ctx.by_type("Investimento")
     st.dataframe(inv_df, width='stretch')
 
 # ========================================
@@ -147,16 +105,13 @@ with tab3:
     if df.empty:
         st.info("Nenhum banco ou investimento cadastrado ainda.")
     else:
-        # recarrega histórico (fresh) para garantir sincronia
-        hist_df = load_history()
-
         # filtro opcional: por padrão mostra todos (opcional)
         tipo_opcoes = ["Todos", "Banco", "Investimento"]
         tipo_filtro = st.selectbox("Filtrar por tipo (opcional)", tipo_opcoes, index=0)
         if tipo_filtro == "Todos":
-            df_iter = df.copy()
+            df_iter = df
         else:
-            df_iter = df[df["Tipo"] == tipo_filtro].copy()
+            df_iter = ctx.by_type(tipo_filtro)
 
         # Ícones visuais por tipo
         tipo_icone = {"Banco": "🏦", "Investimento": "📈"}
@@ -185,41 +140,42 @@ with tab3:
 
                 # --- Atualizar ---
                 if c1.button("💾 Salvar alterações", key=f"atualizar_{row['ID']}"):
-                    df_full = load_data()  # recarrega DB atual
-                    # localizar por ID no db (ID é estável)
-                    mask_id = df_full["ID"].astype(int) == int(row["ID"])
-                    if not mask_id.any():
-                        st.error("Registro não encontrado no DB (ID). Atualize a página e tente novamente.")
-                        st.stop()
-
-                    # exige que tanto ID quanto Nome atual correspondam ao registro antes de permitir alterações
-                    mask_both = mask_id & (df_full["Nome"].astype(str).str.strip() == str(row["Nome"]).strip())
-                    if not mask_both.any():
-                        st.error("ID e Nome não correspondem ao registro atual. Ação cancelada.")
-                        st.stop()
-
-                    old_nome = df_full.loc[mask_both, "Nome"].iloc[0]
-                    df_full.loc[mask_both, "Nome"] = new_nome
-                    df_full.loc[mask_both, "Detalhes"] = new_detalhes
-                    save_data(df_full)
-
-                    # atualizar histórico por BancoID quando disponível (somente onde BancoID e Nome correspondem)
-                    hist_full = load_history()
-                    if "BancoID" in hist_full.columns:
-                        hist_full.loc[(hist_full["BancoID"].astype(str) == str(row["ID"])) & (hist_full["Nome"].astype(str).str.strip() == str(old_nome).strip()), "Nome"] = new_nome
-                    else:
-                        # fallback: onde Nome+Tipo bate
-                        hist_full.loc[(hist_full["Nome"] == old_nome) & (hist_full["Tipo"] == row["Tipo"]), "Nome"] = new_nome
-
-                    hist_full.to_csv(HIST_PATH, index=False)
-
-                    # === Atualiza também o nome no arquivo de agendamentos futuros ===
-                    future_df = load_future()
-                    if not future_df.empty and "BancoID" in future_df.columns:
-                        mask_future = future_df["BancoID"].astype(str) == str(row["ID"])
-                        future_df.loc[mask_future, "Nome"] = new_nome
-                        save_future(future_df)
+                    with transaction():
+                        df_full = load_data()  # recarrega DB atual
+                        index = get_account_index()
+                        # localizar por ID no db (ID é estável)
+                        pos = index.position(row["ID"])
+                        if pos is None:
+                            st.error("Registro não encontrado no DB (ID). Atualize a página e tente novamente.")
+                            st.stop()
+
+                        # exige que tanto ID quanto Nome atual correspondam ao registro antes de permitir alterações
+                        old_nome = df_full["Nome"].iloc[pos]
+                        if str(old_nome).strip() != str(row["Nome"]).strip():
+                            st.error("ID e Nome não correspondem ao registro atual. Ação cancelada.")
+                            st.stop()
+
+                        mask_both = index.mask([pos])
+                        df_full.loc[mask_both, "Nome"] = new_nome
+                        df_full.loc[mask_both, "Detalhes"] = new_detalhes
+                        save_data(df_full)
+
+                        # atualizar histórico por BancoID quando disponível (somente onde BancoID e Nome correspondem)
+                        hist_full = load_history()
+                        if "BancoID" in hist_full.columns:
+                            set_cells(hist_full, (hist_full["BancoID"].astype(str) == str(row["ID"])) & (hist_full["Nome"].astype(str).str.strip() == str(old_nome).strip()), {"Nome": new_nome})
+                        else:
+                            # fallback: onde Nome+Tipo bate
+                            set_cells(hist_full, (hist_full["Nome"] == old_nome) & (hist_full["Tipo"] == row["Tipo"]), {"Nome": new_nome})
+
+                        save_history(hist_full)
 
+                        # === Atualiza também o nome no arquivo de agendamentos futuros ===
+                        future_df = load_future()
+                        if not future_df.empty and "BancoID" in future_df.columns:
+                            mask_future = future_df["BancoID"].astype(str) == str(row["ID"])
+                            set_cells(future_df, mask_future, {"Nome": new_nome})
+                            save_future(future_df)
 
                     st.success(f"{old_nome} atualizado para {new_nome}.")
                     # st.rerun()
@@ -246,30 +202,33 @@ with tab3:
 
                         if confirmar:
                             # remove do DB por ID E Nome (exige correspondência em ambas)
-                            df_full = load_data()
-                            mask_main = (df_full["ID"].astype(int) == rec_id) & (df_full["Nome"].astype(str).str.strip() == str(row["Nome"]).strip())
-                            if not mask_main.any():
-                                st.error("Registro no DB não corresponde ao ID e Nome esperados. Ação cancelada.")
-                                st.stop()
-
-                            df_new = df_full[~mask_main].reset_index(drop=True)
-                            save_data(df_new)
-
-                            # remove do histórico por BancoID (preferível), exigindo também Nome correspondente
-                            if "BancoID" in hist_full.columns:
-                                hist_new = hist_full[~((hist_full["BancoID"].astype(str) == str(rec_id)) & (hist_full["Nome"].astype(str).str.strip() == str(row["Nome"]).strip()))].reset_index(drop=True)
-                            else:
-                                hist_new = hist_full[~((hist_full["Nome"].astype(str).str.strip() == str(row["Nome"]).strip()) & (hist_full["Tipo"] == row["Tipo"]))].reset_index(drop=True)
-
-                            # === Remove também agendamentos futuros associados ===
-                            future_df = load_future()
-                            if not future_df.empty and "BancoID" in future_df.columns:
-                                future_new = future_df[future_df["BancoID"].astype(str) != str(rec_id)].reset_index(drop=True)
-                                removed_future = len(future_df) - len(future_new)
-                                if removed_future > 0:
-                                    save_future(future_new)
+                            with transaction():
+                                hist_full = load_history()
+                                df_full = load_data()
+                                index = get_account_index()
+                                pos = index.position(rec_id)
+                                if pos is None or str(df_full["Nome"].iloc[pos]).strip() != str(row["Nome"]).strip():
+                                    st.error("Registro no DB não corresponde ao ID e Nome esperados. Ação cancelada.")
+                                    st.stop()
+
+                                df_new = df_full[~index.mask([pos])].reset_index(drop=True)
+                                save_data(df_new)
+
+                                # remove do histórico por BancoID (preferível), exigindo também Nome correspondente
+                                if "BancoID" in hist_full.columns:
+                                    hist_new = hist_full[~((hist_full["BancoID"].astype(str) == str(rec_id)) & (hist_full["Nome"].astype(str).str.strip() == str(row["Nome"]).strip()))].reset_index(drop=True)
+                                else:
+                                    hist_new = hist_full[~((hist_full["Nome"].astype(str).str.strip() == str(row["Nome"]).strip()) & (hist_full["Tipo"] == row["Tipo"]))].reset_index(drop=True)
+
+                                # === Remove também agendamentos futuros associados ===
+                                future_df = load_future()
+                                if not future_df.empty and "BancoID" in future_df.columns:
+                                    future_new = future_df[future_df["BancoID"].astype(str) != str(rec_id)].reset_index(drop=True)
+                                    removed_future = len(future_df) - len(future_new)
+                                    if removed_future > 0:
+                                        save_future(future_new)
                             
-                            hist_new.to_csv(HIST_PATH, index=False)
+                                save_history(hist_new)
 
                             st.success(f"{row['Nome']} removido com sucesso. ({n_transacoes} transações excluídas)")
                             # st.rerun()
@@ -2,127 +2,36 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 from datetime import date, datetime
-from data.db import load_data, save_data
-from pathlib import Path
-import json
-from pathlib import Path
-
-# -----------------------------
-# Load files
-# -----------------------------
-
-user = st.session_state.get("user", "default")
-
-DATA_DIR = Path(__file__).resolve().parent.parent / "data" / "data_users" / user
-DATA_DIR.mkdir(parents=True, exist_ok=True)
-
-HIST_PATH = DATA_DIR / "history.csv"
-HIST_PATH.parent.mkdir(exist_ok=True)
-
-FUTURE_TRANS_PATH = DATA_DIR / "future_transactions.csv"
-if not FUTURE_TRANS_PATH.exists():
-    pd.DataFrame(columns=[
-        "ID", "BancoID", "Tipo", "Nome", "Data", "Operação", "Valor",
-        "Categoria", "Descrição", "Recorrencia", "Duracao_meses"
-    ]).to_csv(FUTURE_TRANS_PATH, index=False)
-
-EXCLUSIONS_FILE = DATA_DIR / "future_exclusions.json"
+from data.db import (
+    get_context, get_account_index, load_data, save_data, load_history, query_history, append_history, update_history, delete_history,
+    load_future, save_future, load_future_exclusions, add_future_exclusions,
+    post_occurrences, post_due, get_rollup, next_history_id, locked, transaction, import_statement,
+)
+from data.rollup import totals as rollup_totals, cumulative_by_type, monthly_flow, by_category
+from data.schedule import upcoming, RECURRENCE_LABELS
 
 # -----------------------------
 # Defs
 # -----------------------------
-def load_future():
-    if FUTURE_TRANS_PATH.exists():
-        f = pd.read_csv(FUTURE_TRANS_PATH)
-    else:
-        f = pd.DataFrame(columns=[
-            "ID", "BancoID", "Tipo", "Nome", "Data", "Operação", "Valor",
-            "Categoria", "Descrição", "Recorrencia", "Duracao_meses"
-        ])
-    for c in ["Recorrencia", "Duracao_meses"]:
-        if c not in f.columns:
-            f[c] = None
-    return f
-
-def save_future(df_):
-    df_.to_csv(FUTURE_TRANS_PATH, index=False)
-
-def generate_occurrences(start_date, recurr: str, dur_months: int):
-    start = pd.to_datetime(start_date).normalize()
-    today = pd.Timestamp(date.today())
-    
-    if dur_months and dur_months > 0:
-        end_limit = start + pd.DateOffset(months=min(dur_months, 12))
-    else:
-        end_limit = start + pd.DateOffset(years=1)
-    
-    end_cap = start + pd.DateOffset(years=1)
-    if end_limit > end_cap:
-        end_limit = end_cap
-
-    dates = []
-    if not recurr or recurr in ("none", None):
-        if start >= today:
-            dates = [start]
-        else:
-            dates = []
-        return dates
-
-    cur = start
-    while cur <= end_limit:
-        if cur >= today:
-            dates.append(cur)
-        if recurr == "weekly":
-            cur = cur + pd.DateOffset(weeks=1)
-        elif recurr == "biweekly":
-            cur = cur + pd.DateOffset(weeks=2)
-        elif recurr == "monthly":
-            cur = cur + pd.DateOffset(months=1)
-        else:
-            break
-    return dates
-
-def load_future_exclusions():
-    if EXCLUSIONS_FILE.exists():
-        with open(EXCLUSIONS_FILE, "r", encoding="utf-8") as f:
-            return set(json.load(f))
-    return set()
-
-def save_future_exclusions(exclusions):
-    with open(EXCLUSIONS_FILE, "w", encoding="utf-8") as f:
-        json.dump(list(exclusions), f, ensure_ascii=False, indent=2)
-
+DETAIL_ROWS = 500
 # -----------------------------
 # Pages
 # -----------------------------
 st.set_page_config(layout="wide", page_title="Registrar Movimentações", page_icon="⚙️")
 st.title("⚙️ Registrar Movimentações")
 
-# Carrega DB principal e históricos
-df = load_data()
+# Carrega DB principal e históricos (contexto da sessão: cada tabela é lida uma vez)
+ctx = get_context()
+df = ctx.accounts
 if df.empty:
     st.warning("Nenhum banco ou investimento cadastrado. Cadastre nas páginas de cadastro antes de registrar transações.")
     st.stop()
 
-# Carregar HIST
-hist_df = pd.read_csv(HIST_PATH) if HIST_PATH.exists() else pd.DataFrame(columns=[
-    "ID", "BancoID", "Tipo", "Nome", "Data", "Operação", "Valor", "Categoria", "Descrição"
-])
-
-# Normalizar dados
-if "BancoID" not in hist_df.columns:
-    hist_df["BancoID"] = None
-if "ID" not in hist_df.columns:
-    hist_df["ID"] = range(1, len(hist_df) + 1)
+# HIST com o schema de data/schema.py: colunas e tipos garantidos
+hist_df = ctx.history
 
-if "Data" in hist_df.columns:
-    hist_df["Data"] = pd.to_datetime(hist_df["Data"], errors="coerce")
-else:
-    hist_df["Data"] = pd.NaT
-
-future_df = load_future()
-future_exclusions = load_future_exclusions()
-df_future = future_df[~future_df["ID"].isin(future_exclusions)]
+future_df = ctx.future
+future_exclusions = ctx.exclusions
 
 
 # -----------------------------
@@ -142,7 +51,7 @@ with tab_reg:
     st.subheader("🏦 Selecionar conta")
 
     tipo = st.radio("Tipo de conta", ["Banco", "Investimento"], horizontal=True)
-    df_tipo = df[df["Tipo"] == tipo]
+    df_tipo = ctx.by_type(tipo)
     nome = st.selectbox(f"Selecione o {tipo.lower()}:", df_tipo["Nome"].unique())
     item = df_tipo[df_tipo["Nome"] == nome].iloc[0]
 
@@ -171,42 +80,64 @@ with tab_reg:
             st.error("Operação inválida: para o futuro utilize a aba 'Transações Futuras'.")
         else:
             item_id = int(item["ID"])
-            mask = (df["ID"] == item_id)
-            current_balance = float(df.loc[mask, "Saldo"].iloc[0])
-            new_effect = valor if operacao.startswith("Depósito") else -valor
-            new_balance = current_balance + new_effect
+            # relê saldo e IDs dentro da transação (outra aba pode ter gravado desde o carregamento da página)
+            with transaction():
+                df = load_data()
+                index = get_account_index()
+                mask = index.mask([index.position(item_id)])
+                current_balance = float(df.loc[mask, "Saldo"].iloc[0])
+                new_effect = valor if operacao.startswith("Depósito") else -valor
+                new_balance = current_balance + new_effect
+
+                if new_balance >= 0:
+                    df.loc[mask, "Saldo"] = new_balance
+                    save_data(df)
+
+                    entry = {
+                        "ID": next_history_id(),
+                        "BancoID": item_id,
+                        "Tipo": tipo,
+                        "Nome": nome,
+                        "Data": pd.Timestamp(data_op),
+                        "Operação": "Depósito" if operacao.startswith("Depósito") else "Retirada",
+                        "Valor": float(valor),
+                        "Categoria": "" if categoria == "Nenhuma" else categoria,
+                        "Descrição": descricao or ""
+                    }
+                    append_history([entry])
 
             if new_balance < 0:
                 st.error(f"Operação inválida: resultaria em saldo negativo (saldo atual R$ {current_balance:,.2f}).")
             else:
-                df.loc[mask, "Saldo"] = new_balance
-                save_data(df)
-
-                new_id = int(hist_df["ID"].max()) + 1 if not hist_df.empty else 1
-                entry = {
-                    "ID": new_id,
-                    "BancoID": item_id,
-                    "Tipo": tipo,
-                    "Nome": nome,
-                    "Data": pd.Timestamp(data_op).strftime("%Y-%m-%d 00:00:00"),
-                    "Operação": "Depósito" if operacao.startswith("Depósito") else "Retirada",
-                    "Valor": float(valor),
-                    "Categoria": "" if categoria == "Nenhuma" else categoria,
-                    "Descrição": descricao or ""
-                }
-                hist_df = pd.concat([hist_df, pd.DataFrame([entry])], ignore_index=True)
-                hist_df.to_csv(HIST_PATH, index=False)
                 st.success(f"✅ Operação registrada para {data_op.strftime('%d/%m/%Y')}.")
                 st.rerun()
 
+    st.divider()
+    st.subheader("📄 Importar extrato (CSV / OFX)")
+    st.caption(f"As linhas entram no histórico de **{nome}**; linhas já importadas são ignoradas.")
+    extrato = st.file_uploader("Arquivo do extrato", type=["csv", "ofx", "qfx"])
+    if extrato is not None and st.button("📥 Importar extrato"):
+        try:
+            r = import_statement(extrato, int(item["ID"]), extrato.name)
+        except ValueError as e:
+            st.error(f"Não foi possível importar: {e}")
+        else:
+            st.session_state["import_result"] = (
+                f"✅ {r['imported']} linha(s) importada(s), {r['duplicates']} já existente(s), "
+                f"{r['invalid']} inválida(s) — {r['rows_per_sec']:,.0f} linhas/s."
+            )
+            st.rerun()
+    if "import_result" in st.session_state:
+        st.success(st.session_state.pop("import_result"))
+
     st.markdown("---")
     st.subheader("📜 Histórico recente")
 
-    recent = hist_df.sort_values("Data", ascending=False).head(12).copy()
+    recent, _ = query_history(sort_by="Data", ascending=False, limit=12)
     if recent.empty:
         st.info("Nenhuma movimentação registrada ainda.")
     else:
-        recent["Data"] = pd.to_datetime(recent["Data"], errors="coerce").dt.strftime("%d/%m/%Y")
+        recent["Data"] = recent["Data"].dt.strftime("%d/%m/%Y")
         st.dataframe(recent[["Data", "Operação", "Nome", "Tipo", "Valor", "Categoria", "Descrição"]], width='stretch')
 
 # -----------------------------
@@ -220,22 +151,31 @@ with tab_edit:
     filtro_op = col_f2.multiselect("Filtrar por operação", hist_df["Operação"].dropna().unique(), default=[])
     filtro_data = col_f3.date_input("Filtrar por data", value=None)
 
-    filtro_df = hist_df.copy()
-    if filtro_tipo:
-        filtro_df = filtro_df[filtro_df["Tipo"].isin(filtro_tipo)]
-    if filtro_op:
-        filtro_df = filtro_df[filtro_df["Operação"].isin(filtro_op)]
-    if filtro_data:
-        filtro_df = filtro_df[pd.to_datetime(filtro_df["Data"]).dt.date == filtro_data]
+    col_o1, col_o2, col_o3 = st.columns(3)
+    ordem_opts = {"Data": "Data", "Valor": "Valor", "Conta": "Nome"}
+    ordem = col_o1.selectbox("Ordenar por", list(ordem_opts.keys()), index=0)
+    crescente = col_o2.selectbox("Ordem", ["Decrescente", "Crescente"], index=0) == "Crescente"
+    por_pagina = col_o3.selectbox("Itens por página", [10, 25, 50, 100], index=1)
 
-    filtro_df = filtro_df.sort_values("Data", ascending=False).reset_index(drop=True)
+    consulta = dict(
+        tipos=filtro_tipo, operacoes=filtro_op, start=filtro_data, end=filtro_data,
+        sort_by=ordem_opts[ordem], ascending=crescente,
+    )
+    _, total = query_history(**consulta, limit=0)
+    n_paginas = max(1, -(-total // por_pagina))
 
     st.markdown("---")
     st.subheader("📜 Movimentações")
 
-    if filtro_df.empty:
+    if total == 0:
         st.info("Nenhuma movimentação encontrada com os filtros atuais.")
     else:
+        # só a página visível recebe widgets; o número volta a 1 quando os filtros mudam o total
+        pagina = st.number_input("Página", min_value=1, max_value=n_paginas, value=1, step=1)
+        inicio = (int(pagina) - 1) * por_pagina
+        filtro_df, _ = query_history(**consulta, offset=inicio, limit=por_pagina)
+        st.caption(f"Mostrando {inicio + 1}–{inicio + len(filtro_df)} de {total} movimentações (página {int(pagina)} de {n_paginas}).")
+
         for _, row in filtro_df.iterrows():
             rec_id = int(row["ID"])
             date_str = pd.to_datetime(row["Data"]).strftime("%d/%m/%Y") if pd.notna(row["Data"]) else "Sem data"
@@ -261,64 +201,66 @@ with tab_edit:
 
                 b1, b2 = st.columns([1,1])
                 if b1.button("💾 Salvar alterações", key=f"save_{rec_id}"):
-                    full_hist = pd.read_csv(HIST_PATH)
-                    full_hist["Data"] = pd.to_datetime(full_hist["Data"], errors="coerce")
-                    idx = full_hist.index[full_hist["ID"] == rec_id].tolist()
-                    if not idx:
-                        st.error("Registro não encontrado.")
-                        st.stop()
-                    idx = idx[0]
-
-                    old_row = full_hist.loc[idx]
-                    old_effect = old_row["Valor"] if old_row["Operação"] == "Depósito" else -old_row["Valor"]
-                    new_effect = new_val if new_oper == "Depósito" else -new_val
-
-                    mask_main = (df["Nome"] == old_row["Nome"]) & (df["Tipo"] == old_row["Tipo"])
-                    if not any(mask_main):
-                        st.error("Conta associada não encontrada no banco de dados.")
-                        st.stop()
-                    current_balance = float(df.loc[mask_main, "Saldo"].iloc[0])
-                    proposed_balance = current_balance - old_effect + new_effect
-
-                    if proposed_balance < 0:
-                        st.error("Alteração inválida: resultaria em saldo negativo.")
-                        st.stop()
-
-                    df.loc[mask_main, "Saldo"] = proposed_balance
-                    save_data(df)
-
-                    full_hist.loc[idx, "Data"] = pd.to_datetime(new_date).strftime("%Y-%m-%d 00:00:00")
-                    full_hist.loc[idx, "Operação"] = new_oper
-                    full_hist.loc[idx, "Valor"] = float(new_val)
-                    full_hist.loc[idx, "Categoria"] = "" if new_cat == "Nenhuma" else new_cat
-                    full_hist.loc[idx, "Descrição"] = new_desc
-                    full_hist.to_csv(HIST_PATH, index=False)
+                    with transaction():
+                        df = load_data()
+                        fresh = load_history()
+                        fresh = fresh[fresh["ID"] == rec_id]
+                        if fresh.empty:
+                            st.error("Registro não encontrado.")
+                            st.stop()
+                        old_row = fresh.iloc[0]
+                        old_effect = old_row["Valor"] if old_row["Operação"] == "Depósito" else -old_row["Valor"]
+                        new_effect = new_val if new_oper == "Depósito" else -new_val
+
+                        index = get_account_index()
+                        mask_main = index.mask(index.positions(old_row["Tipo"], old_row["Nome"]))
+                        if not any(mask_main):
+                            st.error("Conta associada não encontrada no banco de dados.")
+                            st.stop()
+                        current_balance = float(df.loc[mask_main, "Saldo"].iloc[0])
+                        proposed_balance = current_balance - old_effect + new_effect
+
+                        if proposed_balance < 0:
+                            st.error("Alteração inválida: resultaria em saldo negativo.")
+                            st.stop()
+
+                        df.loc[mask_main, "Saldo"] = proposed_balance
+                        save_data(df)
+
+                        update_history(rec_id, {
+                            "Data": pd.Timestamp(new_date),
+                            "Operação": new_oper,
+                            "Valor": float(new_val),
+                            "Categoria": "" if new_cat == "Nenhuma" else new_cat,
+                            "Descrição": new_desc,
+                        })
 
                     st.success("✅ Registro atualizado com sucesso!")
                     st.rerun()
 
                 if b2.button("❌ Excluir", key=f"del_{rec_id}"):
-                    full_hist = pd.read_csv(HIST_PATH)
-                    idx = full_hist.index[full_hist["ID"] == rec_id].tolist()
-                    if not idx:
-                        st.error("Registro não encontrado.")
-                        st.stop()
-                    idx = idx[0]
-                    old_row = full_hist.loc[idx]
-                    old_effect = old_row["Valor"] if old_row["Operação"] == "Depósito" else -old_row["Valor"]
-
-                    mask_main = (df["Nome"] == old_row["Nome"]) & (df["Tipo"] == old_row["Tipo"])
-                    current_balance = float(df.loc[mask_main, "Saldo"].iloc[0])
-                    proposed_balance = current_balance - old_effect
-
-                    if proposed_balance < 0:
-                        st.error("Exclusão inválida: saldo negativo.")
-                        st.stop()
-
-                    df.loc[mask_main, "Saldo"] = proposed_balance
-                    save_data(df)
-                    full_hist = full_hist.drop(index=idx).reset_index(drop=True)
-                    full_hist.to_csv(HIST_PATH, index=False)
+                    with transaction():
+                        df = load_data()
+                        fresh = load_history()
+                        fresh = fresh[fresh["ID"] == rec_id]
+                        if fresh.empty:
+                            st.error("Registro não encontrado.")
+                            st.stop()
+                        old_row = fresh.iloc[0]
+                        old_effect = old_row["Valor"] if old_row["Operação"] == "Depósito" else -old_row["Valor"]
+
+                        index = get_account_index()
+                        mask_main = index.mask(index.positions(old_row["Tipo"], old_row["Nome"]))
+                        current_balance = float(df.loc[mask_main, "Saldo"].iloc[0])
+                        proposed_balance = current_balance - old_effect
+
+                        if proposed_balance < 0:
+                            st.error("Exclusão inválida: saldo negativo.")
+                            st.stop()
+
+                        df.loc[mask_main, "Saldo"] = proposed_balance
+                        save_data(df)
+                        delete_history([rec_id])
                     st.warning("🗑️ Registro excluído e saldo atualizado.")
                     st.rerun()
 
@@ -328,54 +270,40 @@ with tab_edit:
 with tab_vis:
     st.subheader("📊 Dashboard e Relatórios")
 
-    # Prepare data
-    if hist_df.empty:
+    # Agregados diários (data/rollup.py): o dashboard não reagrupa o histórico inteiro
+    rollup = get_rollup()
+    if rollup.daily.empty:
         st.info("Ainda não há histórico suficiente para gerar gráficos.")
     else:
         # Filtros
         col_k1, col_k2, col_k3 = st.columns([1,1,2])
-        date_range = col_k1.date_input("Intervalo de tempo", value=(pd.to_datetime(hist_df["Data"].min()).date() if not pd.isna(hist_df["Data"].min()) else date.today(), pd.to_datetime(hist_df["Data"].max()).date() if not pd.isna(hist_df["Data"].max()) else date.today()))
+        date_range = col_k1.date_input("Intervalo de tempo", value=(rollup.daily["Dia"].min().date(), rollup.daily["Dia"].max().date()))
         tipo_filter = col_k2.selectbox("Tipo", options=["Todos","Banco","Investimento"], index=0)
-        cat_list = sorted(hist_df["Categoria"].dropna().unique().tolist())
+        cat_list = rollup.categories()
         cat_sel = col_k3.multiselect("Categorias", options=cat_list, default=[])
 
-        gdf = hist_df.copy()
-        gdf["Data"] = pd.to_datetime(gdf["Data"], errors="coerce")
-
+        start_dt = end_dt = None
         if isinstance(date_range, (tuple, list)) and len(date_range) == 2:
             start_dt, end_dt = date_range
-            gdf = gdf[(gdf["Data"].dt.date >= pd.to_datetime(start_dt).date()) & (gdf["Data"].dt.date <= pd.to_datetime(end_dt).date())]
-        if tipo_filter != "Todos":
-            gdf = gdf[gdf["Tipo"] == tipo_filter]
-        if cat_sel:
-            gdf = gdf[gdf["Categoria"].isin(cat_sel)]
+        tipo_sel = None if tipo_filter == "Todos" else tipo_filter
+        daily = rollup.query(start=start_dt, end=end_dt, tipo=tipo_sel, categorias=cat_sel)
 
-        if gdf.empty:
+        if daily.empty:
             st.info("Sem dados no período/combinação selecionada.")
         else:
             # KPIs
-            total_deposit = gdf[gdf["Operação"] == "Depósito"]["Valor"].sum()
-            total_withdraw = gdf[gdf["Operação"] == "Retirada"]["Valor"].sum()
-            net_flow = total_deposit - total_withdraw
-            total_banks = df[df["Tipo"]=="Banco"]["Saldo"].sum()
-            total_invest = df[df["Tipo"]=="Investimento"]["Saldo"].sum()
+            tot = rollup_totals(daily)
+            total_banks, total_invest, _ = ctx.totals()
 
             k1, k2, k3, k4 = st.columns(4)
             k1.metric("💵 Saldo em Bancos", f"R$ {total_banks:,.2f}")
             k2.metric("📈 Saldo em Investimentos", f"R$ {total_invest:,.2f}")
-            k3.metric("🔁 Fluxo líquido (período)", f"R$ {net_flow:,.2f}", delta=f"Entradas: R$ {total_deposit:,.2f} | Saídas: R$ {total_withdraw:,.2f}")
-            last_date = gdf["Data"].max()
+            k3.metric("🔁 Fluxo líquido (período)", f"R$ {tot['net']:,.2f}", delta=f"Entradas: R$ {tot['deposits']:,.2f} | Saídas: R$ {tot['withdrawals']:,.2f}")
+            last_date = tot["last_day"]
             k4.metric("📅 Última movimentação no filtro", last_date.strftime("%d/%m/%Y") if pd.notna(last_date) else "—")
 
             # Evolution line
-            temp = gdf.sort_values("Data").copy()
-            temp["Efeito"] = temp.apply(lambda r: r["Valor"] if r["Operação"] == "Depósito" else -r["Valor"], axis=1)
-            grouped = temp.groupby([temp["Data"].dt.date, "Tipo"])["Efeito"].sum().reset_index()
-            pivot = grouped.pivot(index="Data", columns="Tipo", values="Efeito").fillna(0).sort_index()
-            for colname in ["Banco", "Investimento"]:
-                if colname not in pivot.columns:
-                    pivot[colname] = 0.0
-            cum = pivot.cumsum().reset_index().rename(columns={"index":"Data"})
+            cum = cumulative_by_type(daily)
             if cum.empty:
                 st.info("Sem dados válidos para gráficos de evolução.")
             else:
@@ -387,27 +315,29 @@ with tab_vis:
             
             graph1, graph2 = st.columns([1,1])
             # Monthly cash flow
-            gdf_month = gdf.copy()
-            gdf_month["Mes"] = gdf_month["Data"].dt.to_period("M").dt.to_timestamp()
-            monthly = gdf_month.groupby([gdf_month["Mes"], "Operação"])["Valor"].sum().unstack(fill_value=0).reset_index()
+            monthly = monthly_flow(daily)
             if not monthly.empty:
-                monthly = monthly.sort_values("Mes")
                 fig_bar = px.bar(monthly, x="Mes", y=[c for c in monthly.columns if c!="Mes"], barmode="group", title="Fluxo mensal (Entradas vs Saídas)")
                 fig_bar.update_layout(xaxis_title="Mês", yaxis_title="Valor (R$)", template="simple_white", height=360)
                 graph1.plotly_chart(fig_bar, width='stretch')
 
             # Distribution by category
-            gastos = gdf[gdf["Operação"] == "Retirada"]
+            gastos = by_category(daily, "Retirada")
             if not gastos.empty:
                 fig_pie = px.pie(gastos, names="Categoria", values="Valor", hole=0.4, title="Distribuição de gastos por categoria")
                 fig_pie.update_traces(textinfo="label+percent")
                 graph2.plotly_chart(fig_pie, width='stretch')
 
-            # Detailed table
+            # Detailed table (consulta paginada; só as movimentações mais recentes)
             st.markdown("### 📋 Tabela detalhada")
-            table = gdf.copy()
+            table, n_rows = query_history(
+                tipos=[tipo_sel] if tipo_sel else None, categorias=cat_sel, start=start_dt, end=end_dt,
+                sort_by="Data", ascending=False, limit=DETAIL_ROWS,
+            )
+            if n_rows > len(table):
+                st.caption(f"Mostrando as {len(table)} movimentações mais recentes de {n_rows}.")
             table["Data"] = table["Data"].dt.strftime("%d/%m/%Y")
-            st.dataframe(table[["Data","Operação","Nome","Tipo","Valor","Categoria","Descrição"]].sort_values("Data", ascending=False), width='stretch')
+            st.dataframe(table[["Data","Operação","Nome","Tipo","Valor","Categoria","Descrição"]], width='stretch')
 
 # -----------------------------
 # Aba Transações Futuras
@@ -417,16 +347,16 @@ with tab_future:
 
     with st.form("form_future", clear_on_submit=False):
         tipo_fut = st.radio("Tipo de conta:", ["Banco", "Investimento"], horizontal=True)
-        df_tipo_fut = df[df["Tipo"] == tipo_fut]
-        nome_fut = st.selectbox(f"Selecione o {tipo_fut.lower()}:", df_tipo_fut["Nome"].unique())
-        item_fut = df_tipo_fut[df_tipo_fut["Nome"] == nome_fut].iloc[0]
+        contas_fut = ctx.account_ids(tipo_fut)
+        nome_fut = st.selectbox(f"Selecione o {tipo_fut.lower()}:", list(contas_fut))
+        banco_id_fut = contas_fut[nome_fut]
 
         operacao_fut = st.radio("Operação:", ["Depósito / Adição", "Retirada / Gasto"], horizontal=True)
         valor_fut = st.number_input("💵 Valor (R$):", min_value=0.0, step=10.0)
         data_fut = st.date_input("📅 Data inicial:", value=date.today())
 
         # Recorrência
-        recorr_opts = {"Nenhuma":"none", "Semanal":"weekly", "Quinzenal":"biweekly", "Mensal":"monthly"}
+        recorr_opts = {label: key for key, label in RECURRENCE_LABELS.items()}
         recorr_display = st.selectbox("Recorrência:", options=list(recorr_opts.keys()), index=0, help="Escolha 'Nenhuma' para agendamento único.")
         recorr = recorr_opts[recorr_display]
 
@@ -443,36 +373,40 @@ with tab_future:
             elif pd.to_datetime(data_fut).date() < date.today():
                 st.error("Data inicial não pode ser no passado.")
             else:
-                future_df = load_future()
-                new_id = int(future_df["ID"].max()) + 1 if not future_df.empty else 1
-                entry = {
-                    "ID": new_id,
-                    "BancoID": int(item_fut["ID"]),
-                    "Tipo": tipo_fut,
-                    "Nome": nome_fut,
-                    "Data": pd.Timestamp(data_fut).strftime("%Y-%m-%d"),
-                    "Operação": "Depósito" if operacao_fut.startswith("Depósito") else "Retirada",
-                    "Valor": float(valor_fut),
-                    "Categoria": "" if categoria_fut == "Nenhuma" else categoria_fut,
-                    "Descrição": descricao_fut or "",
-                    "Recorrencia": recorr,
-                    "Duracao_meses": int(dur_meses) if recorr != "none" else 0
-                }
-                future_df = pd.concat([future_df, pd.DataFrame([entry])], ignore_index=True)
-                save_future(future_df)
+                with locked():
+                    future_df = load_future()
+                    new_id = int(future_df["ID"].max()) + 1 if not future_df.empty else 1
+                    entry = {
+                        "ID": new_id,
+                        "BancoID": banco_id_fut,
+                        "Tipo": tipo_fut,
+                        "Nome": nome_fut,
+                        "Data": pd.Timestamp(data_fut),
+                        "Operação": "Depósito" if operacao_fut.startswith("Depósito") else "Retirada",
+                        "Valor": float(valor_fut),
+                        "Categoria": "" if categoria_fut == "Nenhuma" else categoria_fut,
+                        "Descrição": descricao_fut or "",
+                        "Recorrencia": recorr,
+                        "Duracao_meses": int(dur_meses) if recorr != "none" else 0
+                    }
+                    future_df = pd.concat([future_df, pd.DataFrame([entry])], ignore_index=True)
+                    save_future(future_df)
                 st.success("Agendamento salvo com sucesso.")
                 st.rerun()
 
     st.markdown("---")
     st.subheader("📋 Agendamentos Ativos")
 
-    future_df = load_future()
+    future_df = ctx.future
     # -----------------------------
     # Visualização de movimentações futuras
     # -----------------------------
     if future_df.empty:
         st.info("Nenhum agendamento futuro cadastrado.")
     else:
+        # expande todos os agendamentos de uma vez (sem as instâncias excluídas) e agrupa por agendamento
+        occs_by_sched = dict(tuple(upcoming(future_df, exclusions=future_exclusions).groupby("ID")))
+
         for _, sched in future_df.sort_values("Data").iterrows():
             sched_id = int(sched["ID"])
             sched_name = f"{pd.to_datetime(sched['Data']).strftime('%d/%m/%Y')} — {sched['Operação']} — {sched['Nome']} — R$ {float(sched['Valor']):,.2f}"
@@ -484,79 +418,37 @@ with tab_future:
                 aa_c1.write(f"**Descrição:** {sched.get('Descrição','—')}")
                 aa_c2.write(f"**Categoria:** {sched.get('Categoria','—')}")
                 rec_display = sched.get("Recorrencia", "none")
-                rec_readable = {"none":"Nenhuma", "weekly":"Semanal", "biweekly":"Quinzenal", "monthly":"Mensal"}.get(rec_display, "Nenhuma")
+                rec_readable = RECURRENCE_LABELS.get(rec_display, "Nenhuma")
                 aa_c1.write(f"**Recorrência:** {rec_readable}")
                 aa_c2.write(f"**Duração (meses):** {int(sched.get('Duracao_meses') or 0)}")
 
                 st.divider()
 
-                # Calcula instâncias a partir do agendamento
-                occs_all = generate_occurrences(
-                    sched["Data"],
-                    sched.get("Recorrencia", "none"),
-                    int(sched.get("Duracao_meses") or 0)
-                )
-
-                # Remove da lista as que estão em future_exclusions
-                occs = [
-                    d for d in occs_all
-                    if f"{sched_id}_{pd.to_datetime(d).strftime('%Y-%m-%d')}" not in future_exclusions
-                ]
+                # Instâncias pendentes do agendamento (já sem as realizadas/removidas)
+                sched_occs = occs_by_sched.get(sched_id, future_df.iloc[0:0])
 
-                if not occs:
+                if sched_occs.empty:
                     st.success("Todas as transações foram realizadas.")
                 else:
-                    for d in occs:
+                    for i, d in enumerate(sched_occs["Data"]):
                         d_str = pd.to_datetime(d).strftime("%d/%m/%Y")
                         cols = st.columns([2, 1, 1])
                         cols[0].write(f"📅 {d_str} — R$ {float(sched['Valor']):,.2f}")
 
                         # REGISTRAR MOVIMENTAÇÃO
                         if cols[1].button("✔️ Realizar", key=f"exec_{sched_id}_{d_str}"):
-                            df_full = load_data()
-                            hist_full = pd.read_csv(HIST_PATH) if HIST_PATH.exists() else pd.DataFrame(columns=["ID","BancoID","Tipo","Nome","Data","Operação","Valor","Categoria","Descrição"])
-
-                            mask_bank = (df_full["ID"].astype(int) == int(sched["BancoID"])) & (df_full["Nome"] == sched["Nome"])
-
-                            if not mask_bank.any():
+                            result = post_occurrences(sched_occs.iloc[[i]])
+                            if result["missing"]:
                                 st.error("Conta não encontrada (ID). Atualize a página.")
                                 st.stop()
-                            current_balance_fut = float(df_full.loc[mask_bank, "Saldo"].iloc[0])
-                            new_effect_fut = float(sched["Valor"]) if sched["Operação"] == "Depósito" else -float(sched["Valor"])
-                            new_balance_fut = current_balance_fut + new_effect_fut
-                            if new_balance_fut < 0:
+                            if not result["executed"]:
                                 st.error("Saldo insuficiente para realizar a transação.")
                             else:
-                                df_full.loc[mask_bank, "Saldo"] = new_balance_fut
-                                save_data(df_full)
-
-                                new_hist_id = int(hist_full["ID"].max()) + 1 if not hist_full.empty else 1
-                                hist_entry = {
-                                    "ID": new_hist_id,
-                                    "BancoID": int(sched["BancoID"]),
-                                    "Tipo": sched["Tipo"],
-                                    "Nome": sched["Nome"],
-                                    "Data": pd.to_datetime(d).strftime("%Y-%m-%d"),
-                                    "Operação": sched["Operação"],
-                                    "Valor": float(sched["Valor"]),
-                                    "Categoria": sched.get("Categoria",""),
-                                    "Descrição": sched.get("Descrição","")
-                                }
-                                hist_full = pd.concat([hist_full, pd.DataFrame([hist_entry])], ignore_index=True)
-                                hist_full.to_csv(HIST_PATH, index=False)
-
-                                exclusion_key = f"{sched_id}_{pd.to_datetime(d).strftime('%Y-%m-%d')}"
-                                future_exclusions.add(exclusion_key)
-                                save_future_exclusions(future_exclusions)
-
                                 st.success(f"Transação realizada para {d_str} (salvo no histórico).")
                                 st.rerun()
 
                         if cols[2].button("🗑️ Remover instância", key=f"reminst_{sched_id}_{d_str}"):
-                            exclusion_key = f"{sched_id}_{pd.to_datetime(d).strftime('%Y-%m-%d')}"
-
-                            future_exclusions.add(exclusion_key)
-                            save_future_exclusions(future_exclusions)
+                            add_future_exclusions([(sched_id, d)])
 
                             st.success(f"Instância de {sched['Operação']} em {d_str} foi ignorada com sucesso.")
                             st.rerun()
@@ -565,73 +457,39 @@ with tab_future:
 
                 col_a, col_b = st.columns([1,1])
                 if col_a.button("✔️ Realizar todas as movimentações futuras", key=f"exec_all_{sched_id}"):
-                    df_full = load_data()
-                    hist_full = pd.read_csv(HIST_PATH) if HIST_PATH.exists() else pd.DataFrame(columns=["ID","BancoID","Tipo","Nome","Data","Operação","Valor","Categoria","Descrição"])
-                    executed = 0
-                    skipped = 0
-                    for d in occs:
-                        mask_bank = (df_full["ID"].astype(int) == int(sched["BancoID"])) & (df_full["Nome"] == sched["Nome"])
-                        current_balance_fut = float(df_full.loc[mask_bank, "Saldo"].iloc[0])
-                        new_effect_fut = float(sched["Valor"]) if sched["Operação"] == "Depósito" else -float(sched["Valor"])
-                        new_balance_fut = current_balance_fut + new_effect_fut
-                        if new_balance_fut < 0:
-                            skipped += 1
-                            continue
-                        df_full.loc[mask_bank, "Saldo"] = new_balance_fut
-                        new_hist_id = int(hist_full["ID"].max()) + 1 if not hist_full.empty else 1
-                        hist_entry = {
-                            "ID": new_hist_id,
-                            "BancoID": int(sched["BancoID"]),
-                            "Tipo": sched["Tipo"],
-                            "Nome": sched["Nome"],
-                            "Data": pd.to_datetime(d).strftime("%Y-%m-%d"),
-                            "Operação": sched["Operação"],
-                            "Valor": float(sched["Valor"]),
-                            "Categoria": sched.get("Categoria",""),
-                            "Descrição": sched.get("Descrição","")
-                        }
-                        hist_full = pd.concat([hist_full, pd.DataFrame([hist_entry])], ignore_index=True)
-                        executed += 1
-
-                        exclusion_key = f"{sched_id}_{pd.to_datetime(d).strftime('%Y-%m-%d')}"
-                        future_exclusions.add(exclusion_key)
-
-
-                    save_data(df_full)
-                    hist_full.to_csv(HIST_PATH, index=False)
-                    st.success(f"Executadas {executed} instâncias. {skipped} foram puladas por saldo insuficiente.")
+                    result = post_occurrences(sched_occs)
+                    st.success(f"Executadas {result['executed']} instâncias. {result['skipped']} foram puladas por saldo insuficiente.")
                     st.rerun()
 
                 if col_b.button("🗑️ Remover agendamento", key=f"del_sched_{sched_id}"):
+                    with locked():
+                        future_df = load_future()
                         future_df = future_df[future_df["ID"] != sched_id].reset_index(drop=True)
                         save_future(future_df)
                         st.warning("Agendamento removido.")
                         st.rerun()
 
     st.markdown("---")
-    if st.button("🧹 Limpar agendamentos concluídos"):
-        future_df = load_future()
-        future_exclusions = load_future_exclusions()
-
-        keep = []
-        removed = 0
-
-        for _, s in future_df.iterrows():
-            sched_id = int(s["ID"])
-            rec = s.get("Recorrencia", "none")
-            dur = int(s.get("Duracao_meses") or 0)
-            occs = generate_occurrences(s["Data"], rec, dur)
-
-            exclusion_keys = {f"{sched_id}_{pd.to_datetime(d).strftime('%Y-%m-%d')}" for d in occs}
-            all_done = all(k in future_exclusions for k in exclusion_keys)
-
-            if not all_done:
-                keep.append(s)
-            else:
-                removed += 1
+    st.subheader("⏰ Instâncias vencidas")
+    contas_opts = {"Todas as contas": None}
+    contas_opts.update({f"{r['Tipo']} — {r['Nome']}": int(r["ID"]) for _, r in df.iterrows()})
+    conta_due = st.selectbox("Conta:", options=list(contas_opts.keys()), key="due_account")
+    if st.button("✔️ Realizar tudo que venceu até hoje"):
+        result = post_due(contas_opts[conta_due])
+        st.success(f"Executadas {result['executed']} instâncias. {result['skipped']} foram puladas por saldo insuficiente.")
+        st.rerun()
 
-        newf = pd.DataFrame(keep)
-        save_future(newf)
+    st.markdown("---")
+    if st.button("🧹 Limpar agendamentos concluídos"):
+        with locked():
+            future_df = load_future()
+            future_exclusions = load_future_exclusions()
+
+            # concluído = nenhuma instância pendente a partir de hoje
+            pendentes = upcoming(future_df, exclusions=future_exclusions)["ID"].unique()
+            newf = future_df[future_df["ID"].isin(pendentes)].reset_index(drop=True)
+            removed = len(future_df) - len(newf)
+            save_future(newf)
 
         st.success(f"Limpeza concluída. {removed} agendamento(s) concluído(s) foram removidos.")
         st.rerun()
@@ -1,13 +1,13 @@
 import streamlit as st
-import json
 from pathlib import Path
-import hashlib
 import shutil
-import pandas as pd
+from data.db import get_context
+from data.users import get_registry
+from data.passwords import hash_password
+from data.provision import forget
 
 # === Caminhos base ===
 DATA_USERS_DIR = Path("data/data_users")
-USERS_FILE = Path("data/users.json")
 
 # --- Redireciona para login se a página for recarregada sem sessão ---
 if "user" not in st.session_state or st.session_state["user"] is None:
@@ -18,28 +18,6 @@ if "user" not in st.session_state or st.session_state["user"] is None:
         st.switch_page("auth.py")  # substitua pelo caminho real da sua página de login
 
 # === Funções auxiliares ===
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
-
-def load_users():
-    if USERS_FILE.exists():
-        with open(USERS_FILE, "r") as f:
-            return json.load(f)
-    return {}
-
-def save_users(users):
-    USERS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    with open(USERS_FILE, "w") as f:
-        json.dump(users, f, indent=4)
-
-def load_user_data(username: str):
-    """Carrega dados do db.csv do usuário logado."""
-    user_dir = DATA_USERS_DIR / username
-    db_path = user_dir / "db.csv"
-    if db_path.exists():
-        return pd.read_csv(db_path)
-    return pd.DataFrame(columns=["ID", "Tipo", "Nome", "Saldo", "Detalhes"])
-
 def logout():
     st.session_state["user"] = None
     st.success("Você saiu da conta com sucesso!")
@@ -89,11 +67,9 @@ st.markdown(f"### Bem-vindo, **{user}** 👋")
 st.divider()
 st.subheader("📊 Resumo Financeiro")
 
-df = load_user_data(user)
-if not df.empty:
-    total_bancos = df[df["Tipo"] == "Banco"]["Saldo"].sum()
-    total_inv = df[df["Tipo"] == "Investimento"]["Saldo"].sum()
-    total = total_bancos + total_inv
+ctx = get_context()
+if not ctx.accounts.empty:
+    total_bancos, total_inv, total = ctx.totals()
 
     col1, col2, col3 = st.columns(3)
     col1.metric("💳 Bancos", f"R$ {total_bancos:,.2f}")
@@ -106,8 +82,7 @@ else:
 st.divider()
 st.subheader("🔐 Alterar login e senha")
 
-users = load_users()
-current_user = users.get(user, {})
+registry = get_registry()
 
 with st.form("form_alterar"):
     new_username = st.text_input("Novo nome de usuário", value=user)
@@ -119,20 +94,18 @@ with st.form("form_alterar"):
         if new_password and new_password != confirm_password:
             st.error("As senhas não coincidem.")
         else:
-            # Atualiza credenciais
-            users.pop(user, None)
-            users[new_username] = {
-                "password": hash_password(new_password or current_user.get("password", "")),
-                "is_guest": "false",
-            }
+            # Atualiza credenciais (senha em branco mantém a atual)
+            if not registry.rename(user, new_username, hash_password(new_password) if new_password else None):
+                st.error("Usuário já existe.")
+                st.stop()
 
             # Renomeia a pasta de dados, se o nome mudou
             old_path = DATA_USERS_DIR / user
             new_path = DATA_USERS_DIR / new_username
             if old_path.exists() and user != new_username:
                 old_path.rename(new_path)
+            forget(user)
 
-            save_users(users)
             st.session_state["user"] = new_username
             st.query_params["user"] = new_username
             st.success("✅ Dados atualizados com sucesso! Recarregue a página para aplicar.")
@@ -145,11 +118,11 @@ st.subheader("🗑️ Excluir conta")
 if st.button("Excluir minha conta", type="secondary"):
     st.warning("⚠️ Esta ação é irreversível. Deseja realmente excluir?")
     if st.button("❌ Confirmar exclusão", type="primary"):
-        users.pop(user, None)
-        save_users(users)
+        registry.delete(user)
         user_path = DATA_USERS_DIR / user
         if user_path.exists():
             shutil.rmtree(user_path)
+        forget(user)
         st.session_state["user"] = None
         st.query_params.clear()  # ✅ limpa a URL
         st.success("Conta excluída com sucesso.")